@@ -4,16 +4,36 @@
 import argparse
 import logging
 import datetime
+import signal
+import decimal
+import hashlib
+import json
 import sys
+import time
 import os
+import threading
+import contextlib
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from sqlalchemy import text
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
 # 導入自定義模組
 from config import get_config_manager, get_etl_config
 from database import DatabaseManager
-from sql_loader import SQLLoader
+from sql_loader import SQLLoader, build_filtered_sql
+from batch_tuning import AdaptiveBatchSizer, BatchSizeStore
+from watermark import WatermarkStore, build_incremental_sql, get_lower_bound, validate_watermark
+from partitioning import build_partition_predicates, build_keyset_predicate
+from pipeline import ChunkPipeline
+from run_log import RunLog, estimate_frame_bytes
+from schema_migrations import SchemaMigrator
+from table_ddl import (build_index_disable_ddl, build_index_rebuild_ddl, build_statistics_ddl, build_table_ddl,
+                       get_clustered_key, validate_indexes, validate_storage)
+from transform import apply_column_schema, build_sql_dtypes, encode_low_cardinality, validate_column_schema
+from extract_cache import ExtractCache
+from async_runner import AsyncETLRunner, QueryCancelledError
 
 
 def setup_logging(debug: bool = False) -> logging.Logger:
@@ -33,6 +53,41 @@ def setup_logging(debug: bool = False) -> logging.Logger:
     return logger
 
 
+# 影響目標表內容或結構的查詢設定，納入結果指紋
+LOAD_DEFINITION_KEYS = ('target_table', 'columns', 'storage', 'indexes', 'key_columns', 'merge_delete')
+
+
+def hash_result_rows(df: pd.DataFrame) -> np.ndarray:
+    """以 pandas 向量化雜湊計算每列的 64 位元雜湊 (分批載入時逐批計算，再由 combine_result_fingerprint 合併)"""
+    return pd.util.hash_pandas_object(df, index=False).to_numpy()
+
+
+def combine_result_fingerprint(columns, row_hashes: List[np.ndarray], load_definition: str = '') -> str:
+    """
+    合併各批資料列雜湊為結果指紋
+
+    資料列雜湊排序後連同載入定義與欄位名稱一起做 SHA-1，因此結果與資料列順序及分批方式無關，
+    但任何欄位值、欄位名稱、筆數或載入定義 (SQL、欄位宣告、索引、載入方式等) 改變都會產生不同指紋。
+    """
+    hashes = np.sort(np.concatenate(row_hashes)) if row_hashes else np.array([], dtype=np.uint64)
+    digest = hashlib.sha1()
+    digest.update(load_definition.encode('utf-8'))
+    digest.update("\x1f".join(map(str, columns)).encode('utf-8'))
+    digest.update(hashes.tobytes())
+    return digest.hexdigest()
+
+
+def _exit_on_sigterm(signum, frame):
+    """排程逾時等以 SIGTERM 終止時轉為 SystemExit，使 main 的 finally 區塊仍寫入執行記錄並關閉連線"""
+    logging.getLogger("ETL_Process").error("收到終止信號，寫入已完成的執行記錄後結束")
+    raise SystemExit(128 + signum)
+
+
+def compute_result_fingerprint(df: pd.DataFrame, load_definition: str = '') -> str:
+    """計算查詢結果的內容指紋 (load_definition 為 ETLProcessor._load_definition 產生的載入定義)"""
+    return combine_result_fingerprint(df.columns, [hash_result_rows(df)], load_definition)
+
+
 class ETLProcessor:
     """ETL處理器 - 負責核心的ETL邏輯"""
     
@@ -42,76 +97,54 @@ class ETLProcessor:
         self.sql_loader = sql_loader
         self.logger = logger
         self.etl_config = config_manager.etl_config
+        self.watermark_store = WatermarkStore(db_manager)
+        self.extract_cache = ExtractCache(config_manager)
+        self.batch_size_store = BatchSizeStore(db_manager)
+        self.run_log = RunLog(db_manager)
+        # 執行中查詢的取消旗標 (key: 查詢名稱)，由 AsyncETLRunner 於逾時或中止時設定
+        self._cancel_events: Dict[str, threading.Event] = {}
+        self._cancel_lock = threading.Lock()
+    
+    def cancel_query(self, query_name: str):
+        """
+        要求執行中的查詢停止 (查詢未執行時忽略)
+
+        執行中的來源陳述式立即取消 (DatabaseManager.cancel_statements)，其餘階段於下一個階段邊界停止。
+        """
+        with self._cancel_lock:
+            event = self._cancel_events.get(query_name)
+        if event is not None:
+            event.set()
+            cancelled = self.db_manager.cancel_statements(query_name)
+            self.logger.warning(f"已要求取消查詢 {query_name}" + (f"，中斷 {cancelled} 個來源陳述式" if cancelled else ""))
+
+    def _is_cancel_requested(self, query_name: str) -> bool:
+        """查詢是否已被要求取消"""
+        with self._cancel_lock:
+            event = self._cancel_events.get(query_name)
+        return event is not None and event.is_set()
+    
+    def _check_cancelled(self, query_name: str):
+        """查詢已被取消時拋出 QueryCancelledError"""
+        if self._is_cancel_requested(query_name):
+            raise QueryCancelledError(f"查詢 {query_name} 已取消")
     
     def ensure_etl_summary_table(self, target_db: str = 'tableau_db'):
-        """確保 ETL_SUMMARY 表存在且結構正確"""
+        """確保 ETL_SUMMARY 表存在且結構正確 (結構版本已是最新時只執行一次版本查詢)"""
         table_name = self.etl_config.ETL_SUMMARY_TABLE
-        sql = f"""
-        IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{table_name}')
-        BEGIN
-            CREATE TABLE {table_name} (
-                id INT IDENTITY(1,1) PRIMARY KEY,
-                [TIMESTAMP] DATETIME DEFAULT GETDATE(),
-                [SOURCE_TYPE] NVARCHAR(50),
-                [QUERY_NAME] NVARCHAR(255),
-                [TARGET_TABLE] NVARCHAR(255),
-                [ROW_COUNT] INT,
-                [ETL_DATE] DATETIME DEFAULT GETDATE(),
-                [SUMMARY_TYPE] NVARCHAR(50) NULL,
-                [ETL_STATUS] NVARCHAR(50) NULL,
-                [mes_status] NVARCHAR(50) NULL,
-                [sap_status] NVARCHAR(50) NULL,
-                [mes_rows] INT NULL,
-                [sap_rows] INT NULL
-            )
-        END
-        ELSE
-        BEGIN
-            -- 確保新增欄位存在
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS 
-                           WHERE TABLE_NAME = '{table_name}' AND COLUMN_NAME = 'SUMMARY_TYPE')
-            BEGIN
-                ALTER TABLE {table_name} ADD [SUMMARY_TYPE] NVARCHAR(50) NULL
-            END
-            
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS 
-                           WHERE TABLE_NAME = '{table_name}' AND COLUMN_NAME = 'ETL_STATUS')
-            BEGIN
-                ALTER TABLE {table_name} ADD [ETL_STATUS] NVARCHAR(50) NULL
-            END
-            
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS 
-                           WHERE TABLE_NAME = '{table_name}' AND COLUMN_NAME = 'mes_status')
-            BEGIN
-                ALTER TABLE {table_name} ADD [mes_status] NVARCHAR(50) NULL
-            END
-            
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS 
-                           WHERE TABLE_NAME = '{table_name}' AND COLUMN_NAME = 'sap_status')
-            BEGIN
-                ALTER TABLE {table_name} ADD [sap_status] NVARCHAR(50) NULL
-            END
-            
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS 
-                           WHERE TABLE_NAME = '{table_name}' AND COLUMN_NAME = 'mes_rows')
-            BEGIN
-                ALTER TABLE {table_name} ADD [mes_rows] INT NULL
-            END
-            
-            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.COLUMNS 
-                           WHERE TABLE_NAME = '{table_name}' AND COLUMN_NAME = 'sap_rows')
-            BEGIN
-                ALTER TABLE {table_name} ADD [sap_rows] INT NULL
-            END
-        END
-        """
         try:
             with self.db_manager.get_engine_context(target_db) as engine:
-                with engine.begin() as conn:
-                    conn.execute(text(sql))
-            self.logger.info(f"已確保 {table_name} 表存在且結構正確")
+                connection = engine.raw_connection()
+                try:
+                    applied = SchemaMigrator(table_name, self.etl_config.ETL_SCHEMA_VERSION_TABLE).migrate(
+                        connection, dialect=engine.dialect.name)
+                finally:
+                    connection.close()
+            if applied:
+                self.db_manager.invalidate_catalog(target_db, table_name)
+                self.logger.info(f"已將 {table_name} 表結構更新至最新版本 (套用 {applied} 個遷移)")
         except Exception as e:
-            self.logger.warning(f"檢查或創建 {table_name} 表失敗: {e}")
+            self.logger.warning(f"檢查或更新 {table_name} 表結構失敗: {e}")
     
     def backup_and_truncate(self, target_db: str, table_name: str) -> Optional[str]:
         """備份並清空目標表"""
@@ -127,13 +160,19 @@ class ETLProcessor:
         try:
             with self.db_manager.get_engine_context(target_db) as engine:
                 with engine.begin() as conn:
-                    # 使用參數化查詢進行備份
-                    backup_sql = f"SELECT * INTO {backup_name} FROM {table_name}"
+                    if engine.dialect.name == 'mssql':
+                        # 使用參數化查詢進行備份
+                        backup_sql = f"SELECT * INTO {backup_name} FROM {table_name}"
+                        truncate_sql = f"TRUNCATE TABLE {table_name}"
+                    else:
+                        # 離線後端 (SQLite/DuckDB) 沒有 SELECT INTO 與 TRUNCATE
+                        backup_sql = f"CREATE TABLE {backup_name} AS SELECT * FROM {table_name}"
+                        truncate_sql = f"DELETE FROM {table_name}"
                     conn.execute(text(backup_sql))
                     
                     # 清空目標表
-                    truncate_sql = f"TRUNCATE TABLE {table_name}"
                     conn.execute(text(truncate_sql))
+            self.db_manager.invalidate_catalog(target_db, backup_name)
             
             self.logger.info(f"已備份 {table_name} 至 {backup_name} 並清空目標表")
             return backup_name
@@ -142,6 +181,183 @@ class ETLProcessor:
             self.logger.warning(f"備份或清空表 {table_name} 失敗: {e}")
             return None
     
+    def _resolve_load_mode(self, query: Dict[str, Any]) -> str:
+        """
+        決定查詢的完整載入方式
+
+        全域設定為 merge 時，未設定 key_columns 的查詢改用 truncate；查詢本身指定 merge 卻未設定主鍵則視為設定錯誤。
+        """
+        load_mode = query.get('load_mode', self.etl_config.LOAD_MODE)
+        if load_mode not in ('swap', 'truncate', 'merge'):
+            raise ValueError(f"不支援的載入模式: {load_mode}")
+        if load_mode == 'merge' and not query.get('key_columns'):
+            if 'load_mode' in query:
+                raise ValueError(f"查詢 {query['name']} 使用 merge 載入模式但未設定 key_columns")
+            return 'truncate'
+        return load_mode
+
+    def _fingerprint_enabled(self, query: Dict[str, Any]) -> bool:
+        """是否計算並記錄結果指紋"""
+        return query.get('skip_unchanged', self.etl_config.SKIP_UNCHANGED_LOADS)
+
+    def _load_definition(self, query: Dict[str, Any], sql: str) -> str:
+        """
+        查詢的載入定義 - SQL 內容雜湊、實際載入方式與 LOAD_DEFINITION_KEYS 所列設定的正規化 JSON
+
+        納入結果指紋，修改欄位型別、索引、壓縮、主鍵或載入方式後，即使查詢結果相同也會重新載入。
+        """
+        definition = {key: query.get(key) for key in LOAD_DEFINITION_KEYS}
+        definition['load_mode'] = self._resolve_load_mode(query)
+        definition['sql_hash'] = hashlib.sha1(sql.encode('utf-8')).hexdigest()
+        return json.dumps(definition, sort_keys=True, ensure_ascii=False, default=str)
+
+    def _begin_load(self, query: Dict[str, Any], target_db: str, target_table: str) -> tuple:
+        """
+        開始完整載入
+
+        swap 模式寫入暫存表 {table}_stage，完成後再切換為正式表，載入期間正式表維持舊資料；
+        merge 模式寫入暫存表 {table}_merge_stage，完成後依主鍵合併至正式表；
+        truncate 模式沿用備份並清空目標表後直接寫入。
+
+        Returns:
+            (寫入的表名稱, 備份表名稱)
+        """
+        self._check_cancelled(query['name'])
+        load_mode = self._resolve_load_mode(query)
+        if load_mode == 'swap':
+            stage_table = f"{target_table}_stage"
+            self.logger.info(f"寫入暫存表 {stage_table}，完成後切換為 {target_table}")
+            return stage_table, None
+        if load_mode == 'merge':
+            stage_table = f"{target_table}_merge_stage"
+            self.logger.info(f"寫入暫存表 {stage_table}，完成後依主鍵 {', '.join(query['key_columns'])} 合併至 {target_table}")
+            return stage_table, None
+
+        with self.run_log.stage(query['name'], 'backup'):
+            backup_name = self.backup_and_truncate(target_db, target_table)
+        if backup_name:
+            self.logger.info(f"備份 {target_table} 至 {backup_name}，並清空目標表")
+        return target_table, backup_name
+
+    def _finish_load(self, query: Dict[str, Any], target_db: str, target_table: str, load_table: str) -> Optional[Dict[str, int]]:
+        """
+        完成完整載入
+
+        swap 模式將暫存表切換為正式表，原表保留為 {table}_previous 供回復；
+        merge 模式依主鍵合併至正式表 (正式表不存在時直接切換) 並刪除暫存表。
+        宣告的非叢集索引與統計資料於切換前在暫存表建立；合併時先停用正式表的索引，合併後重建。
+
+        Returns:
+            merge 模式的 {'inserted', 'updated', 'deleted'} 筆數，其他情況回傳 None
+        """
+        # 切換或合併前為最後的取消點，之後正式表即為新資料
+        self._check_cancelled(query['name'])
+        if load_table == target_table:
+            self._rebuild_indexes(query, target_db, target_table)
+            return None
+
+        if (self._resolve_load_mode(query) == 'merge'
+                and self.db_manager.check_table_exists(target_db, target_table)):
+            self._disable_indexes(query, target_db, target_table)
+            try:
+                return self.db_manager.merge_tables(
+                    target_db, target_table, load_table, query['key_columns'],
+                    delete_missing=query.get('merge_delete', True)
+                )
+            finally:
+                # 合併失敗時同樣重建，避免索引維持停用狀態
+                self._rebuild_indexes(query, target_db, target_table)
+                self.db_manager.drop_table(target_db, load_table)
+
+        self._rebuild_indexes(query, target_db, load_table)
+        self.db_manager.swap_tables(target_db, target_table, load_table, f"{target_table}_previous")
+        return None
+
+    def _disable_indexes(self, query: Dict[str, Any], target_db: str, table_name: str):
+        """寫入既有資料表前停用宣告的非叢集索引"""
+        if not query.get('indexes'):
+            return
+        dialect = self.db_manager.get_engine(target_db).dialect
+        statements = build_index_disable_ddl(table_name, query['target_table'], query['indexes'], dialect)
+        self.db_manager.execute_statements(target_db, statements)
+        if statements:
+            self.logger.info(f"已停用 {table_name} 的 {len(statements)} 個非叢集索引")
+
+    def _rebuild_indexes(self, query: Dict[str, Any], target_db: str, table_name: str, rebuild_existing: bool = True):
+        """
+        寫入完成後重建 (或建立) 宣告的非叢集索引，並更新 Tableau 篩選欄位的統計資料
+
+        rebuild_existing 為 False 時只建立不存在的索引，既有索引維持寫入時的逐列維護。
+        """
+        indexes = query.get('indexes', [])
+        statistics = query.get('statistics', [])
+        if not indexes and not statistics:
+            return
+        dialect = self.db_manager.get_engine(target_db).dialect
+        statements = (build_index_rebuild_ddl(table_name, query['target_table'], indexes, dialect, rebuild_existing)
+                      + build_statistics_ddl(table_name, statistics, dialect, query.get('statistics_sample_percent')))
+        if not statements:
+            return
+
+        started = time.perf_counter()
+        self.db_manager.execute_statements(target_db, statements)
+        action = "重建" if rebuild_existing else "確認"
+        self.logger.info(
+            f"已{action} {table_name} 的 {len(indexes)} 個非叢集索引並更新 {len(statistics)} 個欄位統計資料 "
+            f"({time.perf_counter() - started:.1f} 秒)"
+        )
+
+    def _abort_load(self, target_db: str, target_table: str, load_table: str, backup_name: Optional[str]):
+        """完整載入失敗：swap/merge 模式刪除暫存表 (正式表未受影響)，truncate 模式自備份還原"""
+        if load_table != target_table:
+            try:
+                self.db_manager.drop_table(target_db, load_table)
+            except Exception as e:
+                self.logger.warning(f"刪除暫存表 {load_table} 失敗: {e}")
+        elif backup_name:
+            self._restore_from_backup(target_db, target_table, backup_name)
+
+    def restore_previous_version(self, target_db: str, table_name: str) -> bool:
+        """
+        將目標表回復為上一次 swap 載入前的版本，目前版本改保留為 {table}_previous
+
+        Returns:
+            是否已回復
+        """
+        previous_table = f"{table_name}_previous"
+        if not self.db_manager.check_table_exists(target_db, previous_table):
+            self.logger.warning(f"找不到 {previous_table}，無法回復 {table_name}")
+            return False
+
+        temp_table = f"{table_name}_rollback"
+        try:
+            self.db_manager.swap_tables(target_db, table_name, previous_table, temp_table)
+            self.db_manager.rename_table(target_db, temp_table, previous_table)
+        except Exception as e:
+            self.logger.error(f"回復 {table_name} 失敗: {e}")
+            return False
+
+        self.logger.info(f"已將 {table_name} 回復為上一版本")
+
+        # 回復後的內容與最近一次記錄的結果指紋不符，記錄不含指紋的 ROLLED_BACK 記錄，
+        # 下次執行不會因來源未變更而略過載入
+        queries = [query for query in self.config_manager.load_query_metadata()['queries']
+                   if query['target_table'] == table_name]
+        if not queries:
+            self.logger.warning(f"{table_name} 不屬於任何查詢，未記錄回復")
+        row_count = self._count_rows(target_db, table_name) if queries else 0
+        for query in queries:
+            self.run_log.start_query(query['name'])
+            self._record_query_result(target_db, query['name'].split('_')[0].upper(), query['name'], table_name,
+                                      row_count, etl_status='ROLLED_BACK')
+        return True
+
+    def _count_rows(self, target_db: str, table_name: str) -> int:
+        """取得資料表的資料列數"""
+        with self.db_manager.get_engine_context(target_db) as engine:
+            with engine.connect() as conn:
+                return int(conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar())
+
     def run_etl(self, query: Dict[str, Any], source_db: str, target_db: str) -> int:
         """
         執行單筆 ETL - 使用分批處理避免參數過多錯誤，並處理NULL值
@@ -155,33 +371,77 @@ class ETLProcessor:
             處理的資料筆數
         """
         name = query['name']
-        target_table = query['target_table']
+        self.run_log.start_query(name)
+        with self._cancel_lock:
+            self._cancel_events[name] = threading.Event()
+        try:
+            return self._run_etl(query, source_db, target_db)
+        except Exception as e:
+            # 失敗的查詢同樣記錄各階段耗時
+            # 來源陳述式被取消時拋出的是驅動程式的例外，依取消旗標判斷
+            cancelled = isinstance(e, QueryCancelledError) or self._is_cancel_requested(name)
+            self._record_query_result(target_db, name.split('_')[0].upper(), name, query['target_table'], 0,
+                                      etl_status='CANCELLED' if cancelled else 'FAILED')
+            raise
+        finally:
+            with self._cancel_lock:
+                self._cancel_events.pop(name, None)
+
+    def _run_etl(self, query: Dict[str, Any], source_db: str, target_db: str) -> int:
+        """依查詢設定選擇增量、分區、串流或完整載入方式執行單筆 ETL"""
         sql_file = query['sql_file']
-        source_type = name.split('_')[0].upper()  # 從查詢名稱取得來源類型 (MES或SAP)
 
         # 從SQL文件讀取SQL語句
         sql = self.sql_loader.load_sql_file(sql_file)
 
-        self.logger.info(f"處理查詢: {name}")
-        try:
-            with self.db_manager.get_connection_context(source_db) as src_conn:
-                df = pd.read_sql(sql, src_conn)
+        # 欄位結構宣告錯誤時在擷取前即失敗
+        if query.get('columns'):
+            validate_column_schema(query['columns'])
+        if query.get('storage'):
+            validate_storage(query['storage'], query.get('columns', {}))
+        if query.get('indexes'):
+            validate_indexes(query['indexes'], query.get('columns', {}))
 
-            # 處理NULL值
-            if not df.empty:
-                # 記錄NULL值情況
-                null_counts = df.isnull().sum().sum()
-                if null_counts > 0:
-                    self.logger.warning(f"查詢 {name} 包含 {null_counts} 個NULL值")
+        # 增量模式：已有高水位時只擷取高水位之後的資料列
+        watermark = query.get('watermark')
+        if watermark:
+            validate_watermark(query['name'], watermark, self._get_output_columns(source_db, sql, query['name']))
+        if watermark and not self.etl_config.FULL_RELOAD:
+            lower_bound = self._get_incremental_lower_bound(query, target_db)
+            incremental_sql = self._build_incremental_sql(query, sql) if lower_bound is not None else None
+            if incremental_sql is not None:
+                rows = self._run_etl_incremental(query, incremental_sql, source_db, target_db, lower_bound)
+                if rows > 0:
+                    self._update_watermark(query, target_db)
+                return rows
+
+        # 分區模式：將單一大查詢切分為多個子查詢並行擷取
+        if query.get('partition'):
+            rows = self._run_etl_partitioned(query, sql, source_db, target_db)
+        # 串流/管線模式：分批讀取並寫入，記憶體用量不隨資料筆數成長
+        elif (query.get('streaming', self.etl_config.STREAMING_ENABLED)
+              or query.get('pipeline', self.etl_config.PIPELINE_ENABLED)):
+            rows = self._run_etl_streaming(query, sql, source_db, target_db)
+        else:
+            rows = self._run_etl_full(query, sql, source_db, target_db)
+
+        if watermark and rows > 0:
+            self._update_watermark(query, target_db)
+        return rows
 
-                # 針對數值型欄位，將NULL填充為0
-                numeric_columns = df.select_dtypes(
-                    include=['int', 'float']).columns
-                df[numeric_columns] = df[numeric_columns].fillna(0)
+    def _run_etl_full(self, query: Dict[str, Any], sql: str, source_db: str, target_db: str) -> int:
+        """完整重新載入單筆 ETL - 一次讀取全部結果後分批寫入目標表"""
+        name = query['name']
+        target_table = query['target_table']
+        source_type = name.split('_')[0].upper()
 
-                # 針對字串型欄位，將NULL填充為空字串
-                string_columns = df.select_dtypes(include=['object']).columns
-                df[string_columns] = df[string_columns].fillna('')
+        self.logger.info(f"處理查詢: {name}")
+        try:
+            # 讀取資料並處理NULL值 (啟用擷取快取時優先使用有效的快取)
+            if query.get('extract_cache', self.etl_config.EXTRACT_CACHE_ENABLED):
+                df = self._extract_frame_cached(query, source_db, sql)
+            else:
+                df = self._extract_frame(source_db, sql, query)
 
             self.logger.info(f"讀取 {len(df)} 筆資料，處理後資料品質正常")
         except Exception as e:
@@ -194,63 +454,657 @@ class ETLProcessor:
             self._record_query_result(target_db, source_type, name, target_table, 0)
             return 0
 
-        # 備份和清空表 (如果表存在)
-        backup_name = self.backup_and_truncate(target_db, target_table)
-        if backup_name:
-            self.logger.info(f"備份 {target_table} 至 {backup_name}，並清空目標表")
+        # 結果指紋與上次載入相同時略過備份、清空與寫入
+        fingerprint = None
+        if self._fingerprint_enabled(query):
+            fingerprint = compute_result_fingerprint(df, self._load_definition(query, sql))
+            if (not self.etl_config.FULL_RELOAD
+                    and fingerprint == self._get_last_fingerprint(target_db, name, target_table)
+                    and self.db_manager.check_table_exists(target_db, target_table)):
+                self.logger.info(f"查詢 {name} 結果與上次載入相同 (指紋 {fingerprint[:12]})，略過重新載入")
+                self._record_query_result(target_db, source_type, name, target_table, len(df),
+                                          etl_status='UNCHANGED', fingerprint=fingerprint)
+                return len(df)
+
+        # 寫入暫存表，或備份和清空表 (如果表存在)
+        load_table, backup_name = self._begin_load(query, target_db, target_table)
 
-        # 分批處理
-        batch_size = self.etl_config.BATCH_SIZE
         total_rows = len(df)
-        processed = 0
+        df = self._order_for_load(df, query)
 
-        try:
-            with self.db_manager.get_engine_context(target_db) as tgt_engine:
-                # 使用if_exists='replace'來處理表不存在的情況
-                for i in range(0, total_rows, batch_size):
-                    chunk = df.iloc[i:min(i+batch_size, total_rows)]
-                    # 首次迭代使用replace，後續使用append
-                    mode = 'replace' if i == 0 else 'append'
-                    chunk.to_sql(target_table, tgt_engine, if_exists=mode,
-                                 index=False, method=None)
-                    processed += len(chunk)
-                    if processed % self.etl_config.PROGRESS_REPORT_INTERVAL == 0 or processed == total_rows:
-                        progress_pct = int(processed/total_rows*100)
-                        self.logger.info(f"進度: {processed}/{total_rows} 筆 ({progress_pct}%)")
+        def report_progress(processed: int):
+            progress_pct = int(processed/total_rows*100)
+            self.logger.info(f"進度: {processed}/{total_rows} 筆 ({progress_pct}%)")
 
-                self.logger.info(f"已匯入總計 {total_rows} 筆至 {target_table}")
+        try:
+            # 使用replace重建表，以處理表不存在的情況
+            batch_sizer = self._create_batch_sizer(target_table, len(df.columns))
+            with self.run_log.stage(name, 'load'):
+                self.db_manager.bulk_write(target_db, load_table, df, if_exists='replace',
+                                           dtype=build_sql_dtypes(query.get('columns', {})),
+                                           progress_callback=report_progress, batch_sizer=batch_sizer,
+                                           create_statements=self._build_table_ddl(query, target_db, target_table,
+                                                                                   load_table, df.columns))
+                merge_counts = self._finish_load(query, target_db, target_table, load_table)
+            self.logger.info(f"已匯入總計 {total_rows} 筆至 {target_table}")
+            self._save_batch_sizer(batch_sizer)
 
             # 記錄ETL執行結果
-            self._record_query_result(target_db, source_type, name, target_table, total_rows)
+            self._record_query_result(target_db, source_type, name, target_table, total_rows,
+                                      etl_status='MERGED' if merge_counts else 'LOADED',
+                                      fingerprint=fingerprint, merge_counts=merge_counts)
             return total_rows
             
         except Exception as e:
             self.logger.error(f"匯入資料至 {target_table} 失敗: {e}")
 
-            # 還原備份 (如果有)
-            if backup_name:
-                self._restore_from_backup(target_db, target_table, backup_name)
+            # 刪除暫存表或還原備份 (如果有)
+            self._abort_load(target_db, target_table, load_table, backup_name)
+            raise
+
+    def _infer_fill_values(self, df: pd.DataFrame) -> Dict[str, Any]:
+        """依 DataFrame 推斷的 dtype 決定NULL填充值：數值型欄位填 0，字串型欄位填空字串"""
+        fill_values = {}
+
+        # 針對數值型欄位，將NULL填充為0
+        for column_name in df.select_dtypes(include=['int', 'float']).columns:
+            fill_values[column_name] = 0
+
+        # 針對字串型欄位，將NULL填充為空字串
+        for column_name in df.select_dtypes(include=['object', 'string']).columns:
+            fill_values[column_name] = ''
+        return fill_values
+
+    def _get_incremental_lower_bound(self, query: Dict[str, Any], target_db: str) -> Optional[Any]:
+        """
+        取得增量擷取的下界 (高水位扣除回溯重疊量)
+
+        Returns:
+            下界值；尚無高水位或目標表不存在時回傳 None，表示需完整載入
+        """
+        name = query['name']
+        if not self.db_manager.check_table_exists(target_db, query['target_table']):
+            self.logger.info(f"目標表 {query['target_table']} 不存在，查詢 {name} 將完整載入")
+            return None
+
+        try:
+            high_water_mark = self.watermark_store.get(name, query['watermark'])
+        except Exception as e:
+            self.logger.warning(f"讀取查詢 {name} 的高水位失敗，將完整載入: {e}")
+            return None
+
+        if high_water_mark is None:
+            self.logger.info(f"查詢 {name} 尚無高水位，將完整載入")
+            return None
+        return get_lower_bound(high_water_mark, query['watermark'])
+
+    def _get_output_columns(self, source_db: str, sql: str, query_name: str) -> Optional[list]:
+        """
+        以不傳回資料列的探測查詢 (外層 WHERE 1 = 0) 取得查詢實際的輸出欄位
+
+        SQL 無法包裝為子查詢時回傳 None (此時也無法改寫為增量查詢，一律完整載入)。
+        """
+        try:
+            probe_sql = build_filtered_sql(sql, "1 = 0")
+        except ValueError:
+            return None
+        with self.db_manager.acquire_query_slot(source_db):
+            column_types, chunks = self.db_manager.stream_query(source_db, probe_sql, 1, tag=query_name)
+            # 讀完 (沒有資料列) 才會關閉游標並歸還連線
+            list(chunks)
+        return list(column_types)
+
+    def _build_incremental_sql(self, query: Dict[str, Any], sql: str) -> Optional[str]:
+        """將查詢改寫為只取高水位之後資料列的增量查詢，無法改寫時回傳 None (改為完整載入)"""
+        try:
+            return build_incremental_sql(sql, query['watermark']['column'])
+        except ValueError as e:
+            self.logger.warning(f"查詢 {query['name']} 無法改寫為增量查詢 ({e})，改為完整載入")
+            return None
+
+    def _run_etl_incremental(self, query: Dict[str, Any], incremental_sql: str, source_db: str, target_db: str,
+                             lower_bound: Any) -> int:
+        """
+        增量執行單筆 ETL - 只擷取下界之後的資料列並套用至目標表
+
+        incremental_sql 為 _build_incremental_sql 改寫後的查詢 (以一個 ? 參數傳入下界)。
+        套用方式：先寫入暫存表，再於同一交易內刪除目標表中下界之後 (以及主鍵相同) 的資料列，
+        最後自暫存表插入。回溯重疊區間因此可重複執行而不產生重複資料。
+        """
+        name = query['name']
+        target_table = query['target_table']
+        source_type = name.split('_')[0].upper()
+        watermark = query['watermark']
+        column = watermark['column']
+
+        self.logger.info(f"處理查詢 (增量模式，{column} > {lower_bound}): {name}")
+        try:
+            df = self._extract_frame(source_db, incremental_sql, query, params=[lower_bound])
+            self.logger.info(f"讀取 {len(df)} 筆增量資料")
+        except Exception as e:
+            self.logger.error(f"執行查詢 {name} 失敗: {e}")
+            raise
+
+        if df.empty:
+            self.logger.info(f"查詢 {name} 沒有新的資料列")
+            self._record_query_result(target_db, source_type, name, target_table, 0)
+            return 0
+
+        stage_table = f"{target_table}_incr_stage"
+        column_list = ", ".join(f"[{c}]" for c in df.columns)
+        key_columns = watermark.get('key_columns', [])
+
+        try:
+            batch_sizer = self._create_batch_sizer(target_table, len(df.columns))
+            with self.run_log.stage(name, 'load'):
+                self.db_manager.bulk_write(target_db, stage_table, df, if_exists='replace',
+                                           dtype=build_sql_dtypes(query.get('columns', {})),
+                                           batch_sizer=batch_sizer)
+                self._save_batch_sizer(batch_sizer)
+
+                with self.db_manager.get_engine_context(target_db) as tgt_engine:
+                    with tgt_engine.begin() as conn:
+                        # 刪除回溯區間內的舊資料
+                        deleted = conn.execute(
+                            text(f"DELETE FROM {target_table} WHERE [{column}] > :lower_bound"),
+                            {'lower_bound': lower_bound}
+                        ).rowcount
+
+                        # 刪除主鍵相同但高水位欄位已前移的舊版本資料列
+                        if key_columns:
+                            # 以相關子查詢比對 (SQL Server 與離線後端皆支援，DELETE t FROM 為 T-SQL 專用)
+                            key_match = " AND ".join(f"{target_table}.[{k}] = s.[{k}]" for k in key_columns)
+                            deleted += conn.execute(text(
+                                f"DELETE FROM {target_table} WHERE EXISTS "
+                                f"(SELECT 1 FROM {stage_table} s WHERE {key_match})"
+                            )).rowcount
+
+                        conn.execute(text(
+                            f"INSERT INTO {target_table} ({column_list}) SELECT {column_list} FROM {stage_table}"
+                        ))
+                        conn.execute(text(f"DROP TABLE {stage_table}"))
+                self.db_manager.invalidate_catalog(target_db, stage_table)
+
+                # 增量資料列少，既有索引於寫入時維護即可；只建立缺少的索引並更新統計資料
+                self._rebuild_indexes(query, target_db, target_table, rebuild_existing=False)
+
+            self.logger.info(f"已套用 {len(df)} 筆增量資料至 {target_table} (取代 {deleted} 筆舊資料)")
+        except Exception as e:
+            self.logger.error(f"套用增量資料至 {target_table} 失敗: {e}")
+            # 目標表的變更在同一交易內已回復，只需刪除暫存表
+            try:
+                self.db_manager.drop_table(target_db, stage_table)
+            except Exception as drop_error:
+                self.logger.warning(f"刪除暫存表 {stage_table} 失敗: {drop_error}")
             raise
 
-    def _record_query_result(self, target_db: str, source_type: str, query_name: str, target_table: str, row_count: int):
-        """記錄單個查詢的執行結果"""
+        # 增量套用後目標表內容不等於任何完整結果，不記錄指紋 (下次完整載入一律寫入)
+        self._record_query_result(target_db, source_type, name, target_table, len(df), etl_status='LOADED')
+        return len(df)
+
+    def _update_watermark(self, query: Dict[str, Any], target_db: str):
+        """以目標表中高水位欄位的最大值更新高水位"""
+        name = query['name']
+        column = query['watermark']['column']
         try:
-            table_name = self.etl_config.ETL_SUMMARY_TABLE
             with self.db_manager.get_engine_context(target_db) as engine:
-                with engine.begin() as conn:
-                    stmt = text(
-                        f"INSERT INTO {table_name} ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE], [SUMMARY_TYPE])"
-                        " VALUES (GETDATE(), :source_type, :query_name, :target_table, :row_count, GETDATE(), 'QUERY')"
+                with engine.connect() as conn:
+                    value = conn.execute(
+                        text(f"SELECT MAX([{column}]) FROM {query['target_table']}")
+                    ).scalar()
+            self.watermark_store.set(name, query['watermark'], value)
+        except Exception as e:
+            self.logger.warning(f"更新查詢 {name} 的高水位失敗: {e}")
+
+    def _create_batch_sizer(self, target_table: str, column_count: int) -> Optional[AdaptiveBatchSizer]:
+        """建立目標表的自我調整批次大小控制器 (未啟用時回傳 None，使用固定的 BULK_BATCH_ROWS)"""
+        if not self.etl_config.ADAPTIVE_BATCH_ENABLED:
+            return None
+        return self.batch_size_store.create_sizer(target_table, column_count)
+
+    def _save_batch_sizer(self, batch_sizer: Optional[AdaptiveBatchSizer]):
+        """保存本次學習到的批次大小"""
+        if batch_sizer is not None:
+            self.batch_size_store.save(batch_sizer)
+
+    def _build_table_ddl(self, query: Dict[str, Any], target_db: str, target_table: str,
+                         load_table: str, columns) -> list:
+        """產生建立載入表後執行的 DDL (NOT NULL 欄位、叢集索引與資料壓縮)"""
+        storage = query.get('storage', {})
+        schema = query.get('columns', {})
+        if not storage and not any(not spec.get('nullable', True) for spec in schema.values()):
+            return []
+        dialect = self.db_manager.get_engine(target_db).dialect
+        return build_table_ddl(load_table, target_table, list(columns), schema, storage, dialect)
+
+    def _order_for_load(self, df: pd.DataFrame, query: Dict[str, Any]) -> pd.DataFrame:
+        """依叢集索引鍵排序資料，使寫入順序與索引順序一致 (減少頁面分割)"""
+        clustered_key = [column for column in get_clustered_key(query.get('storage', {})) if column in df.columns]
+        if not clustered_key:
+            return df
+        return df.sort_values(clustered_key, kind='stable', ignore_index=True)
+
+    def _build_fill_values(self, column_types: Dict[str, type]) -> Dict[str, Any]:
+        """
+        依來源欄位型別決定NULL填充值
+        
+        串流時每批資料的 dtype 可能因整批為NULL而不同，因此改以來源欄位型別判斷，
+        確保每一批的填充規則一致：數值型欄位填 0，字串型欄位填空字串。
+        """
+        fill_values = {}
+        for column_name, type_code in column_types.items():
+            if type_code is bool:
+                fill_values[column_name] = False
+            elif type_code in (int, float, decimal.Decimal):
+                fill_values[column_name] = 0
+            elif type_code is str:
+                fill_values[column_name] = ''
+        return fill_values
+    
+    def _run_etl_streaming(self, query: Dict[str, Any], sql: str, source_db: str, target_db: str) -> int:
+        """
+        以串流方式執行單筆 ETL - 每批資料讀取、處理NULL值後立即寫入目標表
+        
+        Args:
+            query: 查詢配置
+            sql: 已載入的SQL語句
+            source_db: 來源資料庫名稱
+            target_db: 目標資料庫名稱
+            
+        Returns:
+            處理的資料筆數
+        """
+        name = query['name']
+        target_table = query['target_table']
+        source_type = name.split('_')[0].upper()
+        chunk_size = query.get('stream_chunk_size', self.etl_config.STREAM_CHUNK_SIZE)
+
+        use_pipeline = query.get('pipeline', self.etl_config.PIPELINE_ENABLED)
+        mode_label = "管線模式" if use_pipeline else "串流模式"
+        self.logger.info(f"處理查詢 ({mode_label}，每批 {chunk_size} 筆): {name}")
+
+        sql_dtypes = build_sql_dtypes(query.get('columns', {}))
+        pipeline = None
+        backup_name = None
+        merge_counts = None
+        row_hashes = [] if self._fingerprint_enabled(query) else None
+        processed = 0
+        null_counts = 0
+        next_report = self.etl_config.PROGRESS_REPORT_INTERVAL
+
+        # 管線模式由生產者執行緒自行取得來源連線，此處不另外佔用連線池的連線
+        source_connection = (contextlib.nullcontext() if use_pipeline
+                             else self.db_manager.get_connection_context(source_db))
+        with self.db_manager.acquire_query_slot(source_db), source_connection:
+            try:
+                if use_pipeline:
+                    # 擷取於生產者執行緒進行，與目標表寫入重疊
+                    pipeline = ChunkPipeline(
+                        lambda: self.db_manager.stream_query(source_db, sql, chunk_size, tag=name),
+                        max_queue_size=self.etl_config.PIPELINE_QUEUE_SIZE,
+                        name=f"etl-extract-{name}"
+                    )
+                    column_types = pipeline.start()
+                    chunks = iter(pipeline)
+                else:
+                    column_types, chunks = self.db_manager.stream_query(source_db, sql, chunk_size, tag=name)
+                with self.run_log.stage(name, 'extract'):
+                    first_chunk = next(chunks, None)
+            except Exception as e:
+                self.logger.error(f"執行查詢 {name} 失敗: {e}")
+                raise
+
+            if first_chunk is None or first_chunk.empty:
+                self.logger.warning(f"查詢 {name} 未返回任何資料")
+                chunks.close()
+                self._record_query_result(target_db, source_type, name, target_table, 0)
+                return 0
+
+            # 確認有資料後才開始載入 (寫入暫存表，或備份和清空表)；失敗時關閉來源游標 (及管線的生產者執行緒)
+            try:
+                load_table, backup_name = self._begin_load(query, target_db, target_table)
+            except Exception:
+                chunks.close()
+                raise
+
+            try:
+                batch_sizer = self._create_batch_sizer(target_table, len(first_chunk.columns))
+                chunk = first_chunk
+                while chunk is not None:
+                    # 轉換階段 (欄位型別與NULL值)
+                    self.run_log.add_bytes(name, estimate_frame_bytes(chunk))
+                    null_counts += int(chunk.isnull().sum().sum())
+                    chunk = self._order_for_load(self._transform_frame(chunk, column_types, query), query)
+                    if row_hashes is not None:
+                        row_hashes.append(hash_result_rows(chunk))
+
+                    # 首批使用replace (並建立索引與壓縮設定)，後續使用append
+                    mode = 'replace' if processed == 0 else 'append'
+                    create_statements = (self._build_table_ddl(query, target_db, target_table, load_table, chunk.columns)
+                                         if processed == 0 else None)
+                    with self.run_log.stage(name, 'load'):
+                        self.db_manager.bulk_write(target_db, load_table, chunk, if_exists=mode, dtype=sql_dtypes,
+                                                   batch_sizer=batch_sizer, create_statements=create_statements)
+                    processed += len(chunk)
+
+                    if processed >= next_report:
+                        self.logger.info(f"進度: 已匯入 {processed} 筆")
+                        next_report += self.etl_config.PROGRESS_REPORT_INTERVAL
+
+                    with self.run_log.stage(name, 'extract'):
+                        chunk = next(chunks, None)
+
+                with self.run_log.stage(name, 'load'):
+                    merge_counts = self._finish_load(query, target_db, target_table, load_table)
+                if null_counts > 0:
+                    self.logger.warning(f"查詢 {name} 包含 {null_counts} 個NULL值")
+                self.logger.info(f"已匯入總計 {processed} 筆至 {target_table}")
+                self._save_batch_sizer(batch_sizer)
+                fingerprint = (combine_result_fingerprint(first_chunk.columns, row_hashes,
+                                                          self._load_definition(query, sql))
+                               if row_hashes is not None else None)
+
+                if pipeline is not None:
+                    stats = pipeline.stats()
+                    self.logger.info(
+                        f"管線統計 {name}: {stats['chunks']} 批，"
+                        f"擷取端等待 {stats['producer_wait_seconds']} 秒，"
+                        f"寫入端等待 {stats['consumer_wait_seconds']} 秒，"
+                        f"佇列深度 平均 {stats['avg_queue_depth']} / 最大 {stats['max_queue_depth']}，"
+                        f"瓶頸: {pipeline.bottleneck()}"
                     )
-                    params = {
-                        'source_type': source_type,
-                        'query_name': query_name,
-                        'target_table': target_table,
-                        'row_count': row_count
-                    }
-                    conn.execute(stmt, params)
+
+            except Exception as e:
+                chunks.close()
+                self.logger.error(f"匯入資料至 {target_table} 失敗: {e}")
+
+                # 刪除暫存表或還原備份 (如果有)
+                self._abort_load(target_db, target_table, load_table, backup_name)
+                raise
+
+        # 記錄ETL執行結果
+        self._record_query_result(target_db, source_type, name, target_table, processed,
+                                  etl_status='MERGED' if merge_counts else 'LOADED',
+                                  fingerprint=fingerprint, merge_counts=merge_counts)
+        return processed
+
+    def _read_frame(self, source_db: str, sql: str, params: list = None, query_name: str = None) -> tuple:
+        """
+        讀取查詢結果為DataFrame (未處理NULL值)
+
+        指定 query_name 時，取消該查詢會中斷執行中的來源陳述式。
+
+        Returns:
+            (df, column_types)
+        """
+        with self.db_manager.acquire_query_slot(source_db), self.db_manager.get_connection_context(source_db):
+            column_types, chunks = self.db_manager.stream_query(
+                source_db, sql, self.etl_config.STREAM_CHUNK_SIZE, params, tag=query_name)
+            frames = list(chunks)
+
+        if frames:
+            df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+        else:
+            df = pd.DataFrame(columns=list(column_types))
+        return df, column_types
+
+    def _transform_frame(self, df: pd.DataFrame, column_types: Optional[Dict[str, type]],
+                         query: Dict[str, Any]) -> pd.DataFrame:
+        """
+        轉換階段 - 套用 query_metadata.json 宣告的欄位結構，其餘欄位依型別填充NULL值
+
+        宣告的欄位依 dtype/nullable/fill/downcast 轉換；未宣告的欄位依來源欄位型別
+        (column_types 為 None 時依 DataFrame 推斷的 dtype) 填充NULL值。
+        最後將低基數字串欄位字典編碼為 category，並保持此編碼直到寫入目標表。
+        """
+        self._check_cancelled(query['name'])
+        with self.run_log.stage(query['name'], 'transform'):
+            return self._apply_transform(df, column_types, query)
+
+    def _apply_transform(self, df: pd.DataFrame, column_types: Optional[Dict[str, type]],
+                         query: Dict[str, Any]) -> pd.DataFrame:
+        """套用欄位宣告、NULL值填充與字典編碼 (由 _transform_frame 計時)"""
+        schema = query.get('columns') or {}
+        if schema:
+            df = apply_column_schema(df, schema)
+
+        if column_types is None:
+            fill_values = self._infer_fill_values(df)
+        else:
+            fill_values = self._build_fill_values(column_types)
+        fill_values = {column: value for column, value in fill_values.items() if column not in schema}
+        if fill_values:
+            df = df.fillna(value=fill_values)
+
+        if query.get('category_encoding', self.etl_config.CATEGORY_ENCODING_ENABLED):
+            df, encoded = encode_low_cardinality(
+                df,
+                max_unique_ratio=self.etl_config.CATEGORY_MAX_UNIQUE_RATIO,
+                min_rows=self.etl_config.CATEGORY_MIN_ROWS,
+                exclude=schema
+            )
+            if encoded:
+                self.logger.debug(f"查詢 {query['name']} 字典編碼欄位: {', '.join(encoded)}")
+        return df
+
+    def _fill_null_values(self, df: pd.DataFrame, column_types: Optional[Dict[str, type]],
+                          query: Dict[str, Any]) -> pd.DataFrame:
+        """記錄NULL數量後執行轉換階段"""
+        null_counts = int(df.isnull().sum().sum())
+        if null_counts > 0:
+            self.logger.warning(f"查詢 {query['name']} 包含 {null_counts} 個NULL值")
+        return self._transform_frame(df, column_types, query)
+
+    def _extract_frame_cached(self, query: Dict[str, Any], source_db: str, sql: str) -> pd.DataFrame:
+        """
+        透過擷取快取取得查詢結果並處理NULL值
+
+        快取鍵值為 SQL 文件內容雜湊；有效期限內的快取直接使用，否則查詢來源後寫入快取。
+        """
+        name = query['name']
+        sql_hash = self.sql_loader.get_sql_hash(query['sql_file'])
+        with self.run_log.stage(name, 'extract'):
+            cached = self.extract_cache.get(name, sql_hash)
+            if cached is not None:
+                df, column_types = cached['df'], cached['column_types']
+            else:
+                df, column_types = self._read_frame(source_db, sql, query_name=name)
+                self.extract_cache.put(name, sql_hash, df, column_types)
+        self.run_log.add_bytes(name, estimate_frame_bytes(df))
+        return self._fill_null_values(df, column_types, query)
+
+    def _extract_frame(self, source_db: str, sql: str, query: Dict[str, Any], params: list = None) -> pd.DataFrame:
+        """
+        擷取完整查詢結果並執行轉換階段
+
+        FETCH_ENGINE 為 pandas 時沿用 pd.read_sql；其他引擎直接使用具型別的欄式資料，
+        並依來源欄位型別填充NULL值。
+        """
+        with self.run_log.stage(query['name'], 'extract'):
+            if self.etl_config.FETCH_ENGINE == 'pandas':
+                with self.db_manager.acquire_query_slot(source_db), \
+                        self.db_manager.get_connection_context(source_db, tag=query['name']) as src_conn:
+                    df = pd.read_sql(sql, src_conn, params=params)
+                column_types = None
+            else:
+                df, column_types = self._read_frame(source_db, sql, params, query_name=query['name'])
+        self.run_log.add_bytes(query['name'], estimate_frame_bytes(df))
+        return self._fill_null_values(df, column_types, query)
+
+    def _extract_partition(self, query: Dict[str, Any], sql: str, where_clause: Optional[str], params: list, source_db: str) -> tuple:
+        """擷取單一分區並累計擷取耗時 (各分區並行，耗時為各分區加總) 與讀取資料量"""
+        self._check_cancelled(query['name'])
+        with self.run_log.stage(query['name'], 'extract'):
+            df, column_types = self._read_partition(query, sql, where_clause, params, source_db)
+        self.run_log.add_bytes(query['name'], estimate_frame_bytes(df))
+        return df, column_types
+
+    def _read_partition(self, query: Dict[str, Any], sql: str, where_clause: Optional[str], params: list, source_db: str) -> tuple:
+        """
+        讀取單一分區；設定 page_size 與 key_columns 時以 keyset 分頁讀取
+
+        keyset 分頁每次只執行一個 TOP (page_size) 的短陳述式，避免單一陳述式長時間持有來源鎖定。
+
+        Returns:
+            (df, column_types)
+        """
+        partition = query['partition']
+        page_size = partition.get('page_size')
+        key_columns = partition.get('key_columns', [])
+
+        if not (page_size and key_columns):
+            return self._read_frame(source_db, build_filtered_sql(sql, where_clause), params, query_name=query['name'])
+
+        order_by = ", ".join(f"[{column}]" for column in key_columns)
+        frames = []
+        column_types = {}
+        last_key = None
+        while True:
+            page_where, page_params = where_clause, list(params)
+            if last_key is not None:
+                keyset_clause, keyset_params = build_keyset_predicate(key_columns, last_key)
+                page_where = f"({page_where}) AND ({keyset_clause})" if page_where else keyset_clause
+                page_params += keyset_params
+
+            page_sql = build_filtered_sql(sql, page_where, top=page_size, order_by=order_by)
+            page, column_types = self._read_frame(source_db, page_sql, page_params, query_name=query['name'])
+            if not page.empty:
+                frames.append(page)
+            if len(page) < page_size:
+                break
+            last_key = tuple(page.iloc[-1][key_columns])
+
+        if not frames:
+            return page, column_types
+        return pd.concat(frames, ignore_index=True), column_types
+
+    def _run_etl_partitioned(self, query: Dict[str, Any], sql: str, source_db: str, target_db: str) -> int:
+        """
+        分區並行執行單筆 ETL - 各分區子查詢並行擷取，完成後依序寫入同一目標表
+
+        並行數取 partition.max_workers、ETLConfig.PARTITION_WORKERS 與來源資料庫並行上限的最小值。
+        各分區子查詢 (與 keyset 分頁的每個陳述式) 與其他查詢共用來源資料庫的陳述式名額 (acquire_query_slot)，
+        多個分區查詢同時執行時，來源資料庫同時執行的陳述式數仍不超過上限。
+        """
+        name = query['name']
+        target_table = query['target_table']
+        source_type = name.split('_')[0].upper()
+        partition = query['partition']
+
+        predicates = build_partition_predicates(partition)
+        workers = min(partition.get('max_workers', self.etl_config.PARTITION_WORKERS),
+                      self.db_manager.get_query_limit(source_db), len(predicates))
+        workers = max(1, workers)
+
+        self.logger.info(f"處理查詢 (分區模式，{len(predicates)} 個分區，並行 {workers}): {name}")
+
+        sql_dtypes = build_sql_dtypes(query.get('columns', {}))
+        load_table = None
+        backup_name = None
+        batch_sizer = None
+        merge_counts = None
+        columns = None
+        row_hashes = [] if self._fingerprint_enabled(query) else None
+        processed = 0
+        null_counts = 0
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"etl-{name}") as executor:
+            futures = [
+                executor.submit(self._extract_partition, query, sql, where_clause, params, source_db)
+                for where_clause, params in predicates
+            ]
+            try:
+                for future in as_completed(futures):
+                    try:
+                        df, column_types = future.result()
+                    except Exception as e:
+                        self.logger.error(f"執行查詢 {name} 分區失敗: {e}")
+                        raise
+
+                    if df.empty:
+                        continue
+
+                    null_counts += int(df.isnull().sum().sum())
+                    df = self._order_for_load(self._transform_frame(df, column_types, query), query)
+                    columns = df.columns
+                    if row_hashes is not None:
+                        row_hashes.append(hash_result_rows(df))
+
+                    # 第一個有資料的分區完成後才開始載入 (寫入暫存表，或備份和清空表)
+                    create_statements = None
+                    if processed == 0:
+                        batch_sizer = self._create_batch_sizer(target_table, len(df.columns))
+                        load_table, backup_name = self._begin_load(query, target_db, target_table)
+                        create_statements = self._build_table_ddl(query, target_db, target_table, load_table, df.columns)
+
+                    mode = 'replace' if processed == 0 else 'append'
+                    with self.run_log.stage(name, 'load'):
+                        self.db_manager.bulk_write(target_db, load_table, df, if_exists=mode, dtype=sql_dtypes,
+                                                   batch_sizer=batch_sizer, create_statements=create_statements)
+                    processed += len(df)
+                    self.logger.info(f"進度: 已匯入 {processed} 筆")
+
+                if load_table is not None:
+                    with self.run_log.stage(name, 'load'):
+                        merge_counts = self._finish_load(query, target_db, target_table, load_table)
+
+            except Exception as e:
+                for future in futures:
+                    future.cancel()
+                self.logger.error(f"匯入資料至 {target_table} 失敗: {e}")
+
+                # 刪除暫存表或還原備份 (如果有)
+                if load_table is not None:
+                    self._abort_load(target_db, target_table, load_table, backup_name)
+                raise
+
+        if processed == 0:
+            self.logger.warning(f"查詢 {name} 未返回任何資料")
+            self._record_query_result(target_db, source_type, name, target_table, 0)
+            return 0
+
+        if null_counts > 0:
+            self.logger.warning(f"查詢 {name} 包含 {null_counts} 個NULL值")
+        self.logger.info(f"已匯入總計 {processed} 筆至 {target_table}")
+        self._save_batch_sizer(batch_sizer)
+
+        fingerprint = (combine_result_fingerprint(columns, row_hashes, self._load_definition(query, sql))
+                       if row_hashes is not None else None)
+        self._record_query_result(target_db, source_type, name, target_table, processed,
+                                  etl_status='MERGED' if merge_counts else 'LOADED',
+                                  fingerprint=fingerprint, merge_counts=merge_counts)
+        return processed
+
+    def _record_query_result(self, target_db: str, source_type: str, query_name: str, target_table: str, row_count: int,
+                             etl_status: str = None, fingerprint: str = None, merge_counts: Dict[str, int] = None):
+        """
+        記錄單個查詢的執行結果
+
+        etl_status: LOADED / UNCHANGED / MERGED / ROLLED_BACK，fingerprint: 目標表內容的結果指紋 (增量載入不記錄)，
+        merge_counts: merge 模式的新增/更新/刪除筆數
+
+        記錄先暫存於執行記錄收集器，每隔 RUN_LOG_FLUSH_SECONDS 與執行結束時 (flush_run_log) 批次寫入 target_db 的 ETL_SUMMARY。
+        """
+        self.run_log.target_db = target_db
+        self.run_log.record_query(source_type, query_name, target_table, row_count,
+                                  etl_status=etl_status, fingerprint=fingerprint, merge_counts=merge_counts)
+    
+    def _get_last_fingerprint(self, target_db: str, query_name: str, target_table: str) -> Optional[str]:
+        """取得查詢最近一次執行記錄的結果指紋 (最近一次未記錄指紋時回傳 None)"""
+        table_name = self.etl_config.ETL_SUMMARY_TABLE
+        try:
+            with self.db_manager.get_engine_context(target_db) as engine:
+                with engine.connect() as conn:
+                    row = conn.execute(text(self.db_manager.dialect_sql(
+                        target_db,
+                        f"SELECT TOP 1 [RESULT_FINGERPRINT] FROM {table_name} "
+                        "WHERE [QUERY_NAME] = :query_name AND [TARGET_TABLE] = :target_table AND [SUMMARY_TYPE] = 'QUERY' "
+                        "ORDER BY id DESC"
+                    )), {'query_name': query_name, 'target_table': target_table}).fetchone()
+            return row[0] if row else None
         except Exception as e:
-            self.logger.warning(f"記錄查詢執行結果失敗: {e}")
+            self.logger.warning(f"讀取查詢 {query_name} 的結果指紋失敗: {e}")
+            return None
     
     def _restore_from_backup(self, target_db: str, table_name: str, backup_name: str):
         """從備份還原表"""
@@ -263,42 +1117,45 @@ class ETLProcessor:
                     
                     # 從備份還原
                     conn.execute(text(f"SELECT * INTO {table_name} FROM {backup_name}"))
+            self.db_manager.invalidate_catalog(target_db, table_name)
             
             self.logger.info(f"已還原 {table_name} 從備份 {backup_name}")
         except Exception as restore_err:
             self.logger.error(f"還原備份失敗: {restore_err}")
     
     def record_etl_summary(self, target_db: str, mes_status: str, sap_status: str, mes_rows: int, sap_rows: int):
-        """記錄整體ETL執行摘要"""
-        try:
-            table_name = self.etl_config.ETL_SUMMARY_TABLE
-            with self.db_manager.get_engine_context(target_db) as engine:
-                with engine.begin() as conn:
-                    stmt = text(
-                        f"INSERT INTO {table_name} ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE], "
-                        "[SUMMARY_TYPE], [ETL_STATUS], [mes_status], [sap_status], [mes_rows], [sap_rows])"
-                        " VALUES (GETDATE(), 'ALL', 'ETL_COMPLETE', 'ALL_TABLES', :total_rows, GETDATE(), "
-                        "'SUMMARY', 'COMPLETE', :mes_status, :sap_status, :mes_rows, :sap_rows)"
-                    )
-                    params = {
-                        'total_rows': mes_rows + sap_rows,
-                        'mes_status': mes_status,
-                        'sap_status': sap_status,
-                        'mes_rows': mes_rows,
-                        'sap_rows': sap_rows
-                    }
-                    conn.execute(stmt, params)
-            self.logger.info("已記錄ETL執行摘要")
-        except Exception as e:
-            self.logger.warning(f"記錄ETL執行摘要失敗: {e}")
+        """記錄整體ETL執行摘要 (與各查詢記錄一併於 flush_run_log 時寫入)"""
+        self.run_log.target_db = target_db
+        self.run_log.record_summary(mes_status, sap_status, mes_rows, sap_rows)
+
+    def flush_run_log(self) -> int:
+        """
+        將本次執行暫存的所有 ETL_SUMMARY 記錄以單一交易寫入
+
+        Returns:
+            寫入筆數
+        """
+        return self.run_log.flush()
     
-    def run_queries(self, queries: list, source_db: str, target_db: str) -> tuple:
+    def run_queries(self, queries: list, source_db: str, target_db: str, max_workers: int = None) -> tuple:
         """
         執行一組查詢
         
+        Args:
+            queries: 查詢配置列表
+            source_db: 來源資料庫名稱
+            target_db: 目標資料庫名稱
+            max_workers: 並行工作執行緒數，未指定時使用 ETLConfig.QUERY_WORKERS
+        
         Returns:
             (status, total_rows): 狀態和總記錄數
         """
+        max_workers = max_workers or self.etl_config.QUERY_WORKERS
+        if max_workers > 1 and len(queries) > 1:
+            # 以 asyncio 執行引擎並行執行，同一來源資料庫的並行查詢數受其並行上限限制
+            runner = AsyncETLRunner(self, max_workers)
+            return runner.run(runner.run_queries, queries, source_db, target_db)
+        
         total_rows = 0
         status = '成功'
         
@@ -317,6 +1174,24 @@ class ETLProcessor:
         return status, total_rows
 
 
+def run_source_pipeline(etl_processor: ETLProcessor, db_manager: DatabaseManager, logger: logging.Logger,
+                        source_label: str, queries: list, source_db: str, target_db: str = 'tableau_db') -> tuple:
+    """
+    執行單一來源的 ETL 流程 (連線測試 + 執行查詢)
+    
+    Returns:
+        (status, rows): 狀態和處理筆數
+    """
+    if not db_manager.test_connection(source_db):
+        logger.error(f"無法執行 {source_label} ETL: {source_label} 資料庫連線失敗")
+        return '失敗', 0
+    
+    logger.info(f'開始 {source_label} ETL 流程...')
+    status, rows = etl_processor.run_queries(queries, source_db, target_db)
+    logger.info(f"{source_label} ETL 完成，處理 {rows} 筆資料")
+    return status, rows
+
+
 def main():
     """主程式入口"""
     # 解析命令列參數
@@ -326,16 +1201,52 @@ def main():
     parser.add_argument('--sap', action='store_true', help='只執行 SAP ETL')
     parser.add_argument('--debug', action='store_true', help='啟用詳細的除錯訊息')
     parser.add_argument('--config', help='指定配置檔案路徑', default='db.json')
+    parser.add_argument('--stream', action='store_true', help='以串流分批模式執行所有查詢 (降低記憶體用量)')
+    parser.add_argument('--workers', type=int, help='並行執行查詢的工作執行緒數 (預設依序執行)')
+    parser.add_argument('--parallel-sources', action='store_true', help='同時執行 MES 與 SAP 流程')
+    parser.add_argument('--query-timeout', type=int, help='單一查詢的逾時秒數，逾時即取消 (僅並行執行時有效)')
+    parser.add_argument('--full-reload', action='store_true', help='忽略高水位與結果指紋，完整重新載入所有查詢')
+    parser.add_argument('--fetch-engine', choices=['pandas', 'columnar', 'arrow'], help='來源資料擷取引擎')
+    parser.add_argument('--pipeline', action='store_true', help='串流模式下擷取與寫入重疊執行')
+    parser.add_argument('--use-cache', action='store_true', help='使用本機擷取快取 (有效期限內不重新查詢來源)')
+    parser.add_argument('--query', action='append', help='只執行指定名稱的查詢 (可重複指定)')
+    parser.add_argument('--load-mode', choices=['swap', 'truncate', 'merge'],
+                        help='完整載入方式 (swap: 暫存表切換，truncate: 備份並清空，merge: 依主鍵合併)')
+    parser.add_argument('--rollback', action='append', metavar='TABLE', help='將目標表回復為上一次 swap 載入前的版本 (可重複指定)')
+    parser.add_argument('--offline', choices=['sqlite', 'duckdb'],
+                        help='改用本機離線後端 (資料由 offline_data.py 產生，不連線 SQL Server)')
+    parser.add_argument('--data-dir', help='離線資料庫檔案目錄 (預設為 ETLConfig.OFFLINE_DATA_DIR)')
     args = parser.parse_args()
     
     # 設定日誌
     logger = setup_logging(args.debug)
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
     
     # 初始化配置管理器
     try:
         config_manager = get_config_manager()
         if args.config != 'db.json':
             config_manager.db_config_file = args.config
+        if args.stream:
+            config_manager.etl_config.STREAMING_ENABLED = True
+        if args.workers:
+            config_manager.etl_config.QUERY_WORKERS = args.workers
+        if args.query_timeout:
+            config_manager.etl_config.QUERY_TIMEOUT_SECONDS = args.query_timeout
+        if args.full_reload:
+            config_manager.etl_config.FULL_RELOAD = True
+        if args.fetch_engine:
+            config_manager.etl_config.FETCH_ENGINE = args.fetch_engine
+        if args.pipeline:
+            config_manager.etl_config.PIPELINE_ENABLED = True
+        if args.use_cache:
+            config_manager.etl_config.EXTRACT_CACHE_ENABLED = True
+        if args.load_mode:
+            config_manager.etl_config.LOAD_MODE = args.load_mode
+        if args.offline:
+            config_manager.etl_config.OFFLINE_BACKEND = args.offline
+        if args.data_dir:
+            config_manager.etl_config.OFFLINE_DATA_DIR = args.data_dir
         
         # 驗證配置
         if not config_manager.validate_config():
@@ -354,6 +1265,23 @@ def main():
     logger.info(f"ETL 程序啟動 - {datetime.datetime.now():%Y-%m-%d %H:%M:%S}")
     
     try:
+        # 回復模式：只將指定的目標表切換回上一版本
+        if args.rollback:
+            etl_processor.ensure_etl_summary_table('tableau_db')
+            restored = [etl_processor.restore_previous_version('tableau_db', table) for table in args.rollback]
+            etl_processor.flush_run_log()
+            if not all(restored):
+                sys.exit(1)
+            return
+        
+        # 同時預檢目標與本次要執行的來源資料庫，結果由後續的連線測試沿用
+        source_dbs = [db_name for selected, db_name in ((args.all or args.mes, 'mes_db'), (args.all or args.sap, 'sap_db'))
+                      if selected]
+        health = db_manager.preflight(['tableau_db'] + source_dbs)
+        if not health['tableau_db']:
+            logger.error("無法連接目標資料庫 tableau_db，終止程式")
+            sys.exit(1)
+        
         # 確保 ETL_SUMMARY 表結構正確
         etl_processor.ensure_etl_summary_table('tableau_db')
         
@@ -361,30 +1289,33 @@ def main():
         query_metadata = config_manager.load_query_metadata()
         mes_queries = config_manager.get_queries_by_type('mes')
         sap_queries = config_manager.get_queries_by_type('sap')
+        if args.query:
+            mes_queries = [q for q in mes_queries if q['name'] in args.query]
+            sap_queries = [q for q in sap_queries if q['name'] in args.query]
         logger.info(f"已載入查詢定義: MES={len(mes_queries)}個, SAP={len(sap_queries)}個")
         
         mes_status = sap_status = '跳過'
         mes_rows = sap_rows = 0
         
-        # 執行 MES ETL
+        pipelines = {}
         if args.all or args.mes:
-            if db_manager.test_connection('mes_db'):
-                logger.info('開始 MES ETL 流程...')
-                mes_status, mes_rows = etl_processor.run_queries(mes_queries, 'mes_db', 'tableau_db')
-                logger.info(f"MES ETL 完成，處理 {mes_rows} 筆資料")
-            else:
-                logger.error("無法執行 MES ETL: MES 資料庫連線失敗")
-                mes_status = '失敗'
-        
-        # 執行 SAP ETL
+            pipelines['MES'] = (mes_queries, 'mes_db')
         if args.all or args.sap:
-            if db_manager.test_connection('sap_db'):
-                logger.info('開始 SAP ETL 流程...')
-                sap_status, sap_rows = etl_processor.run_queries(sap_queries, 'sap_db', 'tableau_db')
-                logger.info(f"SAP ETL 完成，處理 {sap_rows} 筆資料")
-            else:
-                logger.error("無法執行 SAP ETL: SAP 資料庫連線失敗")
-                sap_status = '失敗'
+            pipelines['SAP'] = (sap_queries, 'sap_db')
+        
+        results = {}
+        if args.parallel_sources and len(pipelines) > 1:
+            # MES 與 SAP 為獨立伺服器，同時執行以縮短總執行時間
+            logger.info('同時執行 MES 與 SAP ETL 流程...')
+            runner = AsyncETLRunner(etl_processor)
+            results = runner.run(runner.run_sources, pipelines, 'tableau_db')
+        else:
+            for label, (queries, source_db) in pipelines.items():
+                results[label] = run_source_pipeline(etl_processor, db_manager, logger,
+                                                     label, queries, source_db)
+        
+        mes_status, mes_rows = results.get('MES', (mes_status, mes_rows))
+        sap_status, sap_rows = results.get('SAP', (sap_status, sap_rows))
         
         logger.info('='*60)
         logger.info(f"ETL 執行結果 - MES: {mes_status} ({mes_rows}筆), SAP: {sap_status} ({sap_rows}筆)")
@@ -404,6 +1335,9 @@ def main():
         sys.exit(1)
     
     finally:
+        # 寫入本次執行的記錄 (包含失敗時已完成與失敗的查詢)
+        etl_processor.flush_run_log()
+
         # 清理資源
         db_manager.close_connections()
         sql_loader.clear_cache()
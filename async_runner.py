@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Callable, Optional
+
+
+class QueryCancelledError(Exception):
+    """查詢已被取消 (逾時或整體執行中止)"""
+
+
+class AsyncETLRunner:
+    """
+    以 asyncio 協調多個查詢的 ETL 執行 - 單一行程內可同時處理多個來源資料庫的查詢
+
+    pyodbc 為阻塞式驅動程式，每筆 ETLProcessor.run_etl 於有界的工作執行緒池中執行；
+    各來源資料庫的並行查詢數以 asyncio.Semaphore 限制 (上限同 DatabaseManager.get_query_limit)，
+    等待名額的查詢不佔用工作執行緒。
+
+    逾時或取消時通知 ETLProcessor 取消執行中的來源陳述式 (cursor.cancel)，其餘階段於下一個階段邊界
+    (擷取分區、轉換批次、開始或完成載入前) 停止，並等待工作執行緒完成暫存表清理或備份還原後才釋放名額；
+    離開時關閉工作執行緒池。
+    """
+
+    def __init__(self, etl_processor, max_workers: int = None, query_timeout: float = None):
+        self.processor = etl_processor
+        self.db_manager = etl_processor.db_manager
+        self.etl_config = etl_processor.etl_config
+        self.max_workers = max(1, max_workers or self.etl_config.ASYNC_MAX_WORKERS)
+        self.query_timeout = query_timeout if query_timeout is not None else self.etl_config.QUERY_TIMEOUT_SECONDS
+        self.logger = logging.getLogger("AsyncETLRunner")
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self):
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="etl-async")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        # 各查詢於取消時已等待其工作執行緒結束，此處只需關閉執行緒池
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        self._semaphores.clear()
+
+    def run(self, coroutine_function: Callable, *args) -> Any:
+        """
+        同步執行本類別的協程方法 (例如 runner.run(runner.run_queries, queries, source_db, target_db))
+
+        於新的事件迴圈中建立工作執行緒池、執行協程並關閉執行緒池。
+        """
+        async def main():
+            async with self:
+                return await coroutine_function(*args)
+        return asyncio.run(main())
+
+    def _semaphore(self, db_name: str) -> asyncio.Semaphore:
+        """取得資料庫的並行查詢名額"""
+        if db_name not in self._semaphores:
+            self._semaphores[db_name] = asyncio.Semaphore(self.db_manager.get_query_limit(db_name))
+        return self._semaphores[db_name]
+
+    async def _call(self, func: Callable, *args) -> Any:
+        """於工作執行緒池執行阻塞式呼叫"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def run_query(self, query: Dict[str, Any], source_db: str, target_db: str) -> int:
+        """
+        執行單筆 ETL，逾時 (query_metadata.json 的 timeout_seconds，預設 QUERY_TIMEOUT_SECONDS，0 表示不限) 時取消
+
+        Raises:
+            TimeoutError: 查詢逾時且已取消
+        """
+        name = query['name']
+        timeout = query.get('timeout_seconds', self.query_timeout) or None
+
+        async with self._semaphore(source_db):
+            self.logger.debug(f"執行查詢: {name}")
+            future = asyncio.get_running_loop().run_in_executor(
+                self._executor, self.processor.run_etl, query, source_db, target_db
+            )
+            try:
+                return await asyncio.wait_for(asyncio.shield(future), timeout)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"查詢 {name} 超過 {timeout} 秒，取消執行")
+                self.processor.cancel_query(name)
+                await self._drain(future)
+                if future.exception() is None:
+                    # 取消前已完成
+                    return future.result()
+                raise TimeoutError(f"查詢 {name} 超過 {timeout} 秒，已取消") from None
+            except asyncio.CancelledError:
+                self.processor.cancel_query(name)
+                await self._drain(future)
+                raise
+
+    async def _drain(self, future: asyncio.Future):
+        """等待已取消查詢的工作執行緒結束 (期間再次收到取消仍繼續等待，避免遺留執行中的載入)"""
+        while not future.done():
+            try:
+                await asyncio.wait({future})
+            except asyncio.CancelledError:
+                continue
+
+    async def run_queries(self, queries: list, source_db: str, target_db: str) -> tuple:
+        """
+        同時執行一組查詢 (單一查詢失敗不會中斷其他查詢)
+
+        Returns:
+            (status, total_rows): 狀態和成功查詢的總記錄數
+        """
+        self.logger.info(f"並行執行 {len(queries)} 個查詢 (工作執行緒 {self.max_workers} 個，"
+                         f"{source_db} 並行上限 {self.db_manager.get_query_limit(source_db)})")
+
+        results = await asyncio.gather(
+            *(self.run_query(query, source_db, target_db) for query in queries),
+            return_exceptions=True
+        )
+
+        total_rows = 0
+        status = '成功'
+        for query, result in zip(queries, results):
+            if isinstance(result, BaseException):
+                self.logger.error(f"執行查詢 {query['name']} 失敗: {result}")
+                status = '失敗'
+            else:
+                total_rows += result
+
+        self.logger.info(f"已完成所有查詢，處理 {total_rows} 筆資料")
+        return status, total_rows
+
+    async def run_source(self, source_label: str, queries: list, source_db: str, target_db: str) -> tuple:
+        """
+        執行單一來源的 ETL 流程 (連線測試 + 執行查詢)
+
+        Returns:
+            (status, rows): 狀態和處理筆數
+        """
+        if not await self._call(self.db_manager.test_connection, source_db):
+            self.logger.error(f"無法執行 {source_label} ETL: {source_label} 資料庫連線失敗")
+            return '失敗', 0
+
+        self.logger.info(f'開始 {source_label} ETL 流程...')
+        status, rows = await self.run_queries(queries, source_db, target_db)
+        self.logger.info(f"{source_label} ETL 完成，處理 {rows} 筆資料")
+        return status, rows
+
+    async def run_sources(self, pipelines: Dict[str, tuple], target_db: str = 'tableau_db') -> Dict[str, tuple]:
+        """
+        同時執行多個來源的 ETL 流程
+
+        Args:
+            pipelines: {來源標籤: (查詢配置列表, 來源資料庫名稱)}
+
+        Returns:
+            {來源標籤: (status, rows)}
+        """
+        labels = list(pipelines)
+        results = await asyncio.gather(
+            *(self.run_source(label, queries, source_db, target_db)
+              for label, (queries, source_db) in pipelines.items()),
+            return_exceptions=True
+        )
+
+        outcome = {}
+        for label, result in zip(labels, results):
+            if isinstance(result, BaseException):
+                self.logger.error(f"{label} ETL 流程執行失敗: {result}")
+                outcome[label] = ('失敗', 0)
+            else:
+                outcome[label] = result
+        return outcome
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+from sqlalchemy import text
+from typing import Dict, Any, Optional
+
+from database import DatabaseManager
+
+
+class AdaptiveBatchSizer:
+    """
+    目標表寫入的自我調整批次大小 - 依每批的寫入速度 (筆/秒) 放大或縮小下一批的大小
+
+    以爬山法調整：速度未明顯下降時沿原方向調整，下降超過容許比例時反轉方向。
+    不足一批的資料 (最後一批，或串流/分區載入時小於批次大小的整個區塊) 只計入統計、不參與調整，
+    同一次載入的多個區塊共用一個控制器，記錄的最佳批次大小供下次執行沿用。
+    """
+
+    def __init__(self, table_name: str, initial_size: int, min_size: int, max_size: int,
+                 step: float = 1.5, tolerance: float = 0.05):
+        self.table_name = table_name
+        self.min_size = max(1, min_size)
+        self.max_size = max(self.min_size, max_size)
+        self.step = step
+        self.tolerance = tolerance
+        self.size = self._clamp(initial_size)
+        self.logger = logging.getLogger("AdaptiveBatchSizer")
+
+        self._direction = 1
+        self._last_rate = None
+        self.best_size = self.size
+        self.best_rate = None
+        self.batches = 0
+        self.total_rows = 0
+        self.total_seconds = 0.0
+
+    def _clamp(self, size: int) -> int:
+        return max(self.min_size, min(self.max_size, int(size)))
+
+    def record(self, rows: int, seconds: float):
+        """記錄一批的寫入筆數與耗時，並決定下一批的大小"""
+        self.batches += 1
+        self.total_rows += rows
+        self.total_seconds += seconds
+        if rows <= 0 or seconds <= 0:
+            return
+
+        rate = rows / seconds
+        self.logger.debug(f"{self.table_name} 批次 {rows} 筆，{rate:.0f} 筆/秒")
+        if rows < self.size:
+            return
+
+        if self.best_rate is None or rate > self.best_rate:
+            self.best_size, self.best_rate = self.size, rate
+
+        if self._last_rate is not None and rate < self._last_rate * (1 - self.tolerance):
+            self._direction = -self._direction
+        self._last_rate = rate
+
+        next_size = self.size * self.step if self._direction > 0 else self.size / self.step
+        self.size = self._clamp(next_size)
+
+    @property
+    def average_rate(self) -> float:
+        """平均寫入速度 (筆/秒)"""
+        return self.total_rows / self.total_seconds if self.total_seconds > 0 else 0.0
+
+
+class BatchSizeStore:
+    """批次大小學習值管理器 - 將每個目標表的最佳批次大小保存於目標資料庫"""
+
+    def __init__(self, db_manager: DatabaseManager, target_db: str = 'tableau_db'):
+        self.db_manager = db_manager
+        self.etl_config = db_manager.etl_config
+        self.target_db = target_db
+        self.logger = logging.getLogger("BatchSizeStore")
+        self._table_ready = False
+
+    def ensure_table(self):
+        """確保批次大小表存在"""
+        if self._table_ready:
+            return
+
+        table_name = self.etl_config.ETL_BATCH_TUNING_TABLE
+        if self.db_manager.get_backend(self.target_db) is None:
+            sql = f"""
+            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{table_name}')
+            BEGIN
+                CREATE TABLE {table_name} (
+                    [TARGET_TABLE] NVARCHAR(255) NOT NULL PRIMARY KEY,
+                    [BATCH_SIZE] INT NOT NULL,
+                    [ROWS_PER_SECOND] FLOAT NULL,
+                    [UPDATED_AT] DATETIME DEFAULT GETDATE()
+                )
+            END
+            """
+        else:
+            # 離線後端 (SQLite/DuckDB) 沒有 IF ... BEGIN 區塊
+            sql = self.db_manager.dialect_sql(self.target_db, f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                [TARGET_TABLE] VARCHAR(255) NOT NULL PRIMARY KEY,
+                [BATCH_SIZE] INTEGER NOT NULL,
+                [ROWS_PER_SECOND] DOUBLE NULL,
+                [UPDATED_AT] TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+        with self.db_manager.get_engine_context(self.target_db) as engine:
+            with engine.begin() as conn:
+                conn.execute(text(sql))
+        self.db_manager.invalidate_catalog(self.target_db, table_name)
+        self._table_ready = True
+
+    def get(self, target_table: str) -> Optional[int]:
+        """取得目標表上次學習的批次大小，尚未記錄時回傳 None"""
+        self.ensure_table()
+        table_name = self.etl_config.ETL_BATCH_TUNING_TABLE
+        with self.db_manager.get_engine_context(self.target_db) as engine:
+            with engine.connect() as conn:
+                return conn.execute(
+                    text(f"SELECT [BATCH_SIZE] FROM {table_name} WHERE [TARGET_TABLE] = :target_table"),
+                    {'target_table': target_table}
+                ).scalar()
+
+    def create_sizer(self, target_table: str, column_count: int) -> AdaptiveBatchSizer:
+        """
+        建立目標表的批次大小控制器
+
+        上限為 ADAPTIVE_BATCH_MAX_ROWS 與 ADAPTIVE_BATCH_MAX_CELLS / 欄位數的較小值，
+        因此欄位多的寬表每批列數較少；初始值為上次學習的批次大小 (沒有時為 BULK_BATCH_ROWS)。
+        """
+        try:
+            initial_size = self.get(target_table)
+        except Exception as e:
+            self.logger.warning(f"讀取 {target_table} 的批次大小失敗: {e}")
+            initial_size = None
+
+        max_size = min(self.etl_config.ADAPTIVE_BATCH_MAX_ROWS,
+                       self.etl_config.ADAPTIVE_BATCH_MAX_CELLS // max(1, column_count))
+        sizer = AdaptiveBatchSizer(
+            target_table,
+            initial_size or self.etl_config.BULK_BATCH_ROWS,
+            self.etl_config.ADAPTIVE_BATCH_MIN_ROWS,
+            max_size
+        )
+        self.logger.info(f"目標表 {target_table} 初始批次大小 {sizer.size} 筆 (範圍 {sizer.min_size}-{sizer.max_size})")
+        return sizer
+
+    def save(self, sizer: AdaptiveBatchSizer):
+        """保存控制器學習到的最佳批次大小並記錄寫入速度"""
+        if sizer.batches == 0:
+            return
+
+        self.logger.info(
+            f"目標表 {sizer.table_name} 寫入 {sizer.batches} 批，平均 {sizer.average_rate:.0f} 筆/秒，"
+            f"最佳批次大小 {sizer.best_size} 筆"
+            + (f" ({sizer.best_rate:.0f} 筆/秒)" if sizer.best_rate else "")
+        )
+        if sizer.best_rate is None:
+            # 沒有完整批次可比較時 (資料或區塊都小於批次大小) 不更新學習值
+            return
+
+        table_name = self.etl_config.ETL_BATCH_TUNING_TABLE
+        if self.db_manager.get_backend(self.target_db) is None:
+            sql = f"""
+            MERGE {table_name} AS t
+            USING (SELECT :target_table AS [TARGET_TABLE]) AS s
+            ON t.[TARGET_TABLE] = s.[TARGET_TABLE]
+            WHEN MATCHED THEN
+                UPDATE SET [BATCH_SIZE] = :batch_size, [ROWS_PER_SECOND] = :rows_per_second, [UPDATED_AT] = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT ([TARGET_TABLE], [BATCH_SIZE], [ROWS_PER_SECOND], [UPDATED_AT])
+                VALUES (:target_table, :batch_size, :rows_per_second, GETDATE());
+            """
+        else:
+            # 離線後端以 INSERT ... ON CONFLICT 代替 MERGE
+            sql = self.db_manager.dialect_sql(self.target_db, f"""
+            INSERT INTO {table_name} ([TARGET_TABLE], [BATCH_SIZE], [ROWS_PER_SECOND], [UPDATED_AT])
+            VALUES (:target_table, :batch_size, :rows_per_second, GETDATE())
+            ON CONFLICT ([TARGET_TABLE]) DO UPDATE SET [BATCH_SIZE] = excluded.[BATCH_SIZE],
+                [ROWS_PER_SECOND] = excluded.[ROWS_PER_SECOND], [UPDATED_AT] = excluded.[UPDATED_AT]
+            """)
+        params: Dict[str, Any] = {
+            'target_table': sizer.table_name,
+            'batch_size': sizer.best_size,
+            'rows_per_second': round(sizer.best_rate, 1)
+        }
+        try:
+            self.ensure_table()
+            with self.db_manager.get_engine_context(self.target_db) as engine:
+                with engine.begin() as conn:
+                    conn.execute(text(sql), params)
+        except Exception as e:
+            self.logger.warning(f"保存 {sizer.table_name} 的批次大小失敗: {e}")
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import datetime
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional
+
+from config import get_config_manager, get_etl_config
+from database import DatabaseManager
+from sql_loader import SQLLoader
+from run_log import get_peak_memory_mb
+from offline_data import seed_offline_databases, parse_row_count
+from app import ETLProcessor
+
+
+# 報告的階段名稱對應 RunLog 記錄的階段耗時欄位 (NULL 填充屬於轉換階段)
+BENCHMARK_STAGES = {'fetch': 'EXTRACT_MS', 'null_fill': 'TRANSFORM_MS', 'backup': 'BACKUP_MS', 'load': 'LOAD_MS'}
+DEFAULT_BATCH_SIZES = "1000,10000,50000"
+REPORT_VERSION = 1
+
+
+def _rate(rows: int, seconds: float) -> Optional[float]:
+    """每秒筆數 (耗時為 0 時回傳 None)"""
+    return round(rows / seconds, 1) if rows and seconds > 0 else None
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    執行單一基準案例 (查詢 × 批次大小)
+
+    於獨立的子行程執行，記憶體高峰 (ru_maxrss) 只反映該案例；各階段耗時取自 ETLProcessor 的 RunLog 記錄。
+    """
+    config_manager = get_config_manager()
+    etl_config = config_manager.etl_config
+    for key, value in case['settings'].items():
+        setattr(etl_config, key, value)
+    logging.basicConfig(level=case['log_level'], format=etl_config.LOG_FORMAT)
+    logging.getLogger().setLevel(case['log_level'])
+
+    query = case['query']
+    baseline_rss = get_peak_memory_mb()
+    db_manager = DatabaseManager(config_manager)
+    processor = ETLProcessor(config_manager, db_manager, SQLLoader(config_manager), logging.getLogger("ETL_Benchmark"))
+    error = None
+    started = time.perf_counter()
+    try:
+        rows = processor.run_etl(query, case['source_db'], 'tableau_db')
+    except Exception as e:
+        rows = 0
+        error = str(e)
+    finally:
+        total_seconds = time.perf_counter() - started
+        db_manager.close_connections()
+
+    record = next((record for record in reversed(processor.run_log.pending_records())
+                   if record.get('QUERY_NAME') == query['name']), {})
+    stages = {}
+    for stage, column in BENCHMARK_STAGES.items():
+        seconds = (record.get(column) or 0) / 1000
+        stages[stage] = {'seconds': round(seconds, 3), 'rows_per_second': _rate(rows, seconds)}
+
+    result = {
+        'query': query['name'],
+        'batch_size': etl_config.BULK_BATCH_ROWS,
+        'status': 'failed' if error else 'ok',
+        'rows': rows,
+        'total_seconds': round(total_seconds, 3),
+        'rows_per_second': _rate(rows, total_seconds),
+        'stages': stages,
+        'bytes_read': record.get('BYTES_READ'),
+        'baseline_rss_mb': baseline_rss,
+        'peak_rss_mb': get_peak_memory_mb(),
+    }
+    if error:
+        result['error'] = error
+    return result
+
+
+def compare_with_baseline(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[Dict[str, Any]]:
+    """
+    與基準報告比較各案例的整體每秒筆數
+
+    Returns:
+        速度低於基準 (1 - max_regression) 倍的案例
+    """
+    previous = {(result['query'], result['batch_size']): result for result in baseline.get('results', [])}
+    regressions = []
+    for result in report['results']:
+        before = previous.get((result['query'], result['batch_size']))
+        if not before or not before.get('rows_per_second') or not result.get('rows_per_second'):
+            continue
+        ratio = result['rows_per_second'] / before['rows_per_second']
+        if ratio < 1 - max_regression:
+            regressions.append({
+                'query': result['query'],
+                'batch_size': result['batch_size'],
+                'baseline_rows_per_second': before['rows_per_second'],
+                'rows_per_second': result['rows_per_second'],
+                'ratio': round(ratio, 3),
+            })
+    return regressions
+
+
+def main():
+    """命令列入口：產生離線資料並逐一執行基準案例，輸出 JSON 報告"""
+    parser = argparse.ArgumentParser(description='ETL 端對端吞吐量基準測試 (SQLite/DuckDB 離線後端)')
+    parser.add_argument('--rows', type=parse_row_count, default='10k', help='MES 來源資料列數 (例如 10k、1M、10M)')
+    parser.add_argument('--backend', choices=['sqlite', 'duckdb'], default='sqlite', help='離線後端')
+    parser.add_argument('--batch-sizes', default=DEFAULT_BATCH_SIZES, help='載入階段的批次大小，以逗號分隔')
+    parser.add_argument('--query', action='append', help='只測試指定名稱的查詢 (可重複指定，預設為全部)')
+    parser.add_argument('--load-mode', choices=['swap', 'truncate'], default='truncate',
+                        help='完整載入方式 (truncate 才會計時備份階段)')
+    parser.add_argument('--fetch-engine', choices=['pandas', 'columnar', 'arrow'], help='來源資料擷取引擎')
+    parser.add_argument('--stream', action='store_true', help='以串流分批模式執行')
+    parser.add_argument('--seed', type=int, default=0, help='亂數種子')
+    parser.add_argument('--data-dir', default='benchmark_data', help='離線資料庫檔案目錄')
+    parser.add_argument('--reuse-data', action='store_true', help='沿用目錄中已產生的來源資料 (須為相同規模與種子)')
+    parser.add_argument('--output', help='JSON 報告輸出路徑 (預設輸出至標準輸出)')
+    parser.add_argument('--baseline', help='比較用的前次 JSON 報告；速度退步超過門檻時結束代碼為 1')
+    parser.add_argument('--max-regression', type=float, default=0.2, help='容許的速度退步比例 (預設 0.2)')
+    parser.add_argument('--debug', action='store_true', help='顯示 ETL 執行日誌')
+    args = parser.parse_args()
+
+    etl_config = get_etl_config()
+    log_level = logging.DEBUG if args.debug else logging.WARNING
+    logging.basicConfig(level=logging.INFO, format=etl_config.LOG_FORMAT)
+    logger = logging.getLogger("ETL_Benchmark")
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',') if size.strip()]
+    config_manager = get_config_manager()
+    etl_config.OFFLINE_BACKEND = args.backend
+    etl_config.OFFLINE_DATA_DIR = args.data_dir
+    queries = config_manager.load_query_metadata()['queries']
+    if args.query:
+        queries = [query for query in queries if query['name'] in args.query]
+        if not queries:
+            logger.error(f"找不到指定的查詢: {', '.join(args.query)}")
+            sys.exit(1)
+
+    # 產生來源資料並清除前次的目標資料庫
+    db_manager = DatabaseManager(config_manager)
+    try:
+        generate_seconds = None
+        source_rows = None
+        if not args.reuse_data:
+            started = time.perf_counter()
+            source_rows = seed_offline_databases(db_manager, seed=args.seed, rows=args.rows)
+            generate_seconds = round(time.perf_counter() - started, 3)
+        target_path = config_manager.get_db_config('tableau_db')['path']
+    finally:
+        db_manager.close_connections()
+    if os.path.exists(target_path):
+        os.remove(target_path)
+
+    # 固定批次大小並關閉會略過載入或改變批次的功能，使每個案例的工作量相同；
+    # 各階段耗時由 RunLog 暫存的記錄讀取，不中途寫入 ETL_SUMMARY
+    settings = {
+        'OFFLINE_BACKEND': args.backend,
+        'OFFLINE_DATA_DIR': args.data_dir,
+        'ADAPTIVE_BATCH_ENABLED': False,
+        'SKIP_UNCHANGED_LOADS': False,
+        'EXTRACT_CACHE_ENABLED': False,
+        'FULL_RELOAD': True,
+        'RUN_LOG_FLUSH_SECONDS': sys.maxsize,
+        'STREAMING_ENABLED': args.stream,
+        'FETCH_ENGINE': args.fetch_engine or etl_config.FETCH_ENGINE,
+    }
+    report = {
+        'version': REPORT_VERSION,
+        'started_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': args.backend,
+        'scale_rows': args.rows,
+        'seed': args.seed,
+        'load_mode': args.load_mode,
+        'fetch_engine': settings['FETCH_ENGINE'],
+        'streaming': args.stream,
+        'generate_seconds': generate_seconds,
+        'source_rows': source_rows,
+        'results': [],
+    }
+
+    # 每個案例使用新的子行程 (spawn)，依序執行避免互相干擾
+    context = multiprocessing.get_context('spawn')
+    for query in queries:
+        source_db = 'sap_db' if query['name'].startswith('sap_') else 'mes_db'
+        # 批次大小依序遞增，第一個案例建立目標表 (該案例無備份耗時)
+        for batch_size in batch_sizes:
+            case = {
+                'query': dict(query, load_mode=args.load_mode),
+                'source_db': source_db,
+                'settings': dict(settings, BULK_BATCH_ROWS=batch_size),
+                'log_level': log_level,
+            }
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, case).result()
+            report['results'].append(result)
+            logger.info(f"{result['query']} 批次 {batch_size}: {result['status']}，{result['rows']} 筆，"
+                        f"{result['total_seconds']} 秒 ({result['rows_per_second']} 筆/秒)，"
+                        f"記憶體高峰 {result['peak_rss_mb']} MB")
+
+    exit_code = 1 if any(result['status'] != 'ok' for result in report['results']) else 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if (baseline.get('backend'), baseline.get('scale_rows')) != (args.backend, args.rows):
+            logger.warning(f"基準報告的後端或規模不同 ({baseline.get('backend')}, {baseline.get('scale_rows')})，比較結果僅供參考")
+        report['regressions'] = compare_with_baseline(report, baseline, args.max_regression)
+        for regression in report['regressions']:
+            logger.error(f"效能退步: {regression['query']} 批次 {regression['batch_size']} "
+                         f"{regression['baseline_rows_per_second']} -> {regression['rows_per_second']} 筆/秒")
+        if report['regressions']:
+            exit_code = 1
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+        logger.info(f"基準報告已寫入 {args.output}")
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
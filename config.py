@@ -14,13 +14,64 @@ class ETLConfig:
     """ETL系統配置類別"""
     
     # 分批處理設定
-    BATCH_SIZE: int = 75
     PROGRESS_REPORT_INTERVAL: int = 10000
     
+    # 完整載入方式: truncate (備份並清空目標表) / swap (寫入暫存表後以重新命名切換，原表保留為 {table}_previous)
+    # merge (依 query_metadata.json 的 key_columns 合併，只寫入有變更的資料列)
+    LOAD_MODE: str = "truncate"
+    
+    # 大量寫入設定
+    # BULK_LOAD_METHOD: executemany (fast_executemany 參數陣列) / tvp (資料表值參數) / multi (多列 VALUES)
+    # multi 每批列數依欄位數與 SQL Server 2100 個參數上限計算，其餘方式每批 BULK_BATCH_ROWS 筆
+    BULK_LOAD_METHOD: str = "executemany"
+    BULK_BATCH_ROWS: int = 50000
+    BULK_TABLOCK: bool = True
+    SQL_SERVER_MAX_PARAMETERS: int = 2100
+    
+    # 自我調整批次大小設定 (依每批寫入速度調整，學習值保存於 ETL_BATCH_TUNING 表)
+    ADAPTIVE_BATCH_ENABLED: bool = True
+    ADAPTIVE_BATCH_MIN_ROWS: int = 1000
+    ADAPTIVE_BATCH_MAX_ROWS: int = 200000
+    ADAPTIVE_BATCH_MAX_CELLS: int = 5000000
+    ETL_BATCH_TUNING_TABLE: str = "ETL_BATCH_TUNING"
+    
+    # 串流處理設定 (以游標分批讀取並寫入，避免整個結果集載入記憶體)
+    STREAMING_ENABLED: bool = False
+    STREAM_CHUNK_SIZE: int = 10000
+    
+    # 管線設定 (擷取與寫入重疊執行，佇列為可暫存的批次數)
+    PIPELINE_ENABLED: bool = False
+    PIPELINE_QUEUE_SIZE: int = 4
+    
+    # 擷取引擎: pandas (object欄位) / columnar (具型別欄式陣列) / arrow (arrow-odbc)
+    FETCH_ENGINE: str = "pandas"
+    
+    # 並行查詢設定 (QUERY_WORKERS=1 表示依序執行)
+    QUERY_WORKERS: int = 1
+    MAX_CONCURRENT_QUERIES_PER_SOURCE: int = 2
+    PARTITION_WORKERS: int = 4
+    
+    # asyncio 執行引擎設定 (並行查詢與 --parallel-sources；QUERY_TIMEOUT_SECONDS=0 表示不限)
+    ASYNC_MAX_WORKERS: int = 8
+    QUERY_TIMEOUT_SECONDS: int = 0
+    
+    # 連線池設定 (pyodbc 原生連線，每個資料庫一個連線池；秒數)
+    CONNECTION_POOL_MIN_SIZE: int = 1
+    CONNECTION_POOL_MAX_SIZE: int = 8
+    CONNECTION_POOL_IDLE_TIMEOUT: int = 300
+    CONNECTION_POOL_VALIDATE_AFTER: int = 30
+    CONNECTION_POOL_ACQUIRE_TIMEOUT: int = 120
+    
     # 錯誤處理設定
     MAX_RETRY_ATTEMPTS: int = 3
+    RETRY_BACKOFF_BASE_SECONDS: float = 0.5  # 重試等待為隨機抖動的指數退避，RETRY_DELAY_SECONDS 為等待上限
     RETRY_DELAY_SECONDS: int = 5
     
+    # 連線斷路器與預檢設定 (連續失敗達門檻後於 RESET 秒內直接失敗；預檢結果於 CACHE 秒內沿用)
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD: int = 3
+    CIRCUIT_BREAKER_RESET_SECONDS: int = 60
+    PREFLIGHT_CACHE_SECONDS: int = 300
+    
     # 資料庫超時設定
     CONNECTION_TIMEOUT: int = 30
     COMMAND_TIMEOUT: int = 300
@@ -33,8 +84,34 @@ class ETLConfig:
     ENCRYPT_CONNECTION: bool = True
     TRUST_SERVER_CERTIFICATE: bool = True
     
-    # ETL摘要表設定
+    # ETL摘要表設定 (結構版本記錄於 ETL_SCHEMA_VERSION_TABLE，遷移定義見 schema_migrations.py)
     ETL_SUMMARY_TABLE: str = "ETL_SUMMARY"
+    ETL_SCHEMA_VERSION_TABLE: str = "ETL_SCHEMA_VERSION"
+    # 執行記錄距上次寫入超過此秒數時，於記錄查詢結果後即寫入 (0 為每個查詢完成即寫入)
+    RUN_LOG_FLUSH_SECONDS: int = 60
+    
+    # 擷取快取設定 (Parquet，需安裝 pyarrow)
+    EXTRACT_CACHE_ENABLED: bool = False
+    EXTRACT_CACHE_DIR: str = "extract_cache"
+    EXTRACT_CACHE_TTL_MINUTES: int = 120
+    EXTRACT_CACHE_MAX_MB: int = 2048
+    EXTRACT_CACHE_COMPRESSION: str = "zstd"
+    
+    # 增量擷取設定
+    ETL_WATERMARK_TABLE: str = "ETL_WATERMARK"
+    FULL_RELOAD: bool = False
+    
+    # 結果指紋與上次載入相同時略過重新載入
+    SKIP_UNCHANGED_LOADS: bool = True
+    
+    # 低基數字串欄位字典編碼設定
+    CATEGORY_ENCODING_ENABLED: bool = True
+    CATEGORY_MAX_UNIQUE_RATIO: float = 0.05
+    CATEGORY_MIN_ROWS: int = 1000
+    
+    # 離線後端設定 (sqlite/duckdb；設定後所有資料庫改用 OFFLINE_DATA_DIR 下的本機檔案，不讀取 db.json)
+    OFFLINE_BACKEND: str = ""
+    OFFLINE_DATA_DIR: str = "offline_data"
     
     # 檔案路徑設定
     DB_CONFIG_FILE: str = "db.json"
@@ -105,6 +182,13 @@ class ConfigManager:
     
     def get_db_config(self, db_name: str) -> Dict[str, Any]:
         """取得特定資料庫的配置"""
+        backend = self.etl_config.OFFLINE_BACKEND
+        if backend:
+            return {
+                'backend': backend,
+                'path': self._get_config_path(os.path.join(self.etl_config.OFFLINE_DATA_DIR, f"{db_name}.{backend}")),
+                'database': db_name,
+            }
         db_config = self.load_db_config()
         if db_name not in db_config:
             raise ValueError(f"找不到資料庫配置: {db_name}")
@@ -133,16 +217,19 @@ class ConfigManager:
     def validate_config(self) -> bool:
         """驗證配置的完整性"""
         try:
-            # 驗證資料庫配置
-            db_config = self.load_db_config()
-            required_dbs = ['mes_db', 'sap_db', 'tableau_db']
+            # 驗證資料庫配置 (離線後端不需要 db.json)
+            db_config = {} if self.etl_config.OFFLINE_BACKEND else self.load_db_config()
+            required_dbs = [] if self.etl_config.OFFLINE_BACKEND else ['mes_db', 'sap_db', 'tableau_db']
             for db_name in required_dbs:
                 if db_name not in db_config:
                     self.logger.error(f"缺少資料庫配置: {db_name}")
                     return False
                 
                 db_info = db_config[db_name]
-                required_fields = ['server', 'database', 'username', 'password']
+                if db_info.get('backend', 'mssql') != 'mssql':
+                    required_fields = ['path']
+                else:
+                    required_fields = ['server', 'database', 'username', 'password']
                 for field in required_fields:
                     if field not in db_info or not db_info[field]:
                         self.logger.error(f"資料庫 {db_name} 缺少必要欄位: {field}")
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Callable, List
+
+
+class _PooledConnection:
+    """連線池中的連線與其使用記錄"""
+
+    __slots__ = ('connection', 'created_at', 'last_used', 'last_thread')
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.last_thread = None
+
+
+class ConnectionPool:
+    """
+    執行緒安全的 DB-API 連線池 (用於 pyodbc 原生連線)
+
+    - 取出 (acquire) 與歸還 (release)：同一執行緒重複取出時回傳同一連線 (可重入)，全部歸還後才放回池中
+    - 執行緒親和：優先取回該執行緒上次使用的閒置連線
+    - 健康檢查：閒置超過 validate_after 秒的連線於取出前以 SELECT 1 驗證，失敗時丟棄並改用其他連線
+    - 閒置回收：閒置超過 idle_timeout 秒且超出 min_size 的連線會被關閉
+    - 連線數達 max_size 時等待其他執行緒歸還，超過 acquire_timeout 秒拋出 TimeoutError
+    """
+
+    def __init__(self, name: str, connect: Callable[[], Any], min_size: int = 1, max_size: int = 8,
+                 idle_timeout: float = 300, validate_after: float = 30, acquire_timeout: float = 120):
+        self.name = name
+        self.connect = connect
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self.idle_timeout = idle_timeout
+        self.validate_after = validate_after
+        self.acquire_timeout = acquire_timeout
+        self.logger = logging.getLogger("ConnectionPool")
+
+        self._condition = threading.Condition()
+        self._idle: List[_PooledConnection] = []
+        self._held: Dict[int, list] = {}  # key: 執行緒ID，value: [連線, 重入次數]
+        self._size = 0
+        self._pending = 0  # 建立中的連線數
+        self._closed = False
+
+        # 統計資訊
+        self._opened_at = time.monotonic()
+        self._last_change = self._opened_at
+        self._busy_integral = 0.0
+        self._checkouts = 0
+        self._waits = 0
+        self._wait_seconds = 0.0
+        self._max_wait = 0.0
+        self._peak_in_use = 0
+        self._created = 0
+        self._discarded = 0
+
+    @property
+    def in_use(self) -> int:
+        """目前取出中的連線數"""
+        return len(self._held)
+
+    def _mark_usage(self):
+        """累計使用中連線數對時間的積分 (需持有鎖)，供計算使用率"""
+        now = time.monotonic()
+        self._busy_integral += self.in_use * (now - self._last_change)
+        self._last_change = now
+
+    def acquire(self, force_new: bool = False):
+        """
+        取出連線
+
+        Args:
+            force_new: 目前執行緒未持有連線時，不使用閒置連線而建立新連線
+
+        Raises:
+            TimeoutError: 連線數已達上限且等待超過 acquire_timeout 秒
+        """
+        thread_id = threading.get_ident()
+        started = time.monotonic()
+        waited = False
+        with self._condition:
+            if self._closed:
+                raise RuntimeError(f"連線池 {self.name} 已關閉")
+
+            held = self._held.get(thread_id)
+            if held is not None:
+                held[1] += 1
+                return held[0].connection
+
+            while True:
+                self._evict_idle()
+                pooled = None if force_new else self._take_idle(thread_id)
+                if pooled is not None:
+                    break
+                if self._size + self._pending < self.max_size:
+                    self._pending += 1
+                    break
+                remaining = self.acquire_timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"連線池 {self.name} 已達上限 {self.max_size} 個連線，等待 {self.acquire_timeout} 秒後逾時"
+                    )
+                waited = True
+                self._condition.wait(remaining)
+
+        if pooled is None:
+            pooled = self._open()
+        elif not self._is_healthy(pooled):
+            self._discard(pooled, counted=True)
+            return self.acquire(force_new)
+
+        with self._condition:
+            self._mark_usage()
+            self._held[thread_id] = [pooled, 1]
+            self._checkouts += 1
+            self._peak_in_use = max(self._peak_in_use, self.in_use)
+            if waited:
+                wait = time.monotonic() - started
+                self._waits += 1
+                self._wait_seconds += wait
+                self._max_wait = max(self._max_wait, wait)
+        return pooled.connection
+
+    def _take_idle(self, thread_id: int):
+        """取出閒置連線，優先使用該執行緒上次使用的連線 (需持有鎖)"""
+        if not self._idle:
+            return None
+        for index in range(len(self._idle) - 1, -1, -1):
+            if self._idle[index].last_thread == thread_id:
+                return self._idle.pop(index)
+        return self._idle.pop()
+
+    def _open(self) -> _PooledConnection:
+        """建立新連線 (已預留名額)"""
+        try:
+            pooled = _PooledConnection(self.connect())
+        except Exception:
+            with self._condition:
+                self._pending -= 1
+                self._condition.notify()
+            raise
+        with self._condition:
+            self._pending -= 1
+            self._size += 1
+            self._created += 1
+        self.logger.debug(f"連線池 {self.name} 建立新連線 (共 {self._size} 個)")
+        return pooled
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        """閒置過久的連線以 SELECT 1 驗證是否仍可使用"""
+        if time.monotonic() - pooled.last_used < self.validate_after:
+            return True
+        try:
+            cursor = pooled.connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception as e:
+            self.logger.warning(f"連線池 {self.name} 的閒置連線已失效，將重新建立: {e}")
+            return False
+
+    def _discard(self, pooled: _PooledConnection, counted: bool = True):
+        """關閉並移除連線"""
+        try:
+            pooled.connection.close()
+        except Exception:
+            pass
+        with self._condition:
+            if counted:
+                self._size -= 1
+            self._discarded += 1
+            self._condition.notify()
+
+    def release(self, connection, discard: bool = False):
+        """
+        歸還連線 (重入取出時只減少計數)
+
+        Args:
+            discard: 連線已不可使用 (例如發生連線錯誤)，關閉而不放回池中
+        """
+        thread_id = threading.get_ident()
+        with self._condition:
+            held = self._held.get(thread_id)
+            if held is None or held[0].connection is not connection:
+                # 由其他執行緒取出的連線 (例如產生器在其他執行緒結束)
+                owner = next((tid for tid, item in self._held.items() if item[0].connection is connection), None)
+                if owner is None:
+                    return
+                thread_id, held = owner, self._held[owner]
+            held[1] -= 1
+            if held[1] > 0 and not discard:
+                return
+            self._mark_usage()
+            del self._held[thread_id]
+            pooled = held[0]
+
+        if not discard:
+            try:
+                # 結束未完成的交易，讓下一個使用者取得乾淨的連線
+                connection.rollback()
+            except Exception:
+                discard = True
+
+        if discard or self._closed:
+            self._discard(pooled)
+            return
+
+        with self._condition:
+            pooled.last_used = time.monotonic()
+            pooled.last_thread = thread_id
+            self._idle.append(pooled)
+            self._evict_idle()
+            self._condition.notify()
+
+    def _evict_idle(self):
+        """關閉閒置過久且超出 min_size 的連線 (需持有鎖)"""
+        if not self._idle:
+            return
+        now = time.monotonic()
+        keep = []
+        expired = []
+        for pooled in self._idle:
+            if now - pooled.last_used > self.idle_timeout and self._size - len(expired) > self.min_size:
+                expired.append(pooled)
+            else:
+                keep.append(pooled)
+        if not expired:
+            return
+        self._idle = keep
+        for pooled in expired:
+            try:
+                pooled.connection.close()
+            except Exception:
+                pass
+            self._size -= 1
+            self._discarded += 1
+        self.logger.debug(f"連線池 {self.name} 回收 {len(expired)} 個閒置連線")
+
+    @contextmanager
+    def connection(self):
+        """取出連線的上下文管理器"""
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得連線池統計資訊
+
+        Returns:
+            size / idle / in_use / peak_in_use: 目前連線數、閒置數、使用中與使用中高峰
+            checkouts: 取出次數 (不含重入)
+            waits / wait_seconds / max_wait_seconds: 因連線數已達上限而等待的次數與秒數
+            utilization: 使用中連線數對 max_size 的時間加權平均 (0-1)
+            created / discarded: 建立與關閉 (失效或閒置回收) 的連線數
+        """
+        with self._condition:
+            self._mark_usage()
+            elapsed = max(time.monotonic() - self._opened_at, 1e-9)
+            return {
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self.in_use,
+                'peak_in_use': self._peak_in_use,
+                'checkouts': self._checkouts,
+                'waits': self._waits,
+                'wait_seconds': round(self._wait_seconds, 3),
+                'max_wait_seconds': round(self._max_wait, 3),
+                'utilization': round(self._busy_integral / (self.max_size * elapsed), 3),
+                'created': self._created,
+                'discarded': self._discarded,
+            }
+
+    def close(self):
+        """關閉所有閒置連線；使用中的連線於歸還時關閉"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            try:
+                pooled.connection.close()
+            except Exception:
+                pass
@@ -1,16 +1,270 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import pyodbc
 import logging
 import time
 import sys
+import os
+import zlib
+import importlib.util
+import sqlite3
+import datetime
+import decimal
+import threading
+import numpy as np
+import pandas as pd
+from abc import ABC, abstractmethod
 from contextlib import contextmanager
-from sqlalchemy import create_engine, text
-from typing import Dict, Any, Optional, Union
+from sqlalchemy import create_engine, text, inspect
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, Union, Iterator, Tuple, Callable, List
 from urllib.parse import quote_plus
 
 from config import get_etl_config, ConfigManager
+from connection_pool import ConnectionPool
+from health import CircuitBreaker, backoff_delay
+from tsql_dialect import translate_tsql
+
+# 選用套件：欄式 (Arrow) 擷取
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+try:
+    from arrow_odbc import read_arrow_batches_from_odbc
+except ImportError:
+    read_arrow_batches_from_odbc = None
+
+# SQL Server 驅動程式；僅使用離線後端 (SQLite/DuckDB) 時不需安裝
+try:
+    import pyodbc
+except ImportError:
+    pyodbc = None
+
+# 選用套件：DuckDB 離線後端
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# 欄式擷取使用的字串型別 (有 pyarrow 時以 Arrow 緩衝區保存字串)
+STRING_DTYPE = "string[pyarrow]" if pa is not None else "string"
+
+
+class _LocalCursor:
+    """
+    離線後端的游標 - 執行前將 T-SQL 改寫為後端語法
+
+    SQLite/DuckDB 的 description 不提供 pyodbc 的 Python 型別，因此預先讀取前 TYPE_SAMPLE_ROWS 筆，
+    以各欄第一個非NULL值的型別補上 (全為NULL時為 None)。
+    """
+
+    TYPE_SAMPLE_ROWS = 100
+
+    def __init__(self, cursor, dialect: str):
+        self._cursor = cursor
+        self._dialect = dialect
+        self._buffer = []
+        self.description = None
+
+    def execute(self, sql: str, params=None):
+        self._cursor.execute(translate_tsql(sql, self._dialect), list(params) if params else [])
+        self._buffer = []
+        self.description = None
+        if self._cursor.description is not None:
+            self._buffer = list(self._cursor.fetchmany(self.TYPE_SAMPLE_ROWS))
+            self.description = tuple(
+                (column[0], next((type(row[index]) for row in self._buffer if row[index] is not None), None),
+                 None, None, None, None, True)
+                for index, column in enumerate(self._cursor.description)
+            )
+        return self
+
+    def executemany(self, sql: str, seq_of_params):
+        self._cursor.executemany(translate_tsql(sql, self._dialect), [list(params) for params in seq_of_params])
+        self._buffer = []
+        self.description = None
+        return self
+
+    def fetchmany(self, size: int = 1) -> list:
+        rows, self._buffer = self._buffer[:size], self._buffer[size:]
+        if len(rows) < size:
+            rows.extend(self._cursor.fetchmany(size - len(rows)))
+        return rows
+
+    def fetchone(self):
+        rows = self.fetchmany(1)
+        return rows[0] if rows else None
+
+    def fetchall(self) -> list:
+        rows, self._buffer = self._buffer, []
+        return rows + list(self._cursor.fetchall())
+
+    def nextset(self) -> bool:
+        # 離線後端一次只執行一個陳述式，沒有後續結果集
+        return False
+
+    def cancel(self):
+        """中斷執行中的陳述式 (對應 pyodbc 的 Cursor.cancel)"""
+        (self._cursor if self._dialect == 'duckdb' else self._cursor.connection).interrupt()
+
+    def close(self):
+        self._buffer = []
+        self._cursor.close()
+
+
+class _LocalConnection:
+    """離線後端的 DB-API 連線 - 游標於執行時改寫 T-SQL，介面與 pyodbc 連線相同"""
+
+    def __init__(self, connection, dialect: str):
+        self._connection = connection
+        self.dialect = dialect
+
+    def cursor(self) -> _LocalCursor:
+        return _LocalCursor(self._connection.cursor(), self.dialect)
+
+    def commit(self):
+        self._connection.commit()
+
+    def insert_rows(self, table: str, columns: List[str], rows: list):
+        """
+        大量寫入資料列 (產生離線資料用)
+
+        DuckDB 的 executemany 逐筆執行，改為註冊成 DataFrame 後以 INSERT ... SELECT 一次寫入。
+        """
+        if self.dialect == 'duckdb':
+            frame = pd.DataFrame.from_records(rows, columns=columns)
+            self._connection.register('_insert_rows', frame)
+            try:
+                self._connection.execute(f'INSERT INTO "{table}" SELECT * FROM _insert_rows')
+            finally:
+                self._connection.unregister('_insert_rows')
+            return
+        placeholders = ", ".join("?" for _ in columns)
+        self._connection.executemany(f"INSERT INTO [{table}] VALUES ({placeholders})", rows)
+
+    def rollback(self):
+        try:
+            self._connection.rollback()
+        except Exception:
+            # DuckDB 沒有進行中的交易時 rollback 會拋出例外
+            if self.dialect != 'duckdb':
+                raise
+
+    def close(self):
+        self._connection.close()
+
+
+class _TrackedConnection:
+    """
+    轉送至來源連線，建立的游標登記於 cursors，供其他執行緒以 cancel() 中斷執行中的陳述式
+
+    pd.read_sql 與 execute_query_safely 都經由 cursor() 建立游標，登記發生在執行陳述式之前。
+    """
+
+    def __init__(self, connection, cursors: set):
+        self._connection = connection
+        self._cursors = cursors
+
+    def cursor(self):
+        cursor = self._connection.cursor()
+        self._cursors.add(cursor)
+        return cursor
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+
+def _isnumeric(value) -> int:
+    """SQLite 版 ISNUMERIC"""
+    if value is None:
+        return 0
+    try:
+        float(value)
+        return 1
+    except (TypeError, ValueError):
+        return 0
+
+
+def _checksum(*values) -> int:
+    """SQLite 版 CHECKSUM (僅供雜湊分區，數值與 SQL Server 不同)"""
+    return zlib.crc32("|".join(str(value) for value in values).encode('utf-8')) - 2 ** 31
+
+
+class LocalBackend(ABC):
+    """
+    離線後端 - 以本機資料庫檔案代替 SQL Server，供基準測試與回歸測試使用
+
+    來源查詢 (mes/、sap/) 執行時由 tsql_dialect.translate_tsql 改寫；目標端經由 SQLAlchemy，
+    DatabaseManager 已依方言處理的操作 (建表、切換、合併等) 可直接使用，
+    ETL_SUMMARY 等記錄表的陳述式以 DatabaseManager.dialect_sql 改寫或另有離線版本。
+    """
+
+    dialect = None
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @abstractmethod
+    def connect(self) -> _LocalConnection:
+        """開啟 DB-API 連線 (包裝為 _LocalConnection，執行前改寫 T-SQL)"""
+
+    @abstractmethod
+    def sqlalchemy_uri(self) -> str:
+        """目標端 SQLAlchemy 引擎的連線字串"""
+
+
+class SQLiteBackend(LocalBackend):
+    """SQLite 離線後端 (標準函式庫，不需額外安裝)"""
+
+    dialect = 'sqlite'
+
+    @staticmethod
+    def _register_types():
+        """
+        註冊 sqlite3 的型別轉換 (模組層級設定，來源連線與 SQLAlchemy 目標連線共用)
+
+        宣告為 TIMESTAMP 的欄位讀取為 datetime，寫入時 datetime 以 ISO 格式文字保存；
+        Decimal 以文字寫入，由 DECIMAL 欄位的數值親和性轉存為數值。
+        """
+        sqlite3.register_converter("TIMESTAMP", lambda value: datetime.datetime.fromisoformat(value.decode()))
+        sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(sep=' '))
+        sqlite3.register_adapter(decimal.Decimal, str)
+
+    def connect(self) -> _LocalConnection:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._register_types()
+        connection = sqlite3.connect(self.path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+        connection.create_function('ISNUMERIC', 1, _isnumeric, deterministic=True)
+        connection.create_function('CHECKSUM', -1, _checksum, deterministic=True)
+        return _LocalConnection(connection, self.dialect)
+
+    def sqlalchemy_uri(self) -> str:
+        self._register_types()
+        return f"sqlite:///{os.path.abspath(self.path)}"
+
+
+class DuckDBBackend(LocalBackend):
+    """DuckDB 離線後端 (需安裝 duckdb；作為目標資料庫時另需 duckdb-engine)"""
+
+    dialect = 'duckdb'
+
+    def connect(self) -> _LocalConnection:
+        if duckdb is None:
+            raise ImportError("未安裝 duckdb，無法使用 DuckDB 離線後端 (pip install duckdb duckdb-engine)")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        return _LocalConnection(duckdb.connect(self.path), self.dialect)
+
+    def sqlalchemy_uri(self) -> str:
+        if importlib.util.find_spec('duckdb_engine') is None:
+            raise ImportError("未安裝 duckdb-engine，DuckDB 離線後端無法作為 SQLAlchemy 目標 "
+                              "(pip install duckdb-engine，或於 db.json 將 tableau_db 改用 sqlite 後端)")
+        return f"duckdb:///{os.path.abspath(self.path)}"
+
+
+# 可用的離線後端 (db.json 的 "backend" 或 ETLConfig.OFFLINE_BACKEND)
+LOCAL_BACKENDS = {'sqlite': SQLiteBackend, 'duckdb': DuckDBBackend}
 
 
 class DatabaseManager:
@@ -20,8 +274,17 @@ class DatabaseManager:
         self.config_manager = config_manager
         self.etl_config = config_manager.etl_config
         self.logger = logging.getLogger("DatabaseManager")
-        self._connections = {}
+        self._pools = {}  # key: 資料庫名稱，pyodbc連線池 (連線取出期間由單一執行緒使用)
+        self._breakers = {}  # key: 資料庫名稱，連線斷路器
+        self._health = {}  # key: 資料庫名稱，value: (連線測試結果, 測試時間)
+        self._backends = {}  # key: 資料庫名稱，離線後端 (SQL Server 為 None)
         self._engines = {}
+        self._query_slots = {}
+        self._active_cursors = {}  # key: 查詢名稱，value: 各次讀取登記的游標集合 (逾時時取消)
+        self._lock = threading.Lock()
+        # 結構目錄快取 - key: 資料庫名稱，value: {'tables': {小寫表名: 欄位清單}, 'stale': 需重新讀取的表名}
+        self._catalogs = {}
+        self._catalog_lock = threading.RLock()
     
     def build_connection_string(self, db_config: Dict[str, Any]) -> str:
         """建立安全的資料庫連接字串"""
@@ -69,50 +332,145 @@ class DatabaseManager:
         
         return uri
     
-    def get_connection(self, db_name: str, force_new: bool = False) -> pyodbc.Connection:
-        """取得資料庫連線，支援連線重用"""
-        if force_new or db_name not in self._connections:
-            try:
-                db_config = self.config_manager.get_db_config(db_name)
-                connection_string = self.build_connection_string(db_config)
-                
-                # 重試機制
-                for attempt in range(self.etl_config.MAX_RETRY_ATTEMPTS):
-                    try:
+    def get_backend(self, db_name: str) -> Optional[LocalBackend]:
+        """
+        取得資料庫的離線後端 (SQL Server 時回傳 None)
+        
+        db.json 的資料庫設定以 "backend": "sqlite"/"duckdb" 與 "path" 指定，
+        或以 ETLConfig.OFFLINE_BACKEND 讓所有資料庫改用離線後端。
+        """
+        # 不取得 self._lock：get_engine/get_pool 持有鎖時會呼叫本方法；重複建立後端物件無副作用
+        if db_name not in self._backends:
+            db_config = self.config_manager.get_db_config(db_name)
+            backend_name = db_config.get('backend', 'mssql')
+            if backend_name == 'mssql':
+                backend = None
+            elif backend_name in LOCAL_BACKENDS:
+                backend = LOCAL_BACKENDS[backend_name](db_config['path'])
+                self.logger.info(f"{db_name} 使用 {backend_name} 離線後端: {db_config['path']}")
+            else:
+                raise ValueError(f"{db_name} 的後端不支援: {backend_name} (可用 mssql/{'/'.join(LOCAL_BACKENDS)})")
+            self._backends.setdefault(db_name, backend)
+        return self._backends[db_name]
+    
+    def dialect_sql(self, db_name: str, sql: str) -> str:
+        """將 T-SQL 陳述式改寫為資料庫所用的方言 (SQL Server 時原樣回傳)"""
+        backend = self.get_backend(db_name)
+        return sql if backend is None else translate_tsql(sql, backend.dialect)
+    
+    def get_circuit_breaker(self, db_name: str) -> CircuitBreaker:
+        """取得資料庫的連線斷路器"""
+        with self._lock:
+            if db_name not in self._breakers:
+                self._breakers[db_name] = CircuitBreaker(
+                    db_name,
+                    failure_threshold=self.etl_config.CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+                    reset_timeout=self.etl_config.CIRCUIT_BREAKER_RESET_SECONDS
+                )
+            return self._breakers[db_name]
+    
+    def _connect(self, db_name: str) -> 'pyodbc.Connection':
+        """
+        建立新的pyodbc連線
+        
+        失敗時依 MAX_RETRY_ATTEMPTS 重試，重試間隔為隨機抖動的指數退避 (上限 RETRY_DELAY_SECONDS)；
+        斷路器開啟時不嘗試連線，直接拋出 CircuitBreakerOpenError。
+        """
+        breaker = self.get_circuit_breaker(db_name)
+        try:
+            backend = self.get_backend(db_name)
+            if backend is None:
+                connection_string = self.build_connection_string(db_config=self.config_manager.get_db_config(db_name))
+            
+            # 重試機制
+            for attempt in range(self.etl_config.MAX_RETRY_ATTEMPTS):
+                breaker.before_attempt()
+                try:
+                    if backend is None:
+                        if pyodbc is None:
+                            raise ImportError(f"未安裝 pyodbc，無法連接 SQL Server 資料庫 {db_name} (pip install pyodbc，或改用離線後端)")
                         connection = pyodbc.connect(connection_string)
                         # 設定連線超時
                         connection.timeout = self.etl_config.COMMAND_TIMEOUT
-                        self._connections[db_name] = connection
-                        self.logger.info(f"成功連接到 {db_name} 資料庫")
-                        break
-                    except Exception as e:
-                        if attempt < self.etl_config.MAX_RETRY_ATTEMPTS - 1:
-                            self.logger.warning(f"連接 {db_name} 失敗，{self.etl_config.RETRY_DELAY_SECONDS}秒後重試... (嘗試 {attempt + 1}/{self.etl_config.MAX_RETRY_ATTEMPTS})")
-                            time.sleep(self.etl_config.RETRY_DELAY_SECONDS)
-                        else:
-                            self.logger.error(f"連接 {db_name} 資料庫失敗: {e}")
-                            raise
-                            
-            except Exception as e:
-                self.logger.error(f"建立 {db_name} 資料庫連線失敗: {e}")
-                raise
+                    else:
+                        connection = backend.connect()
+                    breaker.record_success()
+                    self.logger.info(f"成功連接到 {db_name} 資料庫")
+                    return connection
+                except Exception as e:
+                    breaker.record_failure(e)
+                    # 斷路器已開啟時不再重試
+                    if attempt < self.etl_config.MAX_RETRY_ATTEMPTS - 1 and breaker.state == 'closed':
+                        delay = backoff_delay(attempt, self.etl_config.RETRY_BACKOFF_BASE_SECONDS,
+                                              self.etl_config.RETRY_DELAY_SECONDS)
+                        self.logger.warning(f"連接 {db_name} 失敗，{delay:.1f}秒後重試... (嘗試 {attempt + 1}/{self.etl_config.MAX_RETRY_ATTEMPTS})")
+                        time.sleep(delay)
+                    else:
+                        self.logger.error(f"連接 {db_name} 資料庫失敗: {e}")
+                        raise
+                        
+        except Exception as e:
+            self.logger.error(f"建立 {db_name} 資料庫連線失敗: {e}")
+            raise
+    
+    def get_pool(self, db_name: str) -> ConnectionPool:
+        """取得資料庫的連線池，連線數上限可於 db.json 以 pool_max_size 覆寫"""
+        with self._lock:
+            if db_name not in self._pools:
+                db_config = self.config_manager.get_db_config(db_name)
+                self._pools[db_name] = ConnectionPool(
+                    db_name,
+                    lambda: self._connect(db_name),
+                    min_size=self.etl_config.CONNECTION_POOL_MIN_SIZE,
+                    max_size=int(db_config.get('pool_max_size', self.etl_config.CONNECTION_POOL_MAX_SIZE)),
+                    idle_timeout=self.etl_config.CONNECTION_POOL_IDLE_TIMEOUT,
+                    validate_after=self.etl_config.CONNECTION_POOL_VALIDATE_AFTER,
+                    acquire_timeout=self.etl_config.CONNECTION_POOL_ACQUIRE_TIMEOUT
+                )
+            return self._pools[db_name]
+    
+    def get_connection(self, db_name: str, force_new: bool = False) -> 'pyodbc.Connection':
+        """
+        自連線池取出資料庫連線，使用完畢需以 release_connection 歸還
         
-        return self._connections[db_name]
+        同一執行緒在歸還前再次取出時回傳同一連線；一般情況請使用 get_connection_context。
+        """
+        return self.get_pool(db_name).acquire(force_new)
+    
+    def release_connection(self, db_name: str, connection: 'pyodbc.Connection', discard: bool = False):
+        """歸還由 get_connection 取出的連線 (discard=True 時關閉而不放回連線池)"""
+        self.get_pool(db_name).release(connection, discard)
+    
+    @staticmethod
+    def _is_connection_error(error: Exception) -> bool:
+        """判斷例外是否表示連線已中斷 (此類連線不放回連線池)"""
+        return pyodbc is not None and isinstance(error, (pyodbc.OperationalError, pyodbc.InterfaceError))
     
     def get_engine(self, db_name: str, force_new: bool = False):
-        """取得SQLAlchemy引擎"""
+        """取得SQLAlchemy引擎 (引擎本身具連線池，可跨執行緒共用)"""
+        with self._lock:
+            return self._get_or_create_engine(db_name, force_new)
+    
+    def _get_or_create_engine(self, db_name: str, force_new: bool = False):
+        """建立或取得已快取的SQLAlchemy引擎"""
         if force_new or db_name not in self._engines:
             try:
-                db_config = self.config_manager.get_db_config(db_name)
-                uri = self.build_sqlalchemy_uri(db_config)
+                backend = self.get_backend(db_name)
+                if backend is None:
+                    uri = self.build_sqlalchemy_uri(self.config_manager.get_db_config(db_name))
+                    # fast_executemany 為 mssql+pyodbc 專用參數
+                    engine_options = {'fast_executemany': True}
+                else:
+                    uri = backend.sqlalchemy_uri()
+                    engine_options = {}
                 
                 # 建立引擎
                 engine = create_engine(
                     uri,
-                    fast_executemany=True,
                     pool_pre_ping=True,  # 連線池預檢查
                     pool_recycle=3600,   # 每小時回收連線
-                    echo=False  # 設為True可顯示SQL語句（除錯用）
+                    echo=False,  # 設為True可顯示SQL語句（除錯用）
+                    **engine_options
                 )
                 
                 self._engines[db_name] = engine
@@ -124,24 +482,92 @@ class DatabaseManager:
         
         return self._engines[db_name]
     
+    def get_query_limit(self, db_name: str) -> int:
+        """取得資料庫允許的最大並行查詢數，可於 db.json 以 max_concurrent_queries 覆寫"""
+        db_config = self.config_manager.get_db_config(db_name)
+        limit = db_config.get('max_concurrent_queries', self.etl_config.MAX_CONCURRENT_QUERIES_PER_SOURCE)
+        return max(1, int(limit))
+    
     @contextmanager
-    def get_connection_context(self, db_name: str):
-        """提供資料庫連線的上下文管理器"""
-        connection = None
+    def acquire_query_slot(self, db_name: str):
+        """
+        取得來源資料庫的陳述式名額，超過上限 (get_query_limit) 時等待其他陳述式完成
+
+        只在實際讀取來源時持有 (完整擷取、每個分區或分頁陳述式、串流的整個讀取期間)，
+        持有期間不再取得其他名額，巢狀的分區並行不會使來源同時執行的陳述式超過上限。
+        """
+        with self._lock:
+            if db_name not in self._query_slots:
+                self._query_slots[db_name] = threading.BoundedSemaphore(self.get_query_limit(db_name))
+            semaphore = self._query_slots[db_name]
+        
+        semaphore.acquire()
         try:
-            connection = self.get_connection(db_name)
-            yield connection
+            yield
+        finally:
+            semaphore.release()
+    
+    def _track_cursors(self, tag: str) -> set:
+        """建立登記於 tag 下的游標集合 (由 cancel_statements 取消)"""
+        cursors = set()
+        with self._lock:
+            self._active_cursors.setdefault(tag, []).append(cursors)
+        return cursors
+    
+    def _untrack_cursors(self, tag: str, cursors: set):
+        """移除 _track_cursors 建立的游標集合"""
+        with self._lock:
+            groups = [group for group in self._active_cursors.get(tag, []) if group is not cursors]
+            if groups:
+                self._active_cursors[tag] = groups
+            else:
+                self._active_cursors.pop(tag, None)
+    
+    def cancel_statements(self, tag: str) -> int:
+        """
+        取消登記於 tag (查詢名稱) 下、執行中的來源陳述式 (pyodbc Cursor.cancel，離線後端為 interrupt)
+
+        被取消的陳述式於原執行緒拋出例外；已完成的游標取消時不會有作用。arrow 擷取引擎的讀取無法取消。
+
+        Returns:
+            送出取消的游標數
+        """
+        with self._lock:
+            cursors = [cursor for group in self._active_cursors.get(tag, []) for cursor in list(group)]
+        for cursor in cursors:
+            try:
+                cursor.cancel()
+            except Exception as e:
+                self.logger.debug(f"取消 {tag} 的陳述式失敗: {e}")
+        return len(cursors)
+    
+    @contextmanager
+    def get_connection_context(self, db_name: str, tag: str = None):
+        """
+        提供資料庫連線的上下文管理器 (自連線池取出，結束時歸還)
+
+        指定 tag 時，經由此連線建立的游標登記於 tag 下，可由 cancel_statements 取消。
+        """
+        connection = self.get_connection(db_name)
+        cursors = self._track_cursors(tag) if tag else None
+        discard = False
+        try:
+            yield _TrackedConnection(connection, cursors) if tag else connection
         except Exception as e:
             self.logger.error(f"資料庫操作失敗: {e}")
-            if connection:
-                try:
-                    connection.rollback()
-                except:
-                    pass
+            discard = self._is_connection_error(e)
             raise
         finally:
-            # 注意：這裡不關閉連線，因為要重用
-            pass
+            if tag:
+                self._untrack_cursors(tag, cursors)
+            # 歸還時會先 rollback 未完成的交易；連線已中斷時關閉而不放回連線池
+            self.release_connection(db_name, connection, discard)
+    
+    def get_pool_stats(self) -> Dict[str, Dict[str, Any]]:
+        """取得各資料庫連線池的統計資訊 (取出次數、等待時間、使用率等)"""
+        with self._lock:
+            pools = dict(self._pools)
+        return {db_name: pool.stats() for db_name, pool in pools.items()}
     
     @contextmanager
     def get_engine_context(self, db_name: str):
@@ -154,7 +580,7 @@ class DatabaseManager:
             self.logger.error(f"資料庫引擎操作失敗: {e}")
             raise
     
-    def execute_query_safely(self, connection: pyodbc.Connection, query: str, params: Dict[str, Any] = None) -> pyodbc.Cursor:
+    def execute_query_safely(self, connection: 'pyodbc.Connection', query: str, params: Dict[str, Any] = None) -> 'pyodbc.Cursor':
         """安全執行SQL查詢，使用參數化查詢防止SQL注入"""
         try:
             cursor = connection.cursor()
@@ -181,70 +607,698 @@ class DatabaseManager:
             self.logger.error(f"SQLAlchemy查詢執行失敗: {e}")
             raise
     
-    def check_table_exists(self, db_name: str, table_name: str) -> bool:
-        """安全檢查表是否存在"""
-        query = """
-        SELECT CASE WHEN EXISTS (
-            SELECT * FROM INFORMATION_SCHEMA.TABLES 
-            WHERE TABLE_NAME = ?
-        ) THEN 1 ELSE 0 END
+    def open_stream_cursor(self, connection: 'pyodbc.Connection', query: str, params: Dict[str, Any] = None) -> 'pyodbc.Cursor':
+        """
+        執行查詢並回傳定位於第一個結果集的游標，供串流分批讀取
+        
+        pyodbc 透過 TDS 逐批自伺服器取回資料列，只要以 fetchmany 讀取，
+        用戶端記憶體只會保留目前這一批資料。
+        """
+        cursor = self.execute_query_safely(connection, query, params)
+        # 略過沒有結果集的陳述式 (例如 SET NOCOUNT ON 或暫存表建立)
+        while cursor.description is None:
+            if not cursor.nextset():
+                break
+        return cursor
+    
+    def fetch_chunks(self, cursor: 'pyodbc.Cursor', chunk_size: int, columnar: bool = False) -> Iterator[pd.DataFrame]:
         """
+        從游標分批取出資料，每批轉為一個DataFrame
         
+        Args:
+            cursor: 已執行查詢的游標
+            chunk_size: 每批資料列數
+            columnar: 是否依游標欄位型別轉為具型別的欄式陣列 (否則為 object 欄位)
+            
+        Yields:
+            每批資料的DataFrame
+        """
         try:
-            with self.get_engine_context(db_name) as engine:
-                result = self.execute_query_with_sqlalchemy(
-                    engine, query, {'table_name': table_name}
-                )
-                return result.scalar() == 1
+            if cursor.description is None:
+                return
+            description = cursor.description
+            columns = [column[0] for column in description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                if columnar:
+                    yield self._rows_to_columnar(rows, description)
+                else:
+                    yield pd.DataFrame.from_records([tuple(row) for row in rows], columns=columns)
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+    
+    def _rows_to_columnar(self, rows: list, description) -> pd.DataFrame:
+        """
+        將一批資料列依游標欄位型別轉置為具型別的欄式陣列
+        
+        整數為 Int64、浮點數為 Float64、日期時間為 datetime64、字串為 STRING_DTYPE，
+        DECIMAL 保留精確值 (見 _decimal_array)，其餘型別保留為 object。NULL 以各型別的遮罩表示，不再是 Python 物件。
+        """
+        data = {}
+        # 以 zip 一次轉置整批資料列，避免逐欄以索引取值
+        for column, values in zip(description, map(list, zip(*rows))):
+            try:
+                data[column[0]] = self._column_array(values, column)
+            except (TypeError, ValueError):
+                # 離線後端的欄位型別由前幾筆推斷，同一欄位可能混有其他型別的值
+                data[column[0]] = pd.array(values, dtype=object)
+        return pd.DataFrame(data, copy=False)
+    
+    def _column_array(self, values: list, column) -> Any:
+        """依游標欄位描述 (名稱、型別、...、精確度、小數位數) 將一欄的值轉為具型別的陣列"""
+        type_code = column[1]
+        if type_code is bool:
+            return pd.array(values, dtype="boolean")
+        if type_code is int:
+            return pd.array(values, dtype="Int64")
+        if type_code is float:
+            return pd.array(np.array(values, dtype=float), dtype="Float64")
+        if type_code is decimal.Decimal:
+            return self._decimal_array(values, column[4], column[5])
+        if type_code is datetime.datetime:
+            return pd.to_datetime(values)
+        if type_code is str:
+            return pd.array(values, dtype=STRING_DTYPE)
+        return pd.array(values, dtype=object)
+    
+    @staticmethod
+    def _decimal_array(values: list, precision: Optional[int], scale: Optional[int]):
+        """
+        DECIMAL 欄位的陣列 - 不轉為浮點數，避免金額與數量失去精確度
+        
+        有 pyarrow 且游標提供精確度與小數位數時為 Arrow decimal128 (每批型別一致)，
+        否則保留為 Decimal 物件。
+        """
+        if pa is not None and precision and scale is not None:
+            try:
+                return pd.arrays.ArrowExtensionArray(pa.array(values, type=pa.decimal128(precision, scale)))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, ValueError):
+                pass
+        return pd.array(values, dtype=object)
+    
+    def stream_query(self, db_name: str, query: str, chunk_size: int, params: list = None,
+                     engine: str = None, tag: str = None) -> Tuple[Dict[str, type], Iterator[pd.DataFrame]]:
+        """
+        執行查詢並回傳欄位型別與分批資料迭代器
+        
+        Args:
+            db_name: 資料庫名稱
+            query: SQL語句 (可含 ? 參數)
+            chunk_size: 每批資料列數
+            params: 查詢參數
+            engine: 擷取引擎，未指定時使用 ETLConfig.FETCH_ENGINE
+                pandas   - pyodbc 逐列讀取為 object 欄位 (原有行為)
+                columnar - pyodbc 讀取後依欄位型別轉為具型別的欄式陣列
+                arrow    - arrow-odbc 直接讀入 Arrow 欄式緩衝區 (未安裝時改用 columnar)
+            tag: 查詢名稱，讀取期間游標登記於此名稱下，可由 cancel_statements 取消
+                
+        Returns:
+            (column_types, chunks): 欄位名稱對應 Python 型別的字典，以及每批資料的DataFrame迭代器
+        """
+        engine = engine or self.etl_config.FETCH_ENGINE
+        
+        if engine == 'arrow':
+            if self.get_backend(db_name) is not None:
+                # arrow-odbc 需要 ODBC 資料來源，離線後端改用 columnar
+                engine = 'columnar'
+            elif read_arrow_batches_from_odbc is not None:
+                return self._stream_query_arrow(db_name, query, chunk_size, params)
+            else:
+                self.logger.warning("未安裝 arrow-odbc，改用 columnar 擷取引擎")
+                engine = 'columnar'
+        
+        connection = self.get_connection(db_name)
+        cursors = self._track_cursors(tag) if tag else None
+        try:
+            cursor = self.open_stream_cursor(_TrackedConnection(connection, cursors) if tag else connection,
+                                             query, params)
+        except Exception as e:
+            if tag:
+                self._untrack_cursors(tag, cursors)
+            self.release_connection(db_name, connection, self._is_connection_error(e))
+            raise
+        column_types = {column[0]: column[1] for column in (cursor.description or [])}
+        
+        def chunks():
+            # 讀取完畢或迭代器關閉時歸還連線
+            discard = False
+            try:
+                yield from self.fetch_chunks(cursor, chunk_size, columnar=(engine == 'columnar'))
+            except Exception as e:
+                discard = self._is_connection_error(e)
+                raise
+            finally:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+                if tag:
+                    self._untrack_cursors(tag, cursors)
+                self.release_connection(db_name, connection, discard)
+        
+        return column_types, chunks()
+    
+    def _stream_query_arrow(self, db_name: str, query: str, chunk_size: int,
+                            params: list = None) -> Tuple[Dict[str, type], Iterator[pd.DataFrame]]:
+        """以 arrow-odbc 讀取查詢結果，批次資料直接寫入依結果集描述配置的 Arrow 緩衝區"""
+        db_config = self.config_manager.get_db_config(db_name)
+        connection_string = self.build_connection_string(db_config)
+        parameters = None
+        if params:
+            # arrow-odbc 參數需為字串
+            parameters = [None if p is None else (p.isoformat(sep=' ') if isinstance(p, datetime.datetime) else str(p))
+                          for p in params]
+        
+        reader = read_arrow_batches_from_odbc(
+            query=query,
+            connection_string=connection_string,
+            batch_size=chunk_size,
+            parameters=parameters,
+        )
+        column_types = {field.name: self._arrow_type_to_python(field.type) for field in reader.schema}
+        
+        def chunks():
+            for batch in reader:
+                if batch.num_rows:
+                    yield batch.to_pandas(types_mapper=pd.ArrowDtype)
+        
+        return column_types, chunks()
+    
+    @staticmethod
+    def _arrow_type_to_python(arrow_type) -> type:
+        """將 Arrow 型別對應至 pyodbc 游標描述使用的 Python 型別"""
+        if pa.types.is_boolean(arrow_type):
+            return bool
+        if pa.types.is_integer(arrow_type):
+            return int
+        if pa.types.is_floating(arrow_type):
+            return float
+        if pa.types.is_decimal(arrow_type):
+            return decimal.Decimal
+        if pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type):
+            return str
+        if pa.types.is_timestamp(arrow_type):
+            return datetime.datetime
+        return object
+    
+    # 結構目錄查詢：一次讀取所有資料表與欄位，依表名查詢單一資料表
+    _CATALOG_SQL = """
+    SELECT
+        TABLE_NAME,
+        COLUMN_NAME,
+        DATA_TYPE,
+        CHARACTER_MAXIMUM_LENGTH,
+        NUMERIC_PRECISION,
+        NUMERIC_SCALE,
+        IS_NULLABLE
+    FROM INFORMATION_SCHEMA.COLUMNS
+    {where}
+    ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """
+
+    @staticmethod
+    def _catalog_key(table_name: str) -> str:
+        """資料表在結構目錄中的鍵值 (SQL Server 預設定序不分大小寫)"""
+        return table_name.strip('[]').lower()
+
+    def _read_catalog(self, db_name: str, table_name: str = None) -> Dict[str, list]:
+        """
+        自資料庫讀取資料表與欄位資訊
+
+        Args:
+            table_name: 只讀取指定的資料表，未指定時讀取整個資料庫
+
+        Returns:
+            {小寫表名: 欄位資訊清單}
+        """
+        engine = self.get_engine(db_name)
+        tables = {}
+        if engine.dialect.name == 'mssql':
+            where = "WHERE TABLE_NAME = :table_name" if table_name else ""
+            params = {'table_name': table_name.strip('[]')} if table_name else {}
+            with engine.connect() as conn:
+                rows = conn.execute(text(self._CATALOG_SQL.format(where=where)), params).fetchall()
+            for row in rows:
+                tables.setdefault(self._catalog_key(row[0]), []).append({
+                    "name": row[1],
+                    "type": row[2],
+                    "max_length": row[3],
+                    "precision": row[4],
+                    "scale": row[5],
+                    "nullable": row[6]
+                })
+            return tables
+
+        # 其他資料庫使用 SQLAlchemy inspector
+        inspector = inspect(engine)
+        names = [table_name.strip('[]')] if table_name else inspector.get_table_names()
+        for name in names:
+            if not inspector.has_table(name):
+                continue
+            tables[self._catalog_key(name)] = [
+                {
+                    "name": column['name'],
+                    "type": str(column['type']),
+                    "max_length": getattr(column['type'], 'length', None),
+                    "precision": getattr(column['type'], 'precision', None),
+                    "scale": getattr(column['type'], 'scale', None),
+                    "nullable": 'YES' if column.get('nullable', True) else 'NO'
+                }
+                for column in inspector.get_columns(name)
+            ]
+        return tables
+
+    def _lookup_table(self, db_name: str, table_name: str) -> Optional[list]:
+        """
+        自結構目錄快取查詢資料表欄位 (資料表不存在時回傳 None)
+
+        第一次查詢某資料庫時以單一查詢載入全部資料表；被 ETL DDL 標記為失效的資料表
+        在下次查詢時個別重新讀取。
+        """
+        key = self._catalog_key(table_name)
+        with self._catalog_lock:
+            catalog = self._catalogs.get(db_name)
+            if catalog is None:
+                started = time.perf_counter()
+                catalog = {'tables': self._read_catalog(db_name), 'stale': set()}
+                self._catalogs[db_name] = catalog
+                self.logger.debug(f"已載入 {db_name} 結構目錄: {len(catalog['tables'])} 個資料表 "
+                                  f"({time.perf_counter() - started:.2f} 秒)")
+            elif key in catalog['stale']:
+                catalog['tables'].pop(key, None)
+                catalog['tables'].update(self._read_catalog(db_name, table_name))
+                catalog['stale'].discard(key)
+            return catalog['tables'].get(key)
+
+    def invalidate_catalog(self, db_name: str, *table_names: str):
+        """
+        將資料表的結構目錄快取標記為失效 (ETL 建立、刪除、重新命名或變更資料表後呼叫)
+
+        未指定資料表時清除整個資料庫的快取。
+        """
+        with self._catalog_lock:
+            if not table_names:
+                self._catalogs.pop(db_name, None)
+                return
+            catalog = self._catalogs.get(db_name)
+            if catalog is not None:
+                catalog['stale'].update(self._catalog_key(name) for name in table_names)
+
+    def check_table_exists(self, db_name: str, table_name: str) -> bool:
+        """檢查表是否存在 (使用結構目錄快取)"""
+        try:
+            return self._lookup_table(db_name, table_name) is not None
         except Exception as e:
             self.logger.error(f"檢查表 {table_name} 是否存在失敗: {e}")
             return False
     
     def get_table_structure(self, db_name: str, table_name: str) -> list:
-        """取得資料表結構資訊"""
-        query = """
-        SELECT 
-            COLUMN_NAME, 
-            DATA_TYPE, 
-            CHARACTER_MAXIMUM_LENGTH,
-            NUMERIC_PRECISION,
-            NUMERIC_SCALE,
-            IS_NULLABLE
-        FROM INFORMATION_SCHEMA.COLUMNS 
-        WHERE TABLE_NAME = ?
-        ORDER BY ORDINAL_POSITION
-        """
-        
+        """取得資料表結構資訊 (使用結構目錄快取)"""
         try:
-            with self.get_connection_context(db_name) as connection:
-                cursor = self.execute_query_safely(connection, query, [table_name])
-                columns = []
-                for row in cursor.fetchall():
-                    column_info = {
-                        "name": row[0],
-                        "type": row[1],
-                        "max_length": row[2],
-                        "precision": row[3],
-                        "scale": row[4],
-                        "nullable": row[5]
-                    }
-                    columns.append(column_info)
-                return columns
+            return list(self._lookup_table(db_name, table_name) or [])
         except Exception as e:
             self.logger.error(f"取得表 {table_name} 結構失敗: {e}")
             return []
     
+    @staticmethod
+    def safe_batch_size(column_count: int, max_parameters: int = 2100) -> int:
+        """
+        依欄位數計算單一多列 INSERT 陳述式可容納的資料列數
+
+        SQL Server 單一陳述式最多 2100 個參數 (保留 1 個給驅動程式)，VALUES 最多 1000 列。
+        """
+        return max(1, min(1000, (max_parameters - 1) // max(1, column_count)))
+
+    @staticmethod
+    def _frame_to_rows(df: pd.DataFrame) -> list:
+        """將DataFrame轉為驅動程式可接受的資料列 (NULL 轉為 None，numpy 純量轉為 Python 原生型別)"""
+        columns = []
+        for i in range(df.shape[1]):
+            series = df.iloc[:, i]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                # to_pydatetime 於 pandas 3 回傳索引重新編號的 Series，轉為陣列避免依索引重新對齊
+                values = pd.Series(np.asarray(series.dt.to_pydatetime(), dtype=object), index=series.index, dtype=object)
+            else:
+                values = series.astype(object)
+            columns.append(values.where(series.notna(), None).tolist())
+        return list(zip(*columns))
+
+    def bulk_write(self, db_name: str, table_name: str, df: pd.DataFrame, if_exists: str = 'append',
+                   dtype: Dict[str, Any] = None, method: str = None, tablock: bool = None,
+                   progress_callback: Callable[[int], None] = None, batch_sizer=None,
+                   create_statements: list = None) -> int:
+        """
+        大量寫入DataFrame至目標表
+
+        Args:
+            db_name: 目標資料庫名稱
+            table_name: 目標表名稱
+            df: 要寫入的資料
+            if_exists: append 附加 (表不存在時建立) / replace 重建目標表
+            dtype: 建立目標表時使用的欄位型別 (同 to_sql 的 dtype)
+            method: executemany / tvp / multi，預設為 ETLConfig.BULK_LOAD_METHOD
+            tablock: 是否加上 TABLOCK 提示 (空表或堆積表可最小化交易記錄)，預設為 ETLConfig.BULK_TABLOCK
+            progress_callback: 每批寫入後以累計筆數呼叫
+            batch_sizer: 自我調整批次大小控制器 (AdaptiveBatchSizer)，未提供時每批 BULK_BATCH_ROWS 筆
+            create_statements: 建立目標表後於同一交易內執行的 DDL (NOT NULL、叢集索引、壓縮等)
+
+        Returns:
+            寫入筆數
+        """
+        method = method or self.etl_config.BULK_LOAD_METHOD
+        tablock = self.etl_config.BULK_TABLOCK if tablock is None else tablock
+        if method not in ('executemany', 'tvp', 'multi'):
+            raise ValueError(f"不支援的大量寫入方式: {method}")
+
+        engine = self.get_engine(db_name)
+        is_mssql = engine.dialect.name == 'mssql'
+        if method == 'tvp' and not is_mssql:
+            method = 'executemany'
+
+        self._prepare_bulk_table(db_name, engine, table_name, df, if_exists, dtype, create_statements)
+        if df.empty:
+            return 0
+
+        if method == 'multi':
+            return self._bulk_write_multi(engine, table_name, df, progress_callback, batch_sizer)
+        return self._bulk_write_rows(engine, table_name, df, method, tablock and is_mssql,
+                                     progress_callback, batch_sizer)
+
+    def _prepare_bulk_table(self, db_name: str, engine, table_name: str, df: pd.DataFrame, if_exists: str,
+                            dtype: Dict[str, Any] = None, create_statements: list = None):
+        """
+        依需要重建目標表
+
+        dtype 指定的欄位使用宣告型別，其餘欄位以前 1000 筆推斷 (與 to_sql 的規則相同)；
+        建立後執行 create_statements，於寫入資料前完成索引與壓縮設定。
+        """
+        exists = self.check_table_exists(db_name, table_name)
+        if if_exists != 'replace' and exists:
+            return
+
+        ddl = pd.io.sql.get_schema(df.head(1000), table_name, con=engine, dtype=dtype)
+        try:
+            with engine.begin() as conn:
+                if exists:
+                    conn.execute(text(f"DROP TABLE {table_name}"))
+                conn.execute(text(ddl))
+                for statement in create_statements or []:
+                    conn.execute(text(statement))
+        finally:
+            self.invalidate_catalog(db_name, table_name)
+
+    def _iter_batches(self, df: pd.DataFrame, batch_sizer=None) -> Iterator[pd.DataFrame]:
+        """依固定或自我調整的批次大小切分DataFrame"""
+        start = 0
+        while start < len(df):
+            batch_rows = batch_sizer.size if batch_sizer is not None else self.etl_config.BULK_BATCH_ROWS
+            batch = df.iloc[start:start + batch_rows]
+            yield batch
+            start += len(batch)
+
+    def _bulk_write_multi(self, engine, table_name: str, df: pd.DataFrame,
+                          progress_callback: Callable[[int], None] = None, batch_sizer=None) -> int:
+        """以多列 VALUES 寫入，每個陳述式的列數依欄位數與參數上限計算"""
+        chunksize = self.safe_batch_size(len(df.columns), self.etl_config.SQL_SERVER_MAX_PARAMETERS)
+        self.logger.debug(f"以 multi 方式寫入 {table_name}，每個陳述式 {chunksize} 筆")
+
+        written = 0
+        for batch in self._iter_batches(df, batch_sizer):
+            started = time.perf_counter()
+            batch.to_sql(table_name, engine, if_exists='append', index=False, method='multi', chunksize=chunksize)
+            if batch_sizer is not None:
+                batch_sizer.record(len(batch), time.perf_counter() - started)
+            written += len(batch)
+            if progress_callback:
+                progress_callback(written)
+        return written
+
+    def _bulk_write_rows(self, engine, table_name: str, df: pd.DataFrame, method: str, tablock: bool,
+                         progress_callback: Callable[[int], None] = None, batch_sizer=None) -> int:
+        """
+        以參數陣列 (fast_executemany) 或資料表值參數寫入，全部批次於同一交易內提交
+
+        TVP 方式每批只送出一個 INSERT ... SELECT 陳述式，資料型別由依目標表建立的資料表類型決定。
+        """
+        column_list = ", ".join(f"[{column}]" for column in df.columns)
+        hint = " WITH (TABLOCK)" if tablock else ""
+        type_name = None
+
+        raw_connection = engine.raw_connection()
+        try:
+            cursor = raw_connection.cursor()
+            if method == 'tvp':
+                type_name = self._create_table_type(cursor, table_name, list(df.columns))
+                sql = f"INSERT INTO {table_name}{hint} ({column_list}) SELECT {column_list} FROM ?"
+            else:
+                if engine.dialect.name == 'mssql':
+                    cursor.fast_executemany = True
+                placeholders = ", ".join("?" for _ in df.columns)
+                sql = f"INSERT INTO {table_name}{hint} ({column_list}) VALUES ({placeholders})"
+            self.logger.debug(f"以 {method} 方式寫入 {table_name}")
+
+            written = 0
+            for batch in self._iter_batches(df, batch_sizer):
+                started = time.perf_counter()
+                rows = self._frame_to_rows(batch)
+                if method == 'tvp':
+                    # pyodbc 資料表值參數：前兩個元素為資料表類型名稱與結構描述
+                    cursor.execute(sql, ([type_name, 'dbo'] + rows,))
+                else:
+                    cursor.executemany(sql, rows)
+                if batch_sizer is not None:
+                    batch_sizer.record(len(rows), time.perf_counter() - started)
+                written += len(rows)
+                if progress_callback:
+                    progress_callback(written)
+
+            if type_name:
+                cursor.execute(f"DROP TYPE dbo.[{type_name}]")
+            raw_connection.commit()
+            return written
+        except Exception:
+            raw_connection.rollback()
+            raise
+        finally:
+            raw_connection.close()
+
+    def _create_table_type(self, cursor, table_name: str, columns: list) -> str:
+        """依目標表欄位定義建立 TVP 使用的資料表類型 (欄位順序與寫入資料相同)"""
+        type_name = f"{table_name}_tvp"
+        cursor.execute("""
+        SELECT COLUMN_NAME, DATA_TYPE, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE
+        FROM INFORMATION_SCHEMA.COLUMNS
+        WHERE TABLE_NAME = ?
+        """, [table_name])
+
+        definitions = {}
+        for column_name, data_type, max_length, precision, scale in cursor.fetchall():
+            if data_type in ('nvarchar', 'varchar', 'nchar', 'char', 'varbinary', 'binary'):
+                data_type = f"{data_type}({'max' if max_length == -1 else max_length})"
+            elif data_type in ('decimal', 'numeric'):
+                data_type = f"{data_type}({precision}, {scale})"
+            definitions[column_name] = f"[{column_name}] {data_type}"
+
+        missing = [column for column in columns if column not in definitions]
+        if missing:
+            raise ValueError(f"目標表 {table_name} 缺少欄位: {', '.join(missing)}")
+
+        cursor.execute(f"IF TYPE_ID(N'dbo.{type_name}') IS NOT NULL DROP TYPE dbo.[{type_name}]")
+        cursor.execute(f"CREATE TYPE dbo.[{type_name}] AS TABLE ({', '.join(definitions[c] for c in columns)})")
+        return type_name
+
+    def execute_statements(self, db_name: str, statements: list):
+        """於同一交易內依序執行多個陳述式 (DDL 等)"""
+        if not statements:
+            return
+        with self.get_engine_context(db_name) as engine:
+            with engine.begin() as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+
+    def drop_table(self, db_name: str, table_name: str):
+        """刪除資料表 (不存在時略過)"""
+        if not self.check_table_exists(db_name, table_name):
+            return
+        try:
+            with self.get_engine(db_name).begin() as conn:
+                conn.execute(text(f"DROP TABLE {table_name}"))
+        finally:
+            self.invalidate_catalog(db_name, table_name)
+
+    def rename_table(self, db_name: str, table_name: str, new_name: str):
+        """重新命名資料表"""
+        engine = self.get_engine(db_name)
+        try:
+            with engine.begin() as conn:
+                if engine.dialect.name == 'mssql':
+                    conn.execute(text(f"EXEC sp_rename N'{table_name}', N'{new_name}'"))
+                else:
+                    conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {new_name}"))
+        finally:
+            self.invalidate_catalog(db_name, table_name, new_name)
+
+    def swap_tables(self, db_name: str, table_name: str, replacement_table: str, retain_as: str):
+        """
+        以重新命名將 replacement_table 換為正式表 table_name，原正式表保留為 retain_as
+
+        所有重新命名在同一交易內完成 (SQL Server 使用 sp_rename)，讀取端只會短暫等待
+        結構描述鎖定，不會看到空表或缺表；retain_as 已存在時先刪除。
+        """
+        engine = self.get_engine(db_name)
+        try:
+            with engine.begin() as conn:
+                if engine.dialect.name == 'mssql':
+                    conn.execute(text(f"IF OBJECT_ID(N'{retain_as}', N'U') IS NOT NULL DROP TABLE {retain_as}"))
+                    conn.execute(text(
+                        f"IF OBJECT_ID(N'{table_name}', N'U') IS NOT NULL EXEC sp_rename N'{table_name}', N'{retain_as}'"
+                    ))
+                    conn.execute(text(f"EXEC sp_rename N'{replacement_table}', N'{table_name}'"))
+                else:
+                    if inspect(conn).has_table(retain_as):
+                        conn.execute(text(f"DROP TABLE {retain_as}"))
+                    if inspect(conn).has_table(table_name):
+                        conn.execute(text(f"ALTER TABLE {table_name} RENAME TO {retain_as}"))
+                    conn.execute(text(f"ALTER TABLE {replacement_table} RENAME TO {table_name}"))
+        finally:
+            self.invalidate_catalog(db_name, table_name, replacement_table, retain_as)
+        self.logger.info(f"已將 {replacement_table} 切換為 {table_name}，原表保留為 {retain_as}")
+
+    def merge_tables(self, db_name: str, target_table: str, source_table: str, key_columns: list,
+                     delete_missing: bool = True) -> Dict[str, int]:
+        """
+        以主鍵將 source_table 的資料合併至 target_table，只寫入有變更的資料列
+
+        主鍵相同且任一欄位值不同 (NULL 視為相同值) 的資料列更新，目標表沒有的資料列新增，
+        delete_missing 時刪除來源已不存在的資料列。SQL Server 使用單一 MERGE 陳述式，
+        其他資料庫以同一交易內的 DELETE/INSERT 完成。兩表欄位不一致時 (查詢新增或移除欄位) 拋出 ValueError。
+
+        Returns:
+            {'inserted': 新增筆數, 'updated': 更新筆數, 'deleted': 刪除筆數}
+        """
+        engine = self.get_engine(db_name)
+        columns = [column['name'] for column in self.get_table_structure(db_name, source_table)]
+        missing_keys = [key for key in key_columns if key not in columns]
+        if missing_keys:
+            raise ValueError(f"{source_table} 缺少主鍵欄位: {', '.join(missing_keys)}")
+
+        target_columns = [column['name'] for column in self.get_table_structure(db_name, target_table)]
+        if set(target_columns) != set(columns):
+            not_in_target = [column for column in columns if column not in target_columns]
+            not_in_source = [column for column in target_columns if column not in columns]
+            raise ValueError(
+                f"{source_table} 與 {target_table} 的欄位不一致 "
+                f"(目標表缺少: {', '.join(not_in_target) or '無'}；暫存表缺少: {', '.join(not_in_source) or '無'})，"
+                f"請刪除 {target_table} 後重新執行以依新的欄位結構建立"
+            )
+
+        key_list = ", ".join(f"[{key}]" for key in key_columns)
+        with engine.begin() as conn:
+            duplicates = conn.execute(text(
+                f"SELECT COUNT(*) FROM (SELECT {key_list} FROM {source_table} "
+                f"GROUP BY {key_list} HAVING COUNT(*) > 1) d"
+            )).scalar()
+            if duplicates:
+                raise ValueError(f"{source_table} 有 {duplicates} 組重複的主鍵 ({key_list})，無法合併")
+
+            if engine.dialect.name == 'mssql':
+                counts = self._merge_mssql(conn, target_table, source_table, columns, key_columns, delete_missing)
+            else:
+                counts = self._merge_generic(conn, target_table, source_table, columns, key_columns, delete_missing)
+
+        self.logger.info(
+            f"已合併 {source_table} 至 {target_table}: 新增 {counts['inserted']} 筆，"
+            f"更新 {counts['updated']} 筆，刪除 {counts['deleted']} 筆"
+        )
+        return counts
+
+    def _merge_mssql(self, conn, target_table: str, source_table: str, columns: list, key_columns: list,
+                     delete_missing: bool) -> Dict[str, int]:
+        """SQL Server MERGE，以 OUTPUT $action 統計各動作的筆數"""
+        key_match = " AND ".join(f"t.[{key}] = s.[{key}]" for key in key_columns)
+        value_columns = [column for column in columns if column not in key_columns]
+        column_list = ", ".join(f"[{column}]" for column in columns)
+        source_list = ", ".join(f"s.[{column}]" for column in columns)
+
+        clauses = []
+        if value_columns:
+            # EXCEPT 比較可正確處理 NULL，只更新實際有變更的資料列
+            source_values = ", ".join(f"s.[{column}]" for column in value_columns)
+            target_values = ", ".join(f"t.[{column}]" for column in value_columns)
+            update_set = ", ".join(f"t.[{column}] = s.[{column}]" for column in value_columns)
+            clauses.append(
+                f"WHEN MATCHED AND EXISTS (SELECT {source_values} EXCEPT SELECT {target_values}) "
+                f"THEN UPDATE SET {update_set}"
+            )
+        clauses.append(f"WHEN NOT MATCHED BY TARGET THEN INSERT ({column_list}) VALUES ({source_list})")
+        if delete_missing:
+            clauses.append("WHEN NOT MATCHED BY SOURCE THEN DELETE")
+
+        sql = f"""
+        SET NOCOUNT ON;
+        DECLARE @changes TABLE ([action] NVARCHAR(10));
+        MERGE {target_table} WITH (HOLDLOCK) AS t
+        USING {source_table} AS s
+        ON {key_match}
+        {chr(10).join(clauses)}
+        OUTPUT $action INTO @changes;
+        SELECT [action], COUNT(*) FROM @changes GROUP BY [action];
+        """
+        actions = dict(conn.execute(text(sql)).fetchall())
+        return {
+            'inserted': actions.get('INSERT', 0),
+            'updated': actions.get('UPDATE', 0),
+            'deleted': actions.get('DELETE', 0),
+        }
+
+    def _merge_generic(self, conn, target_table: str, source_table: str, columns: list, key_columns: list,
+                       delete_missing: bool) -> Dict[str, int]:
+        """不支援 MERGE 的資料庫：刪除已消失與已變更的資料列後插入來源中目標表沒有的資料列"""
+        key_match = " AND ".join(f"{target_table}.[{key}] = s.[{key}]" for key in key_columns)
+        column_list = ", ".join(f"[{column}]" for column in columns)
+        source_values = ", ".join(f"s.[{column}]" for column in columns)
+        target_values = ", ".join(f"{target_table}.[{column}]" for column in columns)
+
+        deleted = 0
+        if delete_missing:
+            deleted = conn.execute(text(
+                f"DELETE FROM {target_table} WHERE NOT EXISTS "
+                f"(SELECT 1 FROM {source_table} s WHERE {key_match})"
+            )).rowcount
+
+        updated = conn.execute(text(
+            f"DELETE FROM {target_table} WHERE EXISTS (SELECT 1 FROM {source_table} s WHERE {key_match} "
+            f"AND EXISTS (SELECT {source_values} EXCEPT SELECT {target_values}))"
+        )).rowcount
+
+        new_key_match = " AND ".join(f"t.[{key}] = {source_table}.[{key}]" for key in key_columns)
+        written = conn.execute(text(
+            f"INSERT INTO {target_table} ({column_list}) SELECT {column_list} FROM {source_table} "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {target_table} t WHERE {new_key_match})"
+        )).rowcount
+
+        return {'inserted': written - updated, 'updated': updated, 'deleted': deleted}
+
     def close_connections(self):
         """關閉所有連線"""
-        for db_name, connection in self._connections.items():
+        for db_name, pool in self._pools.items():
             try:
-                if connection:
-                    connection.close()
-                    self.logger.info(f"已關閉 {db_name} 資料庫連線")
+                stats = pool.stats()
+                pool.close()
+                self.logger.info(
+                    f"已關閉 {db_name} 連線池 (取出 {stats['checkouts']} 次，使用中高峰 {stats['peak_in_use']} 個，"
+                    f"使用率 {stats['utilization']:.0%}，等待 {stats['waits']} 次共 {stats['wait_seconds']} 秒，"
+                    f"建立 {stats['created']} 個連線)"
+                )
             except Exception as e:
-                self.logger.warning(f"關閉 {db_name} 連線時發生錯誤: {e}")
+                self.logger.warning(f"關閉 {db_name} 連線池時發生錯誤: {e}")
         
-        self._connections.clear()
+        self._pools.clear()
         
         # 清理SQLAlchemy引擎
         for db_name, engine in self._engines.items():
@@ -256,8 +1310,41 @@ class DatabaseManager:
         
         self._engines.clear()
     
-    def test_connection(self, db_name: str) -> bool:
-        """測試資料庫連線"""
+    def preflight(self, db_names: list) -> Dict[str, bool]:
+        """
+        同時測試多個資料庫的連線，結果於 PREFLIGHT_CACHE_SECONDS 內供 test_connection 沿用
+        
+        Returns:
+            {資料庫名稱: 是否可連線}
+        """
+        db_names = list(dict.fromkeys(db_names))
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=max(1, len(db_names)), thread_name_prefix="etl-preflight") as executor:
+            results = dict(zip(db_names, executor.map(lambda db_name: self.test_connection(db_name, use_cache=False),
+                                                       db_names)))
+        
+        summary = "，".join(f"{db_name} {'成功' if ok else '失敗'}" for db_name, ok in results.items())
+        self.logger.info(f"連線預檢完成 ({time.perf_counter() - started:.1f} 秒): {summary}")
+        return results
+    
+    def test_connection(self, db_name: str, use_cache: bool = True) -> bool:
+        """
+        測試資料庫連線
+        
+        use_cache 為 True 且 PREFLIGHT_CACHE_SECONDS 內已測試過時沿用上次結果，不重新連線。
+        """
+        if use_cache:
+            cached = self._health.get(db_name)
+            if cached and time.monotonic() - cached[1] < self.etl_config.PREFLIGHT_CACHE_SECONDS:
+                self.logger.debug(f"{db_name} 沿用連線預檢結果: {'成功' if cached[0] else '失敗'}")
+                return cached[0]
+        
+        result = self._probe_connection(db_name)
+        self._health[db_name] = (result, time.monotonic())
+        return result
+    
+    def _probe_connection(self, db_name: str) -> bool:
+        """實際連線並執行 SELECT 1"""
         try:
             with self.get_connection_context(db_name) as connection:
                 cursor = connection.cursor()
@@ -12,6 +12,7 @@ from typing import Dict, Any, List
 from config import get_config_manager, get_etl_config
 from database import DatabaseManager
 from sql_loader import SQLLoader
+from extract_cache import ExtractCache
 
 
 class ETLDiagnostics:
@@ -22,23 +23,19 @@ class ETLDiagnostics:
         self.db_manager = db_manager
         self.sql_loader = sql_loader
         self.etl_config = config_manager.etl_config
+        self.extract_cache = ExtractCache(config_manager)
         self.logger = logging.getLogger("ETL_Diagnostics")
     
     def check_database_connections(self) -> Dict[str, bool]:
         """檢查所有資料庫連線"""
         db_configs = ['mes_db', 'sap_db', 'tableau_db']
-        results = {}
         
         self.logger.info("檢查資料庫連線...")
-        for db_name in db_configs:
-            try:
-                result = self.db_manager.test_connection(db_name)
-                results[db_name] = result
-                status = "成功" if result else "失敗"
-                self.logger.info(f"{db_name}: {status}")
-            except Exception as e:
-                results[db_name] = False
-                self.logger.error(f"{db_name}: 失敗 - {e}")
+        # 同時測試所有資料庫，較慢或無法連線的伺服器不會延後其他資料庫的結果
+        results = self.db_manager.preflight(db_configs)
+        for db_name, result in results.items():
+            status = "成功" if result else "失敗"
+            self.logger.info(f"{db_name}: {status}")
         
         return results
     
@@ -93,8 +90,9 @@ class ETLDiagnostics:
         
         return results
     
-    def test_query_execution(self, source_db: str, queries: List[Dict[str, Any]], limit: int = 5) -> Dict[str, Dict[str, Any]]:
-        """測試查詢執行（限制返回行數）"""
+    def test_query_execution(self, source_db: str, queries: List[Dict[str, Any]], limit: int = 5,
+                             use_cache: bool = False) -> Dict[str, Dict[str, Any]]:
+        """測試查詢執行（限制返回行數），use_cache 時優先使用有效的擷取快取"""
         results = {}
         self.logger.info(f"測試 {source_db} 查詢執行（限制 {limit} 行）...")
         
@@ -103,18 +101,27 @@ class ETLDiagnostics:
             sql_file = query['sql_file']
             
             try:
-                # 載入SQL並修改為限制行數
-                sql_content = self.sql_loader.load_sql_file(sql_file)
-                
-                # 在SQL前面加上TOP限制（僅適用於SQL Server）
-                if sql_content.strip().lower().startswith('select'):
-                    # 如果已經有TOP，則不添加
-                    if 'top ' not in sql_content.lower()[:100]:
-                        sql_content = sql_content.replace('SELECT', f'SELECT TOP {limit}', 1)
+                # 有效的擷取快取可直接使用，不必查詢正式環境
+                cached = None
+                if use_cache:
+                    cached = self.extract_cache.get(query_name, self.sql_loader.get_sql_hash(sql_file))
                 
-                # 執行查詢
-                with self.db_manager.get_connection_context(source_db) as conn:
-                    df = pd.read_sql(sql_content, conn)
+                if cached is not None:
+                    df = cached['df'].head(limit)
+                    self.logger.info(f"  {query_name}: 使用擷取快取 (擷取於 {cached['extracted_at']})")
+                else:
+                    # 載入SQL並修改為限制行數
+                    sql_content = self.sql_loader.load_sql_file(sql_file)
+                    
+                    # 在SQL前面加上TOP限制（僅適用於SQL Server）
+                    if sql_content.strip().lower().startswith('select'):
+                        # 如果已經有TOP，則不添加
+                        if 'top ' not in sql_content.lower()[:100]:
+                            sql_content = sql_content.replace('SELECT', f'SELECT TOP {limit}', 1)
+                    
+                    # 執行查詢
+                    with self.db_manager.get_connection_context(source_db) as conn:
+                        df = pd.read_sql(sql_content, conn)
                 
                 results[query_name] = {
                     'success': True,
@@ -243,7 +250,7 @@ class ETLDiagnostics:
         
         return "\n".join(report_lines)
     
-    def run_full_diagnostics(self) -> Dict[str, Any]:
+    def run_full_diagnostics(self, use_cache: bool = False) -> Dict[str, Any]:
         """執行完整診斷"""
         results = {}
         
@@ -278,12 +285,12 @@ class ETLDiagnostics:
         if results['connections'].get('mes_db', False):
             mes_queries = self.config_manager.get_queries_by_type('mes')
             if mes_queries:
-                results['query_execution']['mes_db'] = self.test_query_execution('mes_db', mes_queries, limit=3)
+                results['query_execution']['mes_db'] = self.test_query_execution('mes_db', mes_queries, limit=3, use_cache=use_cache)
         
         if results['connections'].get('sap_db', False):
             sap_queries = self.config_manager.get_queries_by_type('sap')
             if sap_queries:
-                results['query_execution']['sap_db'] = self.test_query_execution('sap_db', sap_queries, limit=3)
+                results['query_execution']['sap_db'] = self.test_query_execution('sap_db', sap_queries, limit=3, use_cache=use_cache)
         
         # 5. 檢查目標表相容性
         if results['connections'].get('tableau_db', False):
@@ -311,6 +318,8 @@ def main():
     parser.add_argument('--config', help='指定配置檔案路徑', default='db.json')
     parser.add_argument('--output', help='指定報告輸出檔案路徑')
     parser.add_argument('--connections-only', action='store_true', help='僅檢查資料庫連線')
+    parser.add_argument('--use-cache', action='store_true', help='查詢執行測試優先使用有效的擷取快取')
+    parser.add_argument('--offline', choices=['sqlite', 'duckdb'], help='診斷本機離線後端 (不連線 SQL Server)')
     args = parser.parse_args()
     
     # 設定日誌
@@ -321,6 +330,8 @@ def main():
         config_manager = get_config_manager()
         if args.config != 'db.json':
             config_manager.db_config_file = args.config
+        if args.offline:
+            config_manager.etl_config.OFFLINE_BACKEND = args.offline
         
         # 驗證配置
         if not config_manager.validate_config():
@@ -339,7 +350,7 @@ def main():
             results = {'connections': diagnostics.check_database_connections()}
         else:
             # 完整診斷
-            results = diagnostics.run_full_diagnostics()
+            results = diagnostics.run_full_diagnostics(use_cache=args.use_cache)
         
         # 生成報告
         report = diagnostics.generate_diagnostic_report(results)
@@ -12,6 +12,8 @@ import os
 import time
 from tabulate import tabulate
 
+from schema_migrations import SchemaMigrator
+
 # 設定日誌
 logging.basicConfig(
     level=logging.INFO,
@@ -637,29 +639,10 @@ def check_and_create_etl_summary():
         conn = pyodbc.connect(conn_str)
         cursor = conn.cursor()
 
-        # 檢查 ETL_SUMMARY 表是否存在
-        cursor.execute("""
-        IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = 'ETL_SUMMARY')
-        BEGIN
-            CREATE TABLE ETL_SUMMARY (
-                [ID] INT IDENTITY(1,1) PRIMARY KEY,
-                [TIMESTAMP] VARCHAR(20),
-                [SOURCE_TYPE] VARCHAR(50),
-                [QUERY_NAME] VARCHAR(100),
-                [TARGET_TABLE] VARCHAR(100),
-                [ROW_COUNT] INT,
-                [ETL_DATE] DATETIME DEFAULT GETDATE()
-            )
-            
-            SELECT 'Table created' AS Status
-        END
-        ELSE
-        BEGIN
-            SELECT 'Table exists' AS Status
-        END
-        """)
-        result = cursor.fetchone()
-        conn.commit()
+        # 檢查 ETL_SUMMARY 表是否存在，並以與 app.py 相同的遷移定義建立或更新表結構
+        cursor.execute("SELECT OBJECT_ID(N'ETL_SUMMARY', N'U')")
+        result = ('Table exists',) if cursor.fetchone()[0] is not None else ('Table created',)
+        SchemaMigrator().migrate(conn)
 
         # 新增測試數據（只在表是空的時候才添加）
         cursor.execute("SELECT COUNT(*) FROM ETL_SUMMARY")
@@ -677,20 +660,20 @@ def check_and_create_etl_summary():
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, today.strftime("%Y%m%d%H%M%S"), 'MES', 'mes_order_status', 'tableau_mes_order_status', 125, today)
+            """, today, 'MES', 'mes_order_status', 'tableau_mes_order_status', 125, today)
 
             cursor.execute("""
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, today.strftime("%Y%m%d%H%M%S"), 'MES', 'mes_material_loss', 'tableau_mes_material_loss', 98, today)
+            """, today, 'MES', 'mes_material_loss', 'tableau_mes_material_loss', 98, today)
 
             # 插入 SAP 測試數據
             cursor.execute("""
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, today.strftime("%Y%m%d%H%M%S"), 'SAP', 'sap_production_order', 'tableau_sap_production_order', 210, today)
+            """, today, 'SAP', 'sap_production_order', 'tableau_sap_production_order', 210, today)
 
             # 插入前一天的測試數據
             yesterday = today - timedelta(days=1)
@@ -698,19 +681,19 @@ def check_and_create_etl_summary():
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, yesterday.strftime("%Y%m%d%H%M%S"), 'MES', 'mes_order_status', 'tableau_mes_order_status', 130, yesterday)
+            """, yesterday, 'MES', 'mes_order_status', 'tableau_mes_order_status', 130, yesterday)
 
             cursor.execute("""
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, yesterday.strftime("%Y%m%d%H%M%S"), 'MES', 'mes_material_loss', 'tableau_mes_material_loss', 110, yesterday)
+            """, yesterday, 'MES', 'mes_material_loss', 'tableau_mes_material_loss', 110, yesterday)
 
             cursor.execute("""
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, yesterday.strftime("%Y%m%d%H%M%S"), 'SAP', 'sap_production_order', 'tableau_sap_production_order', 220, yesterday)
+            """, yesterday, 'SAP', 'sap_production_order', 'tableau_sap_production_order', 220, yesterday)
 
             # 插入前兩天的測試數據
             two_days_ago = today - timedelta(days=2)
@@ -718,19 +701,19 @@ def check_and_create_etl_summary():
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, two_days_ago.strftime("%Y%m%d%H%M%S"), 'MES', 'mes_order_status', 'tableau_mes_order_status', 128, two_days_ago)
+            """, two_days_ago, 'MES', 'mes_order_status', 'tableau_mes_order_status', 128, two_days_ago)
 
             cursor.execute("""
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, two_days_ago.strftime("%Y%m%d%H%M%S"), 'MES', 'mes_material_loss', 'tableau_mes_material_loss', 103, two_days_ago)
+            """, two_days_ago, 'MES', 'mes_material_loss', 'tableau_mes_material_loss', 103, two_days_ago)
 
             cursor.execute("""
             INSERT INTO ETL_SUMMARY 
             ([TIMESTAMP], [SOURCE_TYPE], [QUERY_NAME], [TARGET_TABLE], [ROW_COUNT], [ETL_DATE])
             VALUES (?, ?, ?, ?, ?, ?)
-            """, two_days_ago.strftime("%Y%m%d%H%M%S"), 'SAP', 'sap_production_order', 'tableau_sap_production_order', 215, two_days_ago)
+            """, two_days_ago, 'SAP', 'sap_production_order', 'tableau_sap_production_order', 215, two_days_ago)
 
             conn.commit()
             logger.info("已添加測試資料以初始化儀表板")
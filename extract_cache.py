@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import datetime
+import decimal
+import logging
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+
+from config import ConfigManager
+
+# 選用套件：Parquet 讀寫
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# 欄位型別與快取中繼資料名稱的對應
+_TYPE_NAMES = {
+    bool: 'bool',
+    int: 'int',
+    float: 'float',
+    decimal.Decimal: 'decimal',
+    str: 'str',
+    datetime.datetime: 'datetime',
+}
+_NAME_TYPES = {name: type_ for type_, name in _TYPE_NAMES.items()}
+
+_METADATA_KEY = b'etl_extract'
+
+
+def _stat_files(paths) -> List[Tuple[Path, os.stat_result]]:
+    """取得檔案的 stat 結果，略過期間已被其他行程刪除的檔案"""
+    results = []
+    for path in paths:
+        try:
+            results.append((path, path.stat()))
+        except FileNotFoundError:
+            continue
+    return results
+
+
+class ExtractCache:
+    """
+    本機擷取快取 - 將查詢結果以壓縮 Parquet 保存，鍵值為 SQL 文件內容雜湊與擷取時間
+
+    檔名格式為 {查詢名稱}_{SQL雜湊}_{擷取時間}.parquet；超過有效期限的檔案不會被使用，
+    總容量超過上限時自最舊的檔案開始刪除。
+    """
+
+    def __init__(self, config_manager: ConfigManager):
+        self.config_manager = config_manager
+        self.etl_config = config_manager.etl_config
+        self.logger = logging.getLogger("ExtractCache")
+        cache_dir = Path(self.etl_config.EXTRACT_CACHE_DIR)
+        if not cache_dir.is_absolute():
+            cache_dir = Path(__file__).parent.absolute() / cache_dir
+        self.cache_dir = cache_dir
+
+    @property
+    def available(self) -> bool:
+        """是否可使用快取 (需安裝 pyarrow)"""
+        return pq is not None
+
+    def _cache_path(self, query_name: str, sql_hash: str, extracted_at: datetime.datetime) -> Path:
+        """取得快取檔案路徑"""
+        return self.cache_dir / f"{query_name}_{sql_hash}_{extracted_at:%Y%m%d%H%M%S}.parquet"
+
+    def find(self, query_name: str, sql_hash: str, ttl_minutes: int = None) -> Optional[Path]:
+        """
+        尋找仍在有效期限內的最新快取檔案
+
+        Returns:
+            快取檔案路徑，沒有可用快取時回傳 None
+        """
+        if not self.available or not self.cache_dir.exists():
+            return None
+
+        ttl_minutes = self.etl_config.EXTRACT_CACHE_TTL_MINUTES if ttl_minutes is None else ttl_minutes
+        oldest_allowed = time.time() - ttl_minutes * 60
+        candidates = [
+            (path, stat) for path, stat in _stat_files(self.cache_dir.glob(f"{query_name}_{sql_hash}_*.parquet"))
+            if stat.st_mtime >= oldest_allowed
+        ]
+        if not candidates:
+            return None
+        return max(candidates, key=lambda candidate: candidate[1].st_mtime)[0]
+
+    def get(self, query_name: str, sql_hash: str, ttl_minutes: int = None) -> Optional[Dict[str, Any]]:
+        """
+        讀取有效的快取擷取結果
+
+        Returns:
+            {'df', 'column_types', 'extracted_at', 'path'}，沒有可用快取時回傳 None
+        """
+        path = self.find(query_name, sql_hash, ttl_minutes)
+        if path is None:
+            return None
+
+        try:
+            table = pq.read_table(path)
+            metadata = json.loads((table.schema.metadata or {}).get(_METADATA_KEY, b'{}'))
+            column_types = {
+                column: _NAME_TYPES.get(type_name, object)
+                for column, type_name in metadata.get('column_types', {}).items()
+            }
+            df = table.to_pandas()
+        except Exception as e:
+            self.logger.warning(f"讀取擷取快取 {path} 失敗: {e}")
+            return None
+
+        extracted_at = metadata.get('extracted_at')
+        self.logger.info(f"使用擷取快取: {path.name} ({len(df)} 筆，擷取於 {extracted_at})")
+        return {
+            'df': df,
+            'column_types': column_types,
+            'extracted_at': extracted_at,
+            'path': str(path),
+        }
+
+    def put(self, query_name: str, sql_hash: str, df: pd.DataFrame, column_types: Dict[str, type]) -> Optional[str]:
+        """
+        寫入擷取結果至快取 (失敗時僅記錄警告)
+
+        Returns:
+            快取檔案路徑，未寫入時回傳 None
+        """
+        if not self.available:
+            self.logger.warning("未安裝 pyarrow，無法使用擷取快取")
+            return None
+
+        extracted_at = datetime.datetime.now()
+        path = self._cache_path(query_name, sql_hash, extracted_at)
+        temp_path = path.with_suffix('.tmp')
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[_METADATA_KEY] = json.dumps({
+                'query_name': query_name,
+                'sql_hash': sql_hash,
+                'extracted_at': extracted_at.isoformat(sep=' ', timespec='seconds'),
+                'row_count': len(df),
+                'column_types': {column: _TYPE_NAMES.get(type_, 'object') for column, type_ in column_types.items()},
+            }, ensure_ascii=False).encode('utf-8')
+            table = table.replace_schema_metadata(metadata)
+            pq.write_table(table, temp_path, compression=self.etl_config.EXTRACT_CACHE_COMPRESSION)
+            size = temp_path.stat().st_size
+            os.replace(temp_path, path)
+        except Exception as e:
+            self.logger.warning(f"寫入擷取快取失敗 ({query_name}): {e}")
+            temp_path.unlink(missing_ok=True)
+            return None
+
+        self.logger.info(f"已寫入擷取快取: {path.name} ({size / 1024 / 1024:.1f} MB)")
+        # 清理為盡力而為，失敗不影響本次寫入的快取
+        try:
+            self.evict()
+        except OSError as e:
+            self.logger.warning(f"清理擷取快取失敗: {e}")
+        return str(path)
+
+    def evict(self):
+        """刪除過期的快取檔案，並在總容量超過上限時自最舊的檔案開始刪除"""
+        if not self.cache_dir.exists():
+            return
+
+        # 其他工作執行緒或行程可能同時清理，已不存在的檔案視為已刪除
+        files = sorted(_stat_files(self.cache_dir.glob("*.parquet")), key=lambda item: item[1].st_mtime)
+        expire_before = time.time() - self.etl_config.EXTRACT_CACHE_TTL_MINUTES * 60
+        max_bytes = self.etl_config.EXTRACT_CACHE_MAX_MB * 1024 * 1024
+        total_bytes = sum(stat.st_size for _, stat in files)
+
+        for path, stat in files:
+            if stat.st_mtime >= expire_before and total_bytes <= max_bytes:
+                continue
+            try:
+                path.unlink(missing_ok=True)
+                total_bytes -= stat.st_size
+                self.logger.debug(f"已刪除擷取快取: {path.name}")
+            except OSError as e:
+                self.logger.warning(f"刪除擷取快取 {path.name} 失敗: {e}")
+
+    def clear(self):
+        """清除所有擷取快取"""
+        if not self.cache_dir.exists():
+            return
+        for path in self.cache_dir.glob("*.parquet"):
+            path.unlink(missing_ok=True)
+        self.logger.info("擷取快取已清除")
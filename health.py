@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import random
+import logging
+import threading
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    計算第 attempt 次 (從 0 起算) 重試前的等待秒數 - 指數退避加上完全隨機抖動
+
+    等待時間在 0 與 min(cap, base * 2^attempt) 之間隨機取值，避免多個執行緒或行程同時重新連線。
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class CircuitBreakerOpenError(ConnectionError):
+    """資料庫的斷路器開啟中，不嘗試連線直接失敗"""
+
+
+class CircuitBreaker:
+    """
+    資料庫連線斷路器
+
+    - closed: 正常連線；連續失敗達 failure_threshold 次後轉為 open
+    - open: 直接拒絕連線，經過 reset_timeout 秒後轉為 half_open
+    - half_open: 只允許一個執行緒試探連線，成功則回到 closed，失敗則重新 open
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 60):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.logger = logging.getLogger("CircuitBreaker")
+        self._lock = threading.Lock()
+        self._state = 'closed'
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.last_error = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == 'open' and time.monotonic() - self._opened_at >= self.reset_timeout:
+                return 'half_open'
+            return self._state
+
+    def before_attempt(self):
+        """
+        連線前檢查斷路器狀態
+
+        Raises:
+            CircuitBreakerOpenError: 斷路器開啟中，或半開狀態下已有其他執行緒正在試探
+        """
+        with self._lock:
+            if self._state == 'closed':
+                return
+            remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+            if self._state == 'open' and remaining <= 0:
+                self._state = 'half_open'
+            if self._state == 'half_open' and not self._probing:
+                self._probing = True
+                self.logger.info(f"{self.name} 斷路器半開，試探連線")
+                return
+            raise CircuitBreakerOpenError(
+                f"{self.name} 斷路器開啟中 (最近錯誤: {self.last_error})"
+                + (f"，{remaining:.0f} 秒後重新試探" if remaining > 0 else "")
+            )
+
+    def record_success(self):
+        """記錄連線成功並關閉斷路器"""
+        with self._lock:
+            if self._state != 'closed':
+                self.logger.info(f"{self.name} 連線恢復，斷路器關閉")
+            self._state = 'closed'
+            self._failures = 0
+            self._probing = False
+            self.last_error = None
+
+    def record_failure(self, error: Exception):
+        """記錄連線失敗，連續失敗達門檻 (或半開試探失敗) 時開啟斷路器"""
+        with self._lock:
+            self._failures += 1
+            self.last_error = error
+            if self._state == 'half_open' or self._failures >= self.failure_threshold:
+                if self._state != 'open':
+                    self.logger.warning(f"{self.name} 連續連線失敗 {self._failures} 次，斷路器開啟 {self.reset_timeout} 秒")
+                self._state = 'open'
+                self._opened_at = time.monotonic()
+                self._probing = False
@@ -0,0 +1,492 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import argparse
+import datetime
+import logging
+import random
+import sys
+import time
+from typing import Dict, List, Tuple
+
+from config import get_config_manager, get_etl_config
+from database import DatabaseManager
+
+
+# 離線後端的來源資料表結構 (僅包含 mes/ 與 sap/ 查詢使用的欄位)
+MES_TABLES: Dict[str, List[Tuple[str, str]]] = {
+    'MANUFACTURING_NO': [
+        ('PLANT', 'VARCHAR(10)'), ('MANUFACTURING_OD', 'VARCHAR(20)'), ('MATERIAL', 'VARCHAR(40)'),
+        ('MATERIAL_DESC', 'VARCHAR(100)'), ('MO_TYPE', 'INTEGER'), ('TYPE_SUB_CLASS', 'INTEGER'),
+        ('QTY', 'DECIMAL(18,4)'), ('QTY_DONE', 'DECIMAL(18,4)'),
+        ('PLANNED_S_DATE', 'TIMESTAMP'), ('PLANNED_C_DATE', 'TIMESTAMP'),
+        ('ACTUAL_S_DATE', 'TIMESTAMP'), ('ACTUAL_C_DATE', 'TIMESTAMP'),
+        ('SAP_ORD_STATUS', 'VARCHAR(1)'), ('SHOP_ORD_STATUS', 'INTEGER'),
+    ],
+    'ROUTER_STEP': [
+        ('ROUTER', 'VARCHAR(20)'), ('REVISION', 'VARCHAR(10)'), ('STEP_ID', 'INTEGER'), ('OPERATION', 'VARCHAR(20)'),
+    ],
+    'OPERATION': [
+        ('PLANT', 'VARCHAR(10)'), ('OPERATION', 'VARCHAR(20)'), ('DESCRIPTION', 'VARCHAR(100)'),
+        ('SAP_OPERATION_GP', 'VARCHAR(10)'),
+    ],
+    'RCD_STEP': [
+        ('PLANT', 'VARCHAR(10)'), ('RUN_CARD', 'VARCHAR(20)'), ('ROUTER', 'VARCHAR(20)'), ('REVISION', 'VARCHAR(10)'),
+        ('STEP_ID', 'INTEGER'), ('QTY_COMPLETED', 'DECIMAL(18,4)'), ('DONE', 'INTEGER'),
+    ],
+    'PRD_NG_DATA': [
+        ('RUN_CARD', 'VARCHAR(20)'), ('ROUTER', 'VARCHAR(20)'), ('STEP_ID', 'INTEGER'), ('QTY', 'DECIMAL(18,4)'),
+    ],
+    'DC_BATCHNO_INFO': [
+        ('RUN_CARD', 'VARCHAR(20)'), ('STEP_ID', 'INTEGER'), ('BATCH_NO', 'VARCHAR(30)'),
+        ('IN_QTY', 'DECIMAL(18,4)'), ('STATUS', 'INTEGER'),
+    ],
+    'USER': [
+        ('USER_ID', 'VARCHAR(20)'), ('USER_NAME', 'VARCHAR(50)'),
+    ],
+    'DEVICE': [
+        ('DEVICE', 'VARCHAR(20)'), ('DESCRIPTION', 'VARCHAR(100)'),
+    ],
+    'ASSIGN_M_H': [
+        ('MANUFACTURING_OD', 'VARCHAR(20)'), ('STEP_ID', 'INTEGER'), ('OPERATION_DESC', 'VARCHAR(100)'),
+        ('DEVICE_DESC', 'VARCHAR(100)'), ('USER_NAME', 'VARCHAR(50)'), ('QTY_M', 'DECIMAL(18,4)'),
+        ('CREATED_U_ID', 'VARCHAR(20)'), ('UPDATE_DD', 'TIMESTAMP'),
+    ],
+    'ASSIGN_PLAN': [
+        ('MANUFACTURING_OD', 'VARCHAR(20)'), ('STEP_ID', 'INTEGER'), ('OPERATION_DESC', 'VARCHAR(100)'),
+        ('DEVICE_DESC', 'VARCHAR(100)'), ('QTY_M', 'DECIMAL(18,4)'), ('USER_CNT', 'INTEGER'),
+        ('CREATED_U_ID', 'VARCHAR(20)'), ('UPDATE_DD', 'TIMESTAMP'),
+    ],
+    'ACTUAL_WORK_HOUR_MH_D': [
+        ('GROUP_ID', 'INTEGER'), ('PLANT', 'VARCHAR(10)'), ('MANUFACTURING_OD', 'VARCHAR(20)'),
+        ('RUN_CARD', 'VARCHAR(20)'), ('STEP_ID', 'INTEGER'), ('OPERATION', 'VARCHAR(20)'),
+        ('OPERATION_DESC', 'VARCHAR(100)'), ('DEVICE', 'VARCHAR(20)'), ('AT_QTY', 'DECIMAL(18,4)'),
+        ('COMPONENT', 'VARCHAR(20)'), ('COMPONENT_DESC', 'VARCHAR(50)'), ('AT_SUB', 'VARCHAR(20)'),
+        ('COMPONENT_TYPE', 'VARCHAR(10)'), ('STATUS', 'INTEGER'),
+    ],
+    'BOM_SAP_LOG': [
+        ('MANUFACTURING_OD', 'VARCHAR(20)'), ('PLANT', 'VARCHAR(10)'), ('MATERIAL', 'VARCHAR(40)'),
+        ('ERP_PATH', 'VARCHAR(10)'), ('ERP_PATHNAME', 'VARCHAR(50)'), ('QTY', 'DECIMAL(18,4)'),
+    ],
+    'BOM_COMPONENT': [
+        ('PLANT', 'VARCHAR(10)'), ('BOM', 'VARCHAR(20)'), ('COMPONENT', 'VARCHAR(40)'),
+        ('QTY', 'DECIMAL(18,4)'), ('ASSY_OP', 'VARCHAR(20)'),
+    ],
+    'FEED_MATERIAL_DEVICE': [
+        ('PLANT', 'VARCHAR(10)'), ('MANUFACTURING_OD', 'VARCHAR(20)'), ('MATERIAL', 'VARCHAR(40)'),
+        ('OPERATION', 'VARCHAR(20)'), ('DEVICE', 'VARCHAR(20)'), ('IN_QTY', 'DECIMAL(18,4)'),
+    ],
+}
+
+SAP_TABLES: Dict[str, List[Tuple[str, str]]] = {
+    'owor': [
+        ('DocEntry', 'INTEGER'), ('DocNum', 'INTEGER'), ('Type', 'VARCHAR(1)'), ('Status', 'VARCHAR(1)'),
+        ('ItemCode', 'VARCHAR(40)'), ('ProdName', 'VARCHAR(100)'), ('PlannedQty', 'DECIMAL(18,4)'),
+        ('Uom', 'VARCHAR(20)'), ('StartDate', 'TIMESTAMP'),
+    ],
+    'wor1': [
+        ('DocEntry', 'INTEGER'), ('LineNum', 'INTEGER'), ('ItemCode', 'VARCHAR(40)'), ('ItemName', 'VARCHAR(100)'),
+        ('PlannedQty', 'DECIMAL(18,4)'), ('ItemType', 'VARCHAR(4)'), ('StageId', 'INTEGER'),
+    ],
+    'ign1': [
+        ('DocEntry', 'INTEGER'), ('LineNum', 'INTEGER'), ('BaseRef', 'INTEGER'), ('ItemCode', 'VARCHAR(40)'),
+        ('Quantity', 'DECIMAL(18,4)'),
+    ],
+    'ige1': [
+        ('DocEntry', 'INTEGER'), ('LineNum', 'INTEGER'), ('BaseRef', 'INTEGER'), ('ItemCode', 'VARCHAR(40)'),
+        ('Quantity', 'DECIMAL(18,4)'),
+    ],
+    'itt1': [
+        ('Father', 'VARCHAR(40)'), ('Code', 'VARCHAR(40)'), ('Quantity', 'DECIMAL(18,4)'),
+    ],
+    'itt2': [
+        ('Father', 'VARCHAR(40)'), ('StageId', 'INTEGER'), ('StgEntry', 'INTEGER'), ('Name', 'VARCHAR(100)'),
+    ],
+    'orst': [
+        ('AbsEntry', 'INTEGER'), ('Code', 'VARCHAR(20)'), ('Desc', 'VARCHAR(100)'),
+    ],
+    'oitm': [
+        ('ItemCode', 'VARCHAR(40)'), ('ItemName', 'VARCHAR(100)'), ('InvntryUom', 'VARCHAR(20)'),
+    ],
+    'orsc': [
+        ('VisResCode', 'VARCHAR(40)'), ('ResName', 'VARCHAR(100)'), ('UnitOfMsr', 'VARCHAR(20)'),
+    ],
+}
+
+
+OFFLINE_TABLES = {'mes_db': MES_TABLES, 'sap_db': SAP_TABLES}
+
+# 來源資料表索引 (資料寫入後建立)，對應查詢中 JOIN 與相關子查詢的查找欄位
+OFFLINE_INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    'MANUFACTURING_NO': [('MANUFACTURING_OD',)],
+    'ROUTER_STEP': [('ROUTER', 'STEP_ID')],
+    'OPERATION': [('OPERATION',)],
+    'RCD_STEP': [('RUN_CARD', 'ROUTER', 'REVISION', 'STEP_ID')],
+    'PRD_NG_DATA': [('RUN_CARD', 'ROUTER', 'STEP_ID')],
+    'DC_BATCHNO_INFO': [('RUN_CARD', 'STEP_ID', 'STATUS')],
+    'USER': [('USER_ID',)],
+    'DEVICE': [('DEVICE',)],
+    'ASSIGN_M_H': [('MANUFACTURING_OD', 'STEP_ID')],
+    'ASSIGN_PLAN': [('MANUFACTURING_OD', 'STEP_ID')],
+    'ACTUAL_WORK_HOUR_MH_D': [('MANUFACTURING_OD',)],
+    'BOM_SAP_LOG': [('MANUFACTURING_OD',)],
+    'BOM_COMPONENT': [('BOM', 'COMPONENT')],
+    'FEED_MATERIAL_DEVICE': [('MANUFACTURING_OD',)],
+    'owor': [('DocEntry',), ('StartDate',)],
+    'wor1': [('DocEntry',)],
+    'ign1': [('BaseRef', 'ItemCode')],
+    'ige1': [('BaseRef', 'ItemCode')],
+    'itt1': [('Father', 'Code')],
+    'itt2': [('Father', 'StageId')],
+    'orst': [('AbsEntry',)],
+    'oitm': [('ItemCode',)],
+    'orsc': [('VisResCode',)],
+}
+
+# SAP 工站群組 (與 mes/ 查詢中的 SAP_OPERATION_GP 對照一致)；1xx 與 2xx 各為一條產品線
+SAP_OPERATION_GROUPS = {
+    '101': '填充', '102': '中站', '103': '組裝', '104': '包裝', '105': '布套組裝',
+    '111': '塑膠射出', '112': '上膠', '113': '車縫', '114': '裁切',
+    '201': '攪料', '202': '碳線', '203': '打摺', '204': '貼邊', '205': '組框', '206': '組裝', '207': '上膠', '208': '包裝',
+}
+STATIONS_PER_GROUP = 2
+DEVICES_PER_STATION = (2, 8)
+
+PLANT = '1000'
+DEFAULT_ORDERS = 200
+INSERT_BATCH_ROWS = 5000
+# 每張工單平均產生的 MES 資料列數，以資料列數指定規模時用來估計工單數與主檔數量
+MES_ROWS_PER_ORDER = 45
+
+
+def parse_row_count(value: str) -> int:
+    """解析資料列數 (可使用 k/M 單位，例如 10k、1M、10M)"""
+    text = str(value).strip()
+    multiplier = {'k': 1_000, 'm': 1_000_000}.get(text[-1:].lower(), 1)
+    number = text[:-1] if multiplier > 1 else text
+    try:
+        count = int(float(number) * multiplier)
+    except ValueError:
+        raise ValueError(f"無法解析資料列數: {value}") from None
+    if count <= 0:
+        raise ValueError(f"資料列數必須大於 0: {value}")
+    return count
+
+
+def _clamp(value: int, low: int, high: int) -> int:
+    return max(low, min(high, value))
+
+
+def _zipf_cum_weights(count: int, exponent: float = 1.1) -> List[float]:
+    """Zipf 分布的累積權重：少數項目占大多數出現次數 (例如暢銷料號)"""
+    total = 0.0
+    weights = []
+    for rank in range(1, count + 1):
+        total += 1 / rank ** exponent
+        weights.append(total)
+    return weights
+
+
+class OfflineDataGenerator:
+    """
+    產生離線後端的 MES/SAP 來源資料
+
+    同一個 seed 產生相同的資料；各表以工單號、料號、工站與設備互相關聯，
+    讓 mes/ 與 sap/ 查詢的 JOIN 與子查詢都有對應的資料列。
+
+    基數依工單數調整，接近實際工廠資料：
+    - 工單號：每張工單唯一；料號約為工單數的 1/25 (20-20000 個)，依 Zipf 分布出現
+    - 每個料號有固定的途程 (同一產品線 3-6 個工站) 與 BOM (2-5 個原料，原料亦依 Zipf 分布)
+    - 工站：17 個 SAP 工站群組各對應 2 個 MES 工站；每個工站 2-8 台設備
+    - 第 N 張 MES 工單與 SAP 工單使用相同的料號
+    """
+
+    def __init__(self, orders: int = DEFAULT_ORDERS, seed: int = 0, now: datetime.datetime = None):
+        self.orders = max(1, orders)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.now = (now or datetime.datetime.now()).replace(microsecond=0)
+
+        rng = self.rng
+        self.materials = [f"FG{index:06d}" for index in range(_clamp(self.orders // 25, 20, 20000))]
+        self.components = [f"RM{index:06d}" for index in range(_clamp(len(self.materials) * 3, 60, 60000))]
+        self.users = [f"U{index:04d}" for index in range(_clamp(self.orders // 50, 50, 2000))]
+        self.resources = [f"RS{index:03d}" for index in range(20)]
+        self._material_weights = _zipf_cum_weights(len(self.materials))
+        self._component_weights = _zipf_cum_weights(len(self.components))
+
+        # 工站 (MES 工站代號, 名稱, SAP 工站群組) 與各工站的設備
+        self.stations = {}
+        self.devices = {}
+        for group, name in SAP_OPERATION_GROUPS.items():
+            for number in range(1, STATIONS_PER_GROUP + 1):
+                station = f"OP{group}{number}"
+                self.stations[station] = (f"{name}{number}", group)
+                self.devices[station] = [f"D{group}{number}{index:02d}"
+                                         for index in range(rng.randint(*DEVICES_PER_STATION))]
+
+        # 料號的固定途程與 BOM
+        lines = {line: [station for station, (_, group) in self.stations.items() if group.startswith(line)]
+                 for line in ('1', '2')}
+        self.routes = {}
+        self.boms = {}
+        for material in self.materials:
+            stations = lines[rng.choice('12')]
+            self.routes[material] = sorted(rng.sample(stations, rng.randint(3, 6)))
+            components = set(rng.choices(self.components, cum_weights=self._component_weights, k=rng.randint(2, 5)))
+            self.boms[material] = [(component, round(rng.uniform(0.5, 3), 2)) for component in sorted(components)]
+
+    def _order_rng(self, index: int) -> random.Random:
+        """工單專用的亂數產生器 (MES 與 SAP 的同一張工單取得相同的料號)"""
+        return random.Random(self.seed * 1_000_003 + index)
+
+    def _material(self, rng: random.Random) -> str:
+        return rng.choices(self.materials, cum_weights=self._material_weights)[0]
+
+    def _date(self, rng: random.Random, days_back: int) -> datetime.datetime:
+        return self.now - datetime.timedelta(days=rng.randint(0, days_back), minutes=rng.randint(0, 1439))
+
+    def mes_dimensions(self) -> Dict[str, list]:
+        """MES 主檔資料 (工站、設備、人員)"""
+        return {
+            'OPERATION': [(PLANT, station, name, group) for station, (name, group) in self.stations.items()],
+            'DEVICE': [(device, f"{self.stations[station][0]}機台{device[-2:]}")
+                       for station, devices in self.devices.items() for device in devices],
+            'USER': [(user, f"作業員{user[1:]}") for user in self.users],
+        }
+
+    def mes_order(self, index: int) -> Dict[str, list]:
+        """產生一張 MES 工單與其途程、報工、派工、工時與用料資料"""
+        rng = self._order_rng(index)
+        order = f"MO{index + 1:08d}"
+        material = self._material(rng)
+        qty = float(rng.randrange(100, 5001, 50))
+        planned_start = self._date(rng, 180)
+        planned_complete = planned_start + datetime.timedelta(days=rng.randint(3, 20))
+        status = rng.choice([1, 2, 3, 3, 9, 9, 12, 13])
+        started = status in (3, 9, 12)
+        finished = status in (9, 12)
+        actual_start = planned_start + datetime.timedelta(days=rng.randint(-2, 5)) if started else None
+        actual_complete = planned_complete + datetime.timedelta(days=rng.randint(-3, 7)) if finished else None
+        qty_done = round(qty * rng.uniform(0.9, 1.02), 0) if finished else (round(qty * rng.random(), 0) if started else 0.0)
+
+        rows = {table: [] for table in MES_TABLES}
+        rows['MANUFACTURING_NO'].append((
+            PLANT, order, material, f"成品{material[2:]}", rng.choice([10, 10, 10, 11, 12]), rng.randint(1, 14),
+            qty, qty_done, planned_start, planned_complete, actual_start, actual_complete,
+            'L' if status == 12 else rng.choice(['P', 'R', 'R', 'C']), status,
+        ))
+
+        route = self.routes[material]
+        for position, operation in enumerate(route):
+            step_id = (position + 1) * 10
+            operation_desc, group = self.stations[operation]
+            device = rng.choice(self.devices[operation])
+            device_desc = f"{operation_desc}機台{device[-2:]}"
+            rows['ROUTER_STEP'].append((order, 'A', step_id, operation))
+            step_done = finished or (started and position < len(route) // 2)
+            if started:
+                completed = round(qty * rng.uniform(0.95, 1.0), 0)
+                rows['RCD_STEP'].append((PLANT, order, order, 'A', step_id, completed, 1 if step_done else 0))
+                if rng.random() < 0.3:
+                    rows['PRD_NG_DATA'].append((order, order, step_id, float(rng.randint(1, 20))))
+                for batch in range(rng.randint(1, 2)):
+                    rows['DC_BATCHNO_INFO'].append(
+                        (order, step_id, f"{order}-{step_id}-{batch}", round(completed / 2, 0), rng.choice([1, 1, 1, 2])))
+
+            assigner = rng.choice(self.users)
+            assigned_at = planned_start - datetime.timedelta(hours=rng.randint(1, 48))
+            for user in rng.sample(self.users, rng.randint(1, 3)):
+                rows['ASSIGN_M_H'].append(
+                    (order, step_id, operation_desc, device_desc, f"作業員{user[1:]}", qty, assigner, assigned_at))
+            rows['ASSIGN_PLAN'].append(
+                (order, step_id, operation_desc, device_desc, qty, rng.randint(1, 4), assigner, assigned_at))
+
+            if started:
+                for user in rng.sample(self.users, rng.randint(1, 3)):
+                    # 少數人工時為非數值文字，對應查詢中的 ISNUMERIC 判斷
+                    hours = f"{rng.uniform(0.5, 8):.2f}" if rng.random() > 0.02 else 'N/A'
+                    rows['ACTUAL_WORK_HOUR_MH_D'].append(
+                        (index, PLANT, order, order, step_id, operation, operation_desc, device, completed,
+                         user, f"作業員{user[1:]}", hours, 'HUMAN', rng.choice([0, 0, 0, 1, None])))
+                rows['ACTUAL_WORK_HOUR_MH_D'].append(
+                    (index, PLANT, order, order, step_id, operation, operation_desc, device, completed,
+                     device, device_desc, f"{rng.uniform(1, 12):.2f}", 'MACHINE', 0))
+            rows['BOM_SAP_LOG'].append((order, PLANT, f"H{group}", group, operation_desc, round(rng.uniform(1, 20), 2)))
+            rows['BOM_SAP_LOG'].append((order, PLANT, f"M{group}", group, operation_desc, round(rng.uniform(1, 30), 2)))
+
+        for component, usage in self.boms[material]:
+            operation = rng.choice(route)
+            standard = round(qty * usage, 2)
+            rows['BOM_COMPONENT'].append((PLANT, order, component, standard, operation))
+            if started:
+                rows['FEED_MATERIAL_DEVICE'].append(
+                    (PLANT, order, component, operation, rng.choice(self.devices[operation]),
+                     round(standard * rng.uniform(0.95, 1.1), 2)))
+        return rows
+
+    def sap_dimensions(self) -> Dict[str, list]:
+        """SAP 主檔資料 (物料、資源、途程階段、BOM)"""
+        rng = self.rng
+        rows = {
+            'oitm': [(component, f"原料{component[2:]}", rng.choice(['PCS', 'KG', 'M'])) for component in self.components],
+            'orsc': [(resource, f"資源{resource[2:]}", 'H') for resource in self.resources],
+            'orst': [(entry, f"ST{entry:02d}", f"階段{entry}") for entry in range(1, 5)],
+            'itt1': [],
+            'itt2': [],
+        }
+        for material in self.materials:
+            for stage_id in (1, 2):
+                rows['itt2'].append((material, stage_id, rng.randint(1, 4), f"{material} 階段{stage_id}"))
+            for component, usage in self.boms[material]:
+                rows['itt1'].append((material, component, usage))
+        return rows
+
+    def sap_order(self, index: int) -> Dict[str, list]:
+        """產生一張 SAP 生產訂單與其用料、收貨、發貨資料 (開始日期落在最近四個月)"""
+        rng = self._order_rng(index)
+        doc_entry = index + 1
+        doc_num = 100000 + index
+        material = self._material(rng)
+        qty = float(rng.randrange(100, 5001, 50))
+        status = rng.choice(['R', 'R', 'L', 'L', 'C', 'P'])
+
+        rows = {table: [] for table in ('owor', 'wor1', 'ign1', 'ige1')}
+        rows['owor'].append((doc_entry, doc_num, rng.choice(['S', 'S', 'S', 'P', 'D']), status, material,
+                             f"成品{material[2:]}", qty, 'PCS', self._date(rng, 120)))
+        if status in ('R', 'L'):
+            rows['ign1'].append((doc_entry, 0, doc_num, material, round(qty * rng.uniform(0.5, 1.0), 0)))
+
+        lines = [(component, usage, False) for component, usage in self.boms[material]]
+        lines.append((rng.choice(self.resources), rng.uniform(0.01, 0.1), True))
+        for line_num, (item, usage, is_resource) in enumerate(lines):
+            planned = round(qty * usage, 2)
+            rows['wor1'].append((doc_entry, line_num, item, f"資源{item[2:]}" if is_resource else f"原料{item[2:]}",
+                                 planned, '290' if is_resource else '4', rng.randint(1, 2)))
+            if status in ('R', 'L') and not is_resource:
+                rows['ige1'].append((doc_entry, line_num, doc_num, item, round(planned * rng.uniform(0.9, 1.1), 2)))
+        return rows
+
+
+def create_offline_schema(connection, tables: Dict[str, List[Tuple[str, str]]]):
+    """重建離線後端的來源資料表"""
+    cursor = connection.cursor()
+    for table, columns in tables.items():
+        cursor.execute(f"DROP TABLE IF EXISTS [{table}]")
+        cursor.execute(f"CREATE TABLE [{table}] ({', '.join(f'[{name}] {sql_type}' for name, sql_type in columns)})")
+    connection.commit()
+    cursor.close()
+
+
+def create_offline_indexes(connection, tables: Dict[str, List[Tuple[str, str]]]):
+    """建立來源資料表的索引 (於寫入資料後建立較快)"""
+    cursor = connection.cursor()
+    for table in tables:
+        for number, columns in enumerate(OFFLINE_INDEXES.get(table, []), start=1):
+            cursor.execute(f"CREATE INDEX [IX_{table}_{number}] ON [{table}] ({', '.join(f'[{c}]' for c in columns)})")
+    connection.commit()
+    cursor.close()
+
+
+def _flush_rows(connection, tables: Dict[str, List[Tuple[str, str]]], buffers: Dict[str, list],
+                counts: Dict[str, int], min_rows: int):
+    """寫入累積達 min_rows 筆的資料表緩衝 (min_rows 為 0 時全部寫入)"""
+    for table, rows in buffers.items():
+        if rows and len(rows) >= min_rows:
+            connection.insert_rows(table, [name for name, _ in tables[table]], rows)
+            counts[table] += len(rows)
+            rows.clear()
+
+
+def seed_offline_database(db_manager, db_name: str, orders: int = DEFAULT_ORDERS, seed: int = 0,
+                          rows: int = None) -> Dict[str, int]:
+    """
+    重建離線來源資料庫 (mes_db 或 sap_db) 並寫入產生的資料
+
+    Args:
+        orders: 工單數
+        rows: 改以資料列數指定規模：持續產生工單直到資料列總數 (含主檔) 達到 rows，忽略 orders
+
+    Returns:
+        各資料表寫入的筆數
+    """
+    if db_manager.get_backend(db_name) is None:
+        raise ValueError(f"{db_name} 不是離線後端，拒絕覆寫資料")
+    tables = OFFLINE_TABLES[db_name]
+    generator = OfflineDataGenerator(max(1, rows // MES_ROWS_PER_ORDER) if rows else orders, seed)
+    logger = logging.getLogger("OfflineData")
+
+    if db_name == 'mes_db':
+        dimensions, order_rows = generator.mes_dimensions(), generator.mes_order
+    else:
+        dimensions, order_rows = generator.sap_dimensions(), generator.sap_order
+
+    counts = {table: 0 for table in tables}
+    started = time.perf_counter()
+    with db_manager.get_connection_context(db_name) as connection:
+        create_offline_schema(connection, tables)
+        buffers = {table: list(dimensions.get(table, [])) for table in tables}
+        generated = sum(len(table_rows) for table_rows in buffers.values())
+        next_report = 1_000_000
+        index = 0
+        while (generated < rows) if rows else (index < generator.orders):
+            for table, table_rows in order_rows(index).items():
+                buffers[table].extend(table_rows)
+                generated += len(table_rows)
+            index += 1
+            # 累積到一定筆數才寫入，避免逐筆往返
+            _flush_rows(connection, tables, buffers, counts, INSERT_BATCH_ROWS)
+            if generated >= next_report:
+                logger.info(f"{db_name} 已產生 {generated} 筆 ({index} 張工單)")
+                next_report += 1_000_000
+        _flush_rows(connection, tables, buffers, counts, 0)
+        create_offline_indexes(connection, tables)
+        connection.commit()
+
+    logger.info(f"{db_name} 已寫入 {sum(counts.values())} 筆離線資料 ({index} 張工單，"
+                f"耗時 {time.perf_counter() - started:.1f} 秒)")
+    return counts
+
+
+def seed_offline_databases(db_manager, orders: int = DEFAULT_ORDERS, seed: int = 0,
+                           rows: int = None) -> Dict[str, Dict[str, int]]:
+    """
+    重建 mes_db 與 sap_db 的離線資料 (tableau_db 於 ETL 執行時自動建立)
+
+    以 rows 指定規模時，rows 為 MES 資料列總數，SAP 產生相同張數的工單。
+    """
+    counts = {'mes_db': seed_offline_database(db_manager, 'mes_db', orders, seed, rows)}
+    counts['sap_db'] = seed_offline_database(db_manager, 'sap_db', counts['mes_db']['MANUFACTURING_NO'], seed)
+    return counts
+
+
+def main():
+    """命令列入口：產生離線後端的來源資料"""
+    parser = argparse.ArgumentParser(description='產生 ETL 離線後端 (SQLite/DuckDB) 的 MES/SAP 來源資料')
+    parser.add_argument('--backend', choices=['sqlite', 'duckdb'], default='sqlite', help='離線後端')
+    parser.add_argument('--orders', type=int, default=DEFAULT_ORDERS, help='工單數')
+    parser.add_argument('--rows', type=parse_row_count, help='改以 MES 資料列數指定規模 (例如 10k、1M、10M)')
+    parser.add_argument('--seed', type=int, default=0, help='亂數種子 (相同種子產生相同資料)')
+    parser.add_argument('--data-dir', help='離線資料庫檔案目錄 (預設為 ETLConfig.OFFLINE_DATA_DIR)')
+    args = parser.parse_args()
+
+    etl_config = get_etl_config()
+    logging.basicConfig(level=getattr(logging, etl_config.LOG_LEVEL), format=etl_config.LOG_FORMAT)
+
+    config_manager = get_config_manager()
+    config_manager.etl_config.OFFLINE_BACKEND = args.backend
+    if args.data_dir:
+        config_manager.etl_config.OFFLINE_DATA_DIR = args.data_dir
+    db_manager = DatabaseManager(config_manager)
+    try:
+        for db_name, counts in seed_offline_databases(db_manager, args.orders, args.seed, args.rows).items():
+            print(f"{db_name}: " + ", ".join(f"{table}={count}" for table, count in counts.items()))
+    except Exception as e:
+        logging.getLogger("OfflineData").error(f"產生離線資料失敗: {e}")
+        sys.exit(1)
+    finally:
+        db_manager.close_connections()
+
+
+if __name__ == "__main__":
+    main()
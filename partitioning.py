@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+from typing import Dict, Any, List, Tuple, Optional
+
+import pandas as pd
+
+
+def build_partition_predicates(partition: Dict[str, Any]) -> List[Tuple[Optional[str], list]]:
+    """
+    依 query_metadata.json 的 partition 設定產生各分區的過濾條件
+
+    支援的 scheme：
+        date: 依日期區間切分，需提供 start (ISO 日期)，可選 end (預設為現在) 與 interval_days
+        hash: 依 CHECKSUM 雜湊切分為 buckets 個分區
+        none: 不切分 (只搭配 keyset 分頁使用)
+
+    各分區互斥且合併後涵蓋所有資料列 (包含分區欄位為 NULL 的資料列)。
+
+    Returns:
+        [(where_clause, params), ...]，where_clause 使用 ? 參數
+    """
+    scheme = partition.get('scheme', 'date')
+    if scheme == 'none':
+        return [(None, [])]
+
+    column = f"[{partition['column']}]"
+    predicates = [(f"{column} IS NULL", [])]
+
+    if scheme == 'date':
+        start = datetime.datetime.fromisoformat(partition['start'])
+        end = datetime.datetime.fromisoformat(partition['end']) if partition.get('end') else datetime.datetime.now()
+        interval = datetime.timedelta(days=partition.get('interval_days', 30))
+        if interval <= datetime.timedelta(0):
+            raise ValueError("interval_days 必須大於 0")
+
+        boundaries = [start]
+        while boundaries[-1] + interval < end:
+            boundaries.append(boundaries[-1] + interval)
+
+        predicates.append((f"{column} < ?", [start]))
+        for lower, upper in zip(boundaries, boundaries[1:]):
+            predicates.append((f"{column} >= ? AND {column} < ?", [lower, upper]))
+        predicates.append((f"{column} >= ?", [boundaries[-1]]))
+
+    elif scheme == 'hash':
+        buckets = int(partition.get('buckets', 4))
+        if buckets < 1:
+            raise ValueError("buckets 必須大於 0")
+        for bucket in range(buckets):
+            predicates.append((f"{column} IS NOT NULL AND ABS(CHECKSUM({column}) % {buckets}) = {bucket}", []))
+
+    else:
+        raise ValueError(f"不支援的分區方式: {scheme}")
+
+    return predicates
+
+
+def build_keyset_predicate(key_columns: List[str], last_key: tuple) -> Tuple[str, list]:
+    """
+    產生 keyset 分頁條件，取得排序鍵大於上一頁最後一筆的資料列
+
+    例如鍵值 (a, b) 產生 ([a] > ?) OR ([a] = ? AND [b] > ?)。
+    鍵值欄位需不為 NULL 且組合唯一。
+
+    Returns:
+        (where_clause, params)
+
+    Raises:
+        ValueError: 上一頁最後一筆的鍵值含 NULL (NULL 無法比較大小，分頁會提前結束)
+    """
+    null_columns = [column for column, value in zip(key_columns, last_key) if pd.isna(value)]
+    if null_columns:
+        raise ValueError(f"keyset 分頁鍵值欄位不可為 NULL: {', '.join(null_columns)}")
+
+    clauses = []
+    params = []
+    for i, column in enumerate(key_columns):
+        parts = [f"[{key_columns[j]}] = ?" for j in range(i)] + [f"[{column}] > ?"]
+        clauses.append("(" + " AND ".join(parts) + ")")
+        params.extend(to_param(value) for value in last_key[:i + 1])
+    return " OR ".join(clauses), params
+
+
+def to_param(value: Any) -> Any:
+    """將 pandas/numpy 值轉為驅動程式可接受的 Python 原生型別"""
+    if hasattr(value, 'to_pydatetime'):
+        return value.to_pydatetime()
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import queue
+import threading
+import time
+import logging
+from typing import Dict, Any, Callable, Iterator, Tuple
+
+
+class ChunkPipeline:
+    """
+    擷取與寫入重疊執行的管線 - 生產者執行緒自來源讀取分批資料放入有界佇列，
+    呼叫端 (消費者) 從佇列取出後寫入目標表
+
+    佇列滿時生產者等待 (寫入端為瓶頸)，佇列空時消費者等待 (擷取端為瓶頸)，
+    兩者的等待時間與佇列深度可由 stats() 取得。
+    """
+
+    _END = object()
+
+    def __init__(self, open_stream: Callable[[], Tuple[Dict[str, type], Iterator[Any]]],
+                 max_queue_size: int = 4, name: str = "pipeline"):
+        """
+        Args:
+            open_stream: 於生產者執行緒內呼叫，回傳 (column_types, chunks)
+            max_queue_size: 佇列最多暫存的批次數
+            name: 生產者執行緒名稱
+        """
+        self.open_stream = open_stream
+        self.name = name
+        self.logger = logging.getLogger("ChunkPipeline")
+        self._queue = queue.Queue(maxsize=max(1, max_queue_size))
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._column_types = None
+        self._error = None
+
+        # 統計資訊
+        self._producer_wait = 0.0
+        self._consumer_wait = 0.0
+        self._depth_total = 0
+        self._depth_max = 0
+        self._chunks = 0
+
+    def start(self) -> Dict[str, type]:
+        """
+        啟動生產者執行緒並等待查詢開始回傳結果
+
+        Returns:
+            欄位名稱對應 Python 型別的字典
+        """
+        self._thread = threading.Thread(target=self._produce, name=self.name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+        return self._column_types
+
+    def _produce(self):
+        """生產者：讀取分批資料並放入佇列"""
+        chunks = None
+        try:
+            self._column_types, chunks = self.open_stream()
+            self._ready.set()
+            for chunk in chunks:
+                if not self._put(chunk):
+                    return
+            self._put(self._END)
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            self._put(self._END)
+        finally:
+            if chunks is not None and hasattr(chunks, 'close'):
+                chunks.close()
+
+    def _put(self, item) -> bool:
+        """放入佇列，佇列滿時等待並累計等待時間；管線已關閉時回傳 False"""
+        started = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self._producer_wait += time.perf_counter() - started
+
+    def __iter__(self):
+        """消費者：依序取出分批資料，擷取端錯誤會在此拋出"""
+        try:
+            while True:
+                depth = self._queue.qsize()
+                self._depth_total += depth
+                self._depth_max = max(self._depth_max, depth)
+
+                started = time.perf_counter()
+                item = self._queue.get()
+                self._consumer_wait += time.perf_counter() - started
+
+                if item is self._END:
+                    if self._error is not None:
+                        raise self._error
+                    return
+                self._chunks += 1
+                yield item
+        finally:
+            self.close()
+
+    def close(self):
+        """停止生產者執行緒並釋放佇列"""
+        self._stop.set()
+        # 清空佇列讓等待中的生產者可以結束
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        取得管線統計資訊
+
+        Returns:
+            chunks: 已處理批次數
+            producer_wait_seconds: 擷取端因佇列滿而等待的秒數 (寫入端較慢)
+            consumer_wait_seconds: 寫入端因佇列空而等待的秒數 (擷取端較慢)
+            avg_queue_depth / max_queue_depth: 每次取出前的佇列深度
+        """
+        samples = self._chunks + 1
+        return {
+            'chunks': self._chunks,
+            'producer_wait_seconds': round(self._producer_wait, 3),
+            'consumer_wait_seconds': round(self._consumer_wait, 3),
+            'avg_queue_depth': round(self._depth_total / samples, 2),
+            'max_queue_depth': self._depth_max,
+        }
+
+    def bottleneck(self) -> str:
+        """依等待時間判斷瓶頸所在"""
+        if self._producer_wait > self._consumer_wait:
+            return '寫入端'
+        if self._consumer_wait > self._producer_wait:
+            return '擷取端'
+        return '無'
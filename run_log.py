@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import uuid
+import datetime
+import logging
+import threading
+from contextlib import contextmanager
+import pandas as pd
+from sqlalchemy import text
+from typing import Dict, Any, List, Optional
+
+from database import DatabaseManager
+
+# 選用模組：行程記憶體高峰 (Windows 無此模組)
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+# 各階段耗時對應的 ETL_SUMMARY 欄位
+STAGES = ('extract', 'transform', 'backup', 'load')
+
+_COLUMNS = (
+    'TIMESTAMP', 'ETL_DATE', 'RUN_ID', 'SOURCE_TYPE', 'QUERY_NAME', 'TARGET_TABLE', 'ROW_COUNT', 'SUMMARY_TYPE', 'ETL_STATUS',
+    'mes_status', 'sap_status', 'mes_rows', 'sap_rows', 'RESULT_FINGERPRINT',
+    'ROWS_INSERTED', 'ROWS_UPDATED', 'ROWS_DELETED',
+    'EXTRACT_MS', 'TRANSFORM_MS', 'BACKUP_MS', 'LOAD_MS', 'TOTAL_MS', 'BYTES_READ', 'PEAK_MEMORY_MB',
+)
+
+
+def get_peak_memory_mb() -> Optional[float]:
+    """取得本行程目前為止的記憶體高峰 (MB)，無法取得時回傳 None"""
+    if resource is None:
+        return None
+    # Linux 的 ru_maxrss 單位為 KB
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def estimate_frame_bytes(df: pd.DataFrame, sample_rows: int = 1000) -> int:
+    """
+    估計DataFrame的資料量 (位元組)
+
+    字串欄位需逐值計算大小，因此只以前 sample_rows 筆計算每列大小後乘上總筆數。
+    """
+    if df.empty:
+        return 0
+    sample = df.iloc[:sample_rows]
+    return int(sample.memory_usage(index=False, deep=True).sum() / len(sample) * len(df))
+
+
+class RunLog:
+    """
+    單次執行的執行記錄收集器 - 暫存各查詢與整體摘要的 ETL_SUMMARY 記錄並批次寫入
+
+    距上次寫入超過 RUN_LOG_FLUSH_SECONDS 時，記錄查詢結果後即寫入暫存的記錄，其餘於執行結束 (或失敗) 時寫入，
+    行程中途被終止時最多只遺失最近一段時間的記錄。每筆記錄的 TIMESTAMP/ETL_DATE 為記錄當下的完成時間，
+    不受批次寫入的時間影響。
+
+    每筆查詢記錄包含擷取、轉換、備份、載入各階段的毫秒數、讀取位元組數、記憶體高峰與執行編號 (RUN_ID)。
+    階段耗時依查詢名稱累計，可由不同執行緒 (例如分區擷取) 同時累加。
+    """
+
+    def __init__(self, db_manager: DatabaseManager, target_db: str = 'tableau_db'):
+        self.db_manager = db_manager
+        self.etl_config = db_manager.etl_config
+        self.target_db = target_db
+        self.run_id = f"{datetime.datetime.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:8]}"
+        self.logger = logging.getLogger("RunLog")
+        self._lock = threading.Lock()
+        self._records: List[Dict[str, Any]] = []
+        self._stats: Dict[str, Dict[str, Any]] = {}
+        self._last_flush = time.monotonic()
+
+    @staticmethod
+    def _new_stats() -> Dict[str, Any]:
+        """建立查詢的累計統計 (開始時間、讀取位元組數與各階段秒數)"""
+        stats = {'started': time.perf_counter(), 'bytes_read': 0}
+        stats.update({stage: 0.0 for stage in STAGES})
+        return stats
+
+    def _query_stats(self, query_name: str) -> Dict[str, Any]:
+        """取得查詢的累計統計 (需持有鎖)"""
+        if query_name not in self._stats:
+            self._stats[query_name] = self._new_stats()
+        return self._stats[query_name]
+
+    def start_query(self, query_name: str):
+        """開始記錄查詢 (重設該查詢的累計統計)"""
+        with self._lock:
+            self._stats[query_name] = self._new_stats()
+
+    @contextmanager
+    def stage(self, query_name: str, stage: str):
+        """累計查詢在指定階段 (extract/transform/backup/load) 的耗時"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._query_stats(query_name)[stage] += elapsed
+
+    def add_bytes(self, query_name: str, byte_count: int):
+        """累計查詢讀取的資料量 (位元組)"""
+        with self._lock:
+            self._query_stats(query_name)['bytes_read'] += int(byte_count)
+
+    def record_query(self, source_type: str, query_name: str, target_table: str, row_count: int,
+                     etl_status: str = None, fingerprint: str = None, merge_counts: Dict[str, int] = None):
+        """暫存單個查詢的執行結果，附上該查詢的階段耗時、讀取資料量與記憶體高峰"""
+        merge_counts = merge_counts or {}
+        completed = datetime.datetime.now()
+        with self._lock:
+            stats = self._stats.pop(query_name, None) or self._new_stats()
+            record = {
+                'TIMESTAMP': completed,
+                'ETL_DATE': completed,
+                'RUN_ID': self.run_id,
+                'SOURCE_TYPE': source_type,
+                'QUERY_NAME': query_name,
+                'TARGET_TABLE': target_table,
+                'ROW_COUNT': row_count,
+                'SUMMARY_TYPE': 'QUERY',
+                'ETL_STATUS': etl_status,
+                'RESULT_FINGERPRINT': fingerprint,
+                'ROWS_INSERTED': merge_counts.get('inserted'),
+                'ROWS_UPDATED': merge_counts.get('updated'),
+                'ROWS_DELETED': merge_counts.get('deleted'),
+                'TOTAL_MS': int((time.perf_counter() - stats['started']) * 1000),
+                'BYTES_READ': stats['bytes_read'],
+                'PEAK_MEMORY_MB': get_peak_memory_mb(),
+            }
+            record.update({f"{stage.upper()}_MS": int(stats[stage] * 1000) for stage in STAGES})
+            self._records.append(record)
+
+        self.logger.debug(
+            f"{query_name}: " + "，".join(f"{stage} {record[f'{stage.upper()}_MS']} ms" for stage in STAGES)
+            + f"，共 {record['TOTAL_MS']} ms，讀取 {record['BYTES_READ'] / 1024 / 1024:.1f} MB"
+        )
+        if time.monotonic() - self._last_flush >= self.etl_config.RUN_LOG_FLUSH_SECONDS:
+            self.flush()
+
+    def record_summary(self, mes_status: str, sap_status: str, mes_rows: int, sap_rows: int):
+        """暫存整體ETL執行摘要"""
+        completed = datetime.datetime.now()
+        with self._lock:
+            self._records.append({
+                'TIMESTAMP': completed,
+                'ETL_DATE': completed,
+                'RUN_ID': self.run_id,
+                'SOURCE_TYPE': 'ALL',
+                'QUERY_NAME': 'ETL_COMPLETE',
+                'TARGET_TABLE': 'ALL_TABLES',
+                'ROW_COUNT': mes_rows + sap_rows,
+                'SUMMARY_TYPE': 'SUMMARY',
+                'ETL_STATUS': 'COMPLETE',
+                'mes_status': mes_status,
+                'sap_status': sap_status,
+                'mes_rows': mes_rows,
+                'sap_rows': sap_rows,
+                'PEAK_MEMORY_MB': get_peak_memory_mb(),
+            })
+
+    def pending_records(self) -> List[Dict[str, Any]]:
+        """取得尚未寫入的記錄副本 (供基準測試讀取各階段耗時，不影響之後的 flush)"""
+        with self._lock:
+            return [dict(record) for record in self._records]
+
+    def flush(self) -> int:
+        """
+        以單一交易寫入所有暫存的記錄 (失敗時僅記錄警告，記錄保留供下次寫入)
+
+        Returns:
+            寫入筆數
+        """
+        with self._lock:
+            records, self._records = self._records, []
+            self._last_flush = time.monotonic()
+        if not records:
+            return 0
+
+        table_name = self.etl_config.ETL_SUMMARY_TABLE
+        column_list = ", ".join(f"[{column}]" for column in _COLUMNS)
+        value_list = ", ".join(f":{column}" for column in _COLUMNS)
+        stmt = text(self.db_manager.dialect_sql(
+            self.target_db, f"INSERT INTO {table_name} ({column_list}) VALUES ({value_list})"
+        ))
+        params = [{column: record.get(column) for column in _COLUMNS} for record in records]
+        try:
+            with self.db_manager.get_engine_context(self.target_db) as engine:
+                with engine.begin() as conn:
+                    conn.execute(stmt, params)
+        except Exception as e:
+            self.logger.warning(f"寫入執行記錄失敗 ({len(records)} 筆): {e}")
+            with self._lock:
+                self._records = records + self._records
+            return 0
+
+        self.logger.info(f"已寫入 {len(records)} 筆執行記錄 (RUN_ID {self.run_id})")
+        return len(records)
@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import re
+from typing import Any, List, Tuple
+
+from config import get_etl_config
+from tsql_dialect import translate_tsql
+
+
+# 遷移步驟 - 欄位與索引以資料描述，由 SchemaMigrator 依方言產生 SQL Server 或離線後端 (SQLite/DuckDB) 的陳述式，
+# 兩者共用同一份定義；欄位定義使用 T-SQL 型別，離線後端以 _local_definition 對應
+def _create_table(*columns: Tuple[str, str]) -> Tuple[str, Any]:
+    """建立資料表 (不存在時)，另加自動遞增的 id 主鍵"""
+    return ('create_table', columns)
+
+
+def _add_columns(*columns: Tuple[str, str]) -> Tuple[str, Any]:
+    """新增不存在的欄位 (已由舊版逐次檢查新增的欄位不重複新增)"""
+    return ('add_columns', columns)
+
+
+def _create_index(name: str, columns: Tuple[str, ...], include: Tuple[str, ...] = ()) -> Tuple[str, Any]:
+    """建立不存在的非叢集索引 (離線後端不支援 INCLUDE，只建立索引鍵)"""
+    return ('create_index', (name, columns, include))
+
+
+def _mssql_only(statement: str) -> Tuple[str, Any]:
+    """只在 SQL Server 執行的陳述式 (修正舊版 SQL Server 上建立的結構，離線後端沒有這類舊結構)"""
+    return ('mssql', statement)
+
+
+# ETL_SUMMARY 結構遷移 - (版本, 說明, 步驟)，依版本順序套用且每個版本只套用一次
+# 名稱中的 {summary} 為 ETL_SUMMARY 表名稱；各陳述式個別送出，後續陳述式可使用前面新增的欄位
+MIGRATIONS: List[Tuple[int, str, List[Tuple[str, Any]]]] = [
+    (1, "建立 ETL_SUMMARY 基本結構", [
+        _create_table(
+            ('TIMESTAMP', 'DATETIME DEFAULT GETDATE()'),
+            ('SOURCE_TYPE', 'NVARCHAR(50)'),
+            ('QUERY_NAME', 'NVARCHAR(255)'),
+            ('TARGET_TABLE', 'NVARCHAR(255)'),
+            ('ROW_COUNT', 'INT'),
+            ('ETL_DATE', 'DATETIME DEFAULT GETDATE()'),
+        ),
+        _add_columns(
+            ('SUMMARY_TYPE', 'NVARCHAR(50) NULL'),
+            ('ETL_STATUS', 'NVARCHAR(50) NULL'),
+            ('mes_status', 'NVARCHAR(50) NULL'),
+            ('sap_status', 'NVARCHAR(50) NULL'),
+            ('mes_rows', 'INT NULL'),
+            ('sap_rows', 'INT NULL'),
+        ),
+    ]),
+    (2, "將 etl_monitor.py 建立的文字 TIMESTAMP 欄位轉為 DATETIME", [
+        _mssql_only("""
+        IF EXISTS (SELECT 1 FROM INFORMATION_SCHEMA.COLUMNS
+                   WHERE TABLE_NAME = N'{summary}' AND COLUMN_NAME = N'TIMESTAMP' AND DATA_TYPE IN ('varchar', 'nvarchar'))
+        BEGIN
+            EXEC sp_rename N'{summary}.[TIMESTAMP]', N'TIMESTAMP_TEXT', N'COLUMN';
+            ALTER TABLE {summary} ADD [TIMESTAMP] DATETIME NULL DEFAULT GETDATE();
+        END
+        """),
+        _mssql_only("""
+        IF COL_LENGTH(N'{summary}', N'TIMESTAMP_TEXT') IS NOT NULL
+        BEGIN
+            -- 文字格式為 yyyyMMddHHmmss (etl_monitor.py) 或 GETDATE() 的預設文字格式，無法轉換時使用 ETL_DATE
+            EXEC(N'UPDATE {summary} SET [TIMESTAMP] = COALESCE(
+                TRY_CONVERT(DATETIME, STUFF(STUFF(STUFF([TIMESTAMP_TEXT], 9, 0, '' ''), 12, 0, '':''), 15, 0, '':'')),
+                TRY_CONVERT(DATETIME, [TIMESTAMP_TEXT]),
+                [ETL_DATE])');
+            EXEC(N'ALTER TABLE {summary} DROP COLUMN [TIMESTAMP_TEXT]');
+        END
+        """),
+    ]),
+    (3, "新增結果指紋欄位", [_add_columns(
+        ('RESULT_FINGERPRINT', 'NVARCHAR(64) NULL'),
+    )]),
+    (4, "新增合併載入筆數欄位", [_add_columns(
+        ('ROWS_INSERTED', 'INT NULL'),
+        ('ROWS_UPDATED', 'INT NULL'),
+        ('ROWS_DELETED', 'INT NULL'),
+    )]),
+    (5, "新增執行編號與各階段耗時欄位", [_add_columns(
+        ('RUN_ID', 'NVARCHAR(32) NULL'),
+        ('EXTRACT_MS', 'INT NULL'),
+        ('TRANSFORM_MS', 'INT NULL'),
+        ('BACKUP_MS', 'INT NULL'),
+        ('LOAD_MS', 'INT NULL'),
+        ('TOTAL_MS', 'INT NULL'),
+        ('BYTES_READ', 'BIGINT NULL'),
+        ('PEAK_MEMORY_MB', 'FLOAT NULL'),
+    )]),
+    (6, "新增查詢記錄與執行日期索引", [
+        _create_index('IX_{summary}_QUERY', ('QUERY_NAME', 'TARGET_TABLE', 'SUMMARY_TYPE'),
+                      include=('RESULT_FINGERPRINT',)),
+        _create_index('IX_{summary}_ETL_DATE', ('ETL_DATE',)),
+    ]),
+]
+
+
+# T-SQL 欄位型別對應的離線後端型別 (SQLite 以 TIMESTAMP 宣告才會讀取為 datetime，DuckDB 的 FLOAT 為單精確度)
+_LOCAL_TYPES = [
+    (r'\bNVARCHAR\b', 'VARCHAR'),
+    (r'\bINT\b', 'INTEGER'),
+    (r'\bFLOAT\b', 'DOUBLE'),
+    (r'\bDATETIME\b', 'TIMESTAMP'),
+    (r'\bGETDATE\(\)', 'CURRENT_TIMESTAMP'),
+]
+
+
+def _local_definition(definition: str) -> str:
+    """將 T-SQL 欄位定義改為離線後端的型別"""
+    for pattern, replacement in _LOCAL_TYPES:
+        definition = re.sub(pattern, replacement, definition, flags=re.IGNORECASE)
+    return definition
+
+
+def _for_dialect(statement: str, dialect: str) -> str:
+    """離線後端改寫方括號等 T-SQL 語法 (DuckDB 不接受方括號識別碼)"""
+    return statement if dialect == 'mssql' else translate_tsql(statement, dialect)
+
+
+class SchemaMigrator:
+    """
+    ETL_SUMMARY 結構版本管理 - 以版本表記錄已套用的遷移，啟動時只需一次版本查詢
+
+    app.py 與 etl_monitor.py 共用此處的遷移定義。使用 DB-API 連線 (pyodbc 連線或
+    SQLAlchemy engine.raw_connection())，待套用的遷移在同一交易內完成。SQL Server 以應用程式鎖
+    避免多個程式同時套用；離線後端 (SQLite/DuckDB) 由同一份遷移步驟產生對應的陳述式，
+    同樣記錄於版本表。
+    """
+
+    def __init__(self, summary_table: str = None, version_table: str = None):
+        etl_config = get_etl_config()
+        self.summary_table = summary_table or etl_config.ETL_SUMMARY_TABLE
+        self.version_table = version_table or etl_config.ETL_SCHEMA_VERSION_TABLE
+        self.logger = logging.getLogger("SchemaMigrator")
+
+    @property
+    def latest_version(self) -> int:
+        """最新的結構版本"""
+        return MIGRATIONS[-1][0]
+
+    def current_version(self, cursor, dialect: str = 'mssql') -> int:
+        """取得目前的結構版本 (SQL Server 版本表不存在時為 0；離線後端須先建立版本表)"""
+        if dialect == 'mssql':
+            cursor.execute(
+                f"IF OBJECT_ID(N'{self.version_table}', N'U') IS NULL SELECT 0 "
+                f"ELSE SELECT ISNULL(MAX([VERSION]), 0) FROM {self.version_table}"
+            )
+        else:
+            cursor.execute(_for_dialect(f"SELECT COALESCE(MAX([VERSION]), 0) FROM {self.version_table}", dialect))
+        return cursor.fetchone()[0]
+
+    def migrate(self, connection, dialect: str = 'mssql') -> int:
+        """
+        套用尚未套用的遷移
+
+        Args:
+            connection: DB-API 連線
+            dialect: 連線的 SQLAlchemy 方言名稱 (mssql/sqlite/duckdb)
+
+        Returns:
+            本次套用的遷移數 (已是最新版本時為 0)
+        """
+        if dialect != 'mssql':
+            return self._migrate_local(connection, dialect)
+
+        cursor = connection.cursor()
+        try:
+            if self.current_version(cursor) >= self.latest_version:
+                return 0
+
+            cursor.execute(
+                "EXEC sp_getapplock @Resource = N'ETL_SCHEMA_MIGRATION', @LockMode = 'Exclusive', "
+                "@LockOwner = 'Session', @LockTimeout = 60000"
+            )
+            try:
+                applied = self._apply_pending(cursor, 'mssql')
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.execute("EXEC sp_releaseapplock @Resource = N'ETL_SCHEMA_MIGRATION', @LockOwner = 'Session'")
+                connection.commit()
+            return applied
+        finally:
+            cursor.close()
+
+    def _migrate_local(self, connection, dialect: str) -> int:
+        """離線後端：單一程式使用本機檔案，不需應用程式鎖"""
+        cursor = connection.cursor()
+        try:
+            applied = self._apply_pending(cursor, dialect)
+            connection.commit()
+            return applied
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def _apply_pending(self, cursor, dialect: str) -> int:
+        """建立版本表並依序套用高於目前版本的遷移 (SQL Server 於取得鎖後重新讀取版本)"""
+        if dialect == 'mssql':
+            cursor.execute(f"""
+            IF OBJECT_ID(N'{self.version_table}', N'U') IS NULL
+            CREATE TABLE {self.version_table} (
+                [VERSION] INT NOT NULL PRIMARY KEY,
+                [DESCRIPTION] NVARCHAR(255) NULL,
+                [APPLIED_AT] DATETIME DEFAULT GETDATE()
+            )
+            """)
+        else:
+            cursor.execute(_for_dialect(f"""
+            CREATE TABLE IF NOT EXISTS {self.version_table} (
+                [VERSION] INTEGER NOT NULL PRIMARY KEY,
+                [DESCRIPTION] VARCHAR(255) NULL,
+                [APPLIED_AT] TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """, dialect))
+
+        version = self.current_version(cursor, dialect)
+        applied = 0
+        for migration_version, description, steps in MIGRATIONS:
+            if migration_version <= version:
+                continue
+            for kind, payload in steps:
+                for statement in self._statements(cursor, dialect, kind, payload):
+                    cursor.execute(statement)
+            cursor.execute(
+                _for_dialect(f"INSERT INTO {self.version_table} ([VERSION], [DESCRIPTION]) VALUES (?, ?)", dialect),
+                (migration_version, description)
+            )
+            applied += 1
+            self.logger.info(f"已套用 {self.summary_table} 結構遷移 {migration_version}: {description}")
+        return applied
+
+    def _statements(self, cursor, dialect: str, kind: str, payload: Any) -> List[str]:
+        """產生遷移步驟在指定方言的陳述式"""
+        summary = self.summary_table
+        if dialect == 'mssql':
+            return self._mssql_statements(kind, payload)
+        if kind == 'mssql':
+            return []
+
+        if kind == 'create_table':
+            statements = []
+            if dialect == 'duckdb':
+                # DuckDB 沒有自動遞增欄位，以序列產生 id
+                statements.append(f"CREATE SEQUENCE IF NOT EXISTS {summary}_id_seq")
+                id_column = f"id BIGINT PRIMARY KEY DEFAULT nextval('{summary}_id_seq')"
+            else:
+                id_column = "id INTEGER PRIMARY KEY AUTOINCREMENT"
+            columns = ", ".join([id_column] + [f"[{name}] {_local_definition(definition)}"
+                                               for name, definition in payload])
+            statements.append(f"CREATE TABLE IF NOT EXISTS {summary} ({columns})")
+        elif kind == 'add_columns':
+            # 離線後端沒有 COL_LENGTH，以不傳回資料列的查詢取得既有欄位
+            cursor.execute(_for_dialect(f"SELECT * FROM {summary} WHERE 1 = 0", dialect))
+            existing = {column[0].lower() for column in cursor.description}
+            statements = [f"ALTER TABLE {summary} ADD COLUMN [{name}] {_local_definition(definition)}"
+                          for name, definition in payload if name.lower() not in existing]
+        else:
+            name, columns, _ = payload
+            statements = [f"CREATE INDEX IF NOT EXISTS [{name.format(summary=summary)}] ON {summary} "
+                          f"({', '.join(f'[{column}]' for column in columns)})"]
+        return [_for_dialect(statement, dialect) for statement in statements]
+
+    def _mssql_statements(self, kind: str, payload: Any) -> List[str]:
+        """產生遷移步驟的 T-SQL 陳述式"""
+        summary = self.summary_table
+        if kind == 'mssql':
+            return [payload.format(summary=summary)]
+        if kind == 'create_table':
+            columns = ",\n    ".join(["id INT IDENTITY(1,1) PRIMARY KEY"]
+                                      + [f"[{name}] {definition}" for name, definition in payload])
+            return [f"IF OBJECT_ID(N'{summary}', N'U') IS NULL\nCREATE TABLE {summary} (\n    {columns}\n)"]
+        if kind == 'add_columns':
+            return [
+                f"IF COL_LENGTH(N'{summary}', N'{name}') IS NULL ALTER TABLE {summary} ADD [{name}] {definition}"
+                for name, definition in payload
+            ]
+        name, columns, include = payload
+        name = name.format(summary=summary)
+        statement = (
+            f"IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(N'{summary}') AND name = N'{name}')\n"
+            f"CREATE NONCLUSTERED INDEX [{name}] ON {summary} ({', '.join(f'[{column}]' for column in columns)})"
+        )
+        if include:
+            statement += f" INCLUDE ({', '.join(f'[{column}]' for column in include)})"
+        return [statement]
@@ -2,9 +2,10 @@
 # -*- coding: utf-8 -*-
 
 import os
+import re
 import logging
 import hashlib
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List
 from pathlib import Path
 
 from config import ConfigManager
@@ -191,6 +192,19 @@ class SQLLoader:
             if pattern in sql_lower:
                 self.logger.warning(f"SQL文件包含可疑模式 '{pattern}': {file_path}")
     
+    def get_sql_hash(self, sql_file: str) -> str:
+        """
+        取得SQL文件內容的雜湊值，可作為查詢結果快取的鍵值
+        
+        Args:
+            sql_file: SQL文件路徑（相對或絕對）
+            
+        Returns:
+            MD5 雜湊字串
+        """
+        sql_path = self._resolve_sql_path(sql_file)
+        return self._file_hashes.get(sql_path) or self._get_file_hash(sql_path)
+    
     def _get_file_hash(self, file_path: str) -> str:
         """取得文件的哈希值用於緩存檢查"""
         try:
@@ -214,6 +228,105 @@ class SQLLoader:
         }
 
 
+def _top_level_keywords(sql: str, keyword_pattern: str) -> List[int]:
+    """
+    找出位於最外層 (不在括號、字串、註解或中括號識別字內) 的關鍵字位置
+    
+    Args:
+        sql: SQL語句
+        keyword_pattern: 關鍵字正規表示式 (不分大小寫)
+        
+    Returns:
+        符合的起始位置列表
+    """
+    positions = []
+    keyword_re = re.compile(keyword_pattern, re.IGNORECASE)
+    depth = 0
+    i = 0
+    length = len(sql)
+    while i < length:
+        ch = sql[i]
+        if ch == "'":
+            end = sql.find("'", i + 1)
+            while end != -1 and sql[end + 1:end + 2] == "'":
+                end = sql.find("'", end + 2)
+            i = length if end == -1 else end + 1
+            continue
+        if ch == '[':
+            end = sql.find(']', i + 1)
+            i = length if end == -1 else end + 1
+            continue
+        if sql.startswith('--', i):
+            end = sql.find('\n', i)
+            i = length if end == -1 else end + 1
+            continue
+        if sql.startswith('/*', i):
+            end = sql.find('*/', i + 2)
+            i = length if end == -1 else end + 2
+            continue
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth -= 1
+        elif depth == 0 and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == '_')):
+            match = keyword_re.match(sql, i)
+            if match:
+                positions.append(i)
+                i = match.end()
+                continue
+        i += 1
+    return positions
+
+
+def build_filtered_sql(sql: str, where_clause: str = None, top: int = None, order_by: str = None) -> str:
+    """
+    將查詢包裝為子查詢並加上外層過濾條件
+    
+    外層以輸出欄位名稱過濾。一般查詢包裝為衍生資料表；CTE 查詢則把主查詢改寫為
+    最後一個 CTE，再從該 CTE 過濾。子查詢不允許 ORDER BY，因此最外層的 ORDER BY
+    (未搭配 TOP 時) 會被移除。
+    
+    Args:
+        sql: 原始查詢
+        where_clause: 外層 WHERE 條件 (可含 ? 參數)
+        top: 外層 TOP 筆數
+        order_by: 外層 ORDER BY 子句
+        
+    Returns:
+        包裝後的SQL
+    """
+    body = sql.strip().rstrip(';').strip()
+    
+    # 移除最外層結尾的 ORDER BY
+    order_positions = _top_level_keywords(body, r'order\s+by\b')
+    if order_positions and not re.match(r'^\s*(with\b.*?\bselect|select)\s+(distinct\s+)?top\b',
+                                        body, re.IGNORECASE | re.DOTALL):
+        body = body[:order_positions[-1]].rstrip()
+    
+    prefix = ''
+    if re.match(r'^with\b', body, re.IGNORECASE):
+        # 主查詢為 CTE 定義之後第一個最外層 SELECT
+        select_positions = _top_level_keywords(body, r'select\b')
+        if not select_positions:
+            raise ValueError("無法辨識 CTE 查詢的主查詢")
+        main_start = select_positions[0]
+        prefix = body[:main_start].rstrip().rstrip(',') + ",\nfiltered_main AS (\n"
+        source = "filtered_main"
+        body = body[main_start:] + "\n)\n"
+    else:
+        source = "(\n" + body + "\n) AS filtered_src"
+        body = ''
+    
+    select = "SELECT " + (f"TOP ({int(top)}) " if top else "") + "*"
+    outer = f"{select} FROM {source}"
+    if where_clause:
+        outer += f" WHERE {where_clause}"
+    if order_by:
+        outer += f" ORDER BY {order_by}"
+    
+    return prefix + body + outer
+
+
 class SecurityError(Exception):
     """安全相關異常"""
     pass
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from typing import Dict, Any, List
+
+from transform import build_sql_dtypes
+
+
+_COMPRESSION_TYPES = ('none', 'row', 'page')
+
+
+def validate_index_keys(columns: List[str], schema: Dict[str, Dict[str, Any]], index_name: str):
+    """
+    檢查索引鍵欄位皆已宣告有長度上限的型別，設定錯誤時拋出 ValueError
+
+    未宣告或未指定 length 的字串欄位會建立為 NVARCHAR(max)，SQL Server 不允許作為索引鍵。
+    """
+    for column in columns:
+        spec = schema.get(column)
+        if spec is None:
+            raise ValueError(f"索引 {index_name} 的鍵欄位 {column} 未在 columns 宣告型別 (未宣告的字串欄位為 NVARCHAR(max))")
+        if spec.get('dtype', 'str') in ('str', 'category') and not spec.get('length'):
+            raise ValueError(f"索引 {index_name} 的鍵欄位 {column} 為字串，需在 columns 指定 length")
+
+
+def validate_storage(storage: Dict[str, Any], schema: Dict[str, Dict[str, Any]]):
+    """檢查 query_metadata.json 的 storage 設定，設定錯誤時拋出 ValueError"""
+    if storage.get('clustered_index') and storage.get('columnstore'):
+        raise ValueError("storage 的 clustered_index 與 columnstore 只能擇一")
+    validate_index_keys(get_clustered_key(storage), schema, "clustered_index")
+
+    compression = storage.get('compression')
+    if compression and compression.lower() not in _COMPRESSION_TYPES:
+        raise ValueError(f"storage 的 compression 需為 {'/'.join(_COMPRESSION_TYPES)}: {compression}")
+    if compression and storage.get('columnstore'):
+        raise ValueError("叢集資料行存放區索引使用自身的壓縮，不可另外設定 compression")
+
+
+def get_clustered_key(storage: Dict[str, Any]) -> List[str]:
+    """取得叢集索引鍵欄位 (未設定時回傳空清單)"""
+    clustered_index = storage.get('clustered_index') or []
+    return [clustered_index] if isinstance(clustered_index, str) else list(clustered_index)
+
+
+def build_table_ddl(table_name: str, index_base: str, columns: List[str], schema: Dict[str, Dict[str, Any]],
+                    storage: Dict[str, Any], dialect) -> List[str]:
+    """
+    產生建立目標表後、寫入資料前執行的 DDL
+
+    依欄位宣告將 nullable=false 的欄位設為 NOT NULL，並依 storage 建立叢集索引
+    (clustered_index) 或叢集資料行存放區索引 (columnstore)，以及設定資料壓縮 (compression)。
+    索引名稱以 index_base (正式目標表名稱) 命名，暫存表切換為正式表後名稱不變。
+    只支援 SQL Server，其他資料庫回傳空清單。
+
+    Args:
+        table_name: 實際建立的表名稱 (可能為暫存表)
+        index_base: 索引名稱使用的目標表名稱
+        columns: 寫入資料的欄位名稱
+        schema: query_metadata.json 的 columns 設定
+        storage: query_metadata.json 的 storage 設定
+        dialect: 目標資料庫的 SQLAlchemy dialect
+    """
+    if dialect.name != 'mssql':
+        return []
+
+    statements = []
+    sql_dtypes = build_sql_dtypes(schema)
+    for column, spec in schema.items():
+        if column in columns and not spec.get('nullable', True):
+            column_type = sql_dtypes[column].compile(dialect=dialect)
+            statements.append(f"ALTER TABLE {table_name} ALTER COLUMN [{column}] {column_type} NOT NULL")
+
+    compression = (storage.get('compression') or '').upper()
+    with_compression = f" WITH (DATA_COMPRESSION = {compression})" if compression else ""
+    clustered_key = get_clustered_key(storage)
+    if clustered_key:
+        validate_index_keys(clustered_key, schema, f"CIX_{index_base}")
+        key_list = ", ".join(f"[{column}]" for column in clustered_key)
+        statements.append(f"CREATE CLUSTERED INDEX [CIX_{index_base}] ON {table_name} ({key_list}){with_compression}")
+    elif storage.get('columnstore'):
+        statements.append(f"CREATE CLUSTERED COLUMNSTORE INDEX [CCI_{index_base}] ON {table_name}")
+    elif compression:
+        statements.append(f"ALTER TABLE {table_name} REBUILD{with_compression}")
+    return statements
+
+
+def validate_indexes(indexes: List[Dict[str, Any]], schema: Dict[str, Dict[str, Any]]):
+    """檢查 query_metadata.json 的 indexes 設定，設定錯誤時拋出 ValueError"""
+    names = set()
+    for position, index in enumerate(indexes, start=1):
+        if not index.get('columns'):
+            raise ValueError(f"索引設定缺少 columns: {index}")
+        name = index.get('name')
+        if name and name in names:
+            raise ValueError(f"索引名稱重複: {name}")
+        names.add(name)
+        validate_index_keys(index['columns'], schema, name or f"#{position}")
+        compression = index.get('compression')
+        if compression and compression.lower() not in _COMPRESSION_TYPES:
+            raise ValueError(f"索引的 compression 需為 {'/'.join(_COMPRESSION_TYPES)}: {compression}")
+
+
+def _index_name(index_base: str, index: Dict[str, Any], position: int) -> str:
+    """取得索引名稱 (未指定時為 IX_{目標表}_{序號})"""
+    return index.get('name') or f"IX_{index_base}_{position}"
+
+
+def build_index_disable_ddl(table_name: str, index_base: str, indexes: List[Dict[str, Any]], dialect) -> List[str]:
+    """
+    產生寫入前停用非叢集索引的 DDL (索引不存在時略過)
+
+    停用後寫入不再逐列維護索引，寫入完成後以 build_index_rebuild_ddl 一次重建。
+    只支援 SQL Server，其他資料庫回傳空清單。
+    """
+    if dialect.name != 'mssql':
+        return []
+
+    statements = []
+    for position, index in enumerate(indexes, start=1):
+        name = _index_name(index_base, index, position)
+        statements.append(
+            f"IF EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(N'{table_name}') AND name = N'{name}') "
+            f"ALTER INDEX [{name}] ON {table_name} DISABLE"
+        )
+    return statements
+
+
+def build_index_rebuild_ddl(table_name: str, index_base: str, indexes: List[Dict[str, Any]], dialect,
+                            rebuild_existing: bool = True) -> List[str]:
+    """
+    產生寫入後重建非叢集索引的 DDL，索引尚不存在時 (例如剛建立的暫存表) 改為建立
+
+    rebuild_existing 為 False 時只建立不存在的索引 (用於只寫入少量資料列的增量載入)。
+
+    索引設定欄位：
+        name: 索引名稱 (預設 IX_{目標表}_{序號})
+        columns: 索引鍵欄位
+        include: 包含欄位
+        unique: 是否為唯一索引
+        compression: none / row / page
+    只支援 SQL Server，其他資料庫回傳空清單。
+    """
+    if dialect.name != 'mssql':
+        return []
+
+    statements = []
+    for position, index in enumerate(indexes, start=1):
+        name = _index_name(index_base, index, position)
+        unique = "UNIQUE " if index.get('unique') else ""
+        key_list = ", ".join(f"[{column}]" for column in index['columns'])
+        include = ""
+        if index.get('include'):
+            include = " INCLUDE (" + ", ".join(f"[{column}]" for column in index['include']) + ")"
+        compression = (index.get('compression') or '').upper()
+        with_options = f" WITH (DATA_COMPRESSION = {compression})" if compression else ""
+        exists = f"EXISTS (SELECT 1 FROM sys.indexes WHERE object_id = OBJECT_ID(N'{table_name}') AND name = N'{name}')"
+        create = f"CREATE {unique}NONCLUSTERED INDEX [{name}] ON {table_name} ({key_list}){include}{with_options}"
+        if rebuild_existing:
+            statements.append(f"IF {exists} ALTER INDEX [{name}] ON {table_name} REBUILD ELSE {create}")
+        else:
+            statements.append(f"IF NOT {exists} {create}")
+    return statements
+
+
+def build_statistics_ddl(table_name: str, columns: List[str], dialect, sample_percent: int = None) -> List[str]:
+    """
+    產生更新欄位統計資料的 DDL，統計資料 ST_{欄位} 不存在時建立
+
+    Args:
+        table_name: 資料表名稱
+        columns: Tableau 常用於篩選的欄位
+        dialect: 目標資料庫的 SQLAlchemy dialect
+        sample_percent: 取樣百分比，未指定時完整掃描 (FULLSCAN)
+    """
+    if dialect.name != 'mssql':
+        return []
+
+    sample = f"SAMPLE {int(sample_percent)} PERCENT" if sample_percent else "FULLSCAN"
+    statements = []
+    for column in columns:
+        name = f"ST_{column}"
+        statements.append(
+            f"IF EXISTS (SELECT 1 FROM sys.stats WHERE object_id = OBJECT_ID(N'{table_name}') AND name = N'{name}') "
+            f"UPDATE STATISTICS {table_name} ([{name}]) WITH {sample} "
+            f"ELSE CREATE STATISTICS [{name}] ON {table_name} ([{column}]) WITH {sample}"
+        )
+    return statements
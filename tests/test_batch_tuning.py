@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+from batch_tuning import AdaptiveBatchSizer
+
+
+def test_grows_while_rate_improves_and_reverses_on_drop():
+    sizer = AdaptiveBatchSizer('t', 1000, 100, 100000, step=2.0)
+
+    sizer.record(1000, 1.0)
+    assert sizer.size == 2000
+    sizer.record(2000, 1.0)
+    assert sizer.size == 4000
+    # 速度下降超過容許比例時反轉方向
+    sizer.record(4000, 4.0)
+    assert sizer.size == 2000
+    assert (sizer.best_size, sizer.best_rate) == (2000, 2000.0)
+
+
+def test_size_clamped_to_range():
+    sizer = AdaptiveBatchSizer('t', 50000, 100, 60000, step=2.0)
+
+    assert sizer.size == 50000
+    sizer.record(50000, 1.0)
+    assert sizer.size == 60000
+    assert AdaptiveBatchSizer('t', 10, 100, 1000).size == 100
+
+
+def test_partial_batches_counted_but_not_tuned():
+    sizer = AdaptiveBatchSizer('t', 1000, 100, 10000)
+
+    sizer.record(400, 0.1)
+    sizer.record(0, 0.0)
+
+    assert sizer.size == 1000
+    assert sizer.best_rate is None
+    assert (sizer.batches, sizer.total_rows) == (2, 400)
+    assert sizer.average_rate == 4000.0
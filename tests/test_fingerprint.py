@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pandas as pd
+
+from app import combine_result_fingerprint, compute_result_fingerprint, hash_result_rows
+
+
+def _frame():
+    return pd.DataFrame({'工單號': ['A', 'B', 'C'], '數量': [1, 2, 3]})
+
+
+def test_independent_of_row_order_and_batching():
+    df = _frame()
+    batched = combine_result_fingerprint(df.columns, [hash_result_rows(df.iloc[2:]), hash_result_rows(df.iloc[:2])])
+
+    assert compute_result_fingerprint(df) == compute_result_fingerprint(df.iloc[::-1])
+    assert compute_result_fingerprint(df) == batched
+
+
+def test_changes_with_values_columns_and_load_definition():
+    df = _frame()
+    fingerprint = compute_result_fingerprint(df, '{"sql": "1"}')
+
+    assert fingerprint != compute_result_fingerprint(df.assign(數量=[1, 2, 4]), '{"sql": "1"}')
+    assert fingerprint != compute_result_fingerprint(df.rename(columns={'數量': 'qty'}), '{"sql": "1"}')
+    assert fingerprint != compute_result_fingerprint(df.iloc[:2], '{"sql": "1"}')
+    assert fingerprint != compute_result_fingerprint(df, '{"sql": "2"}')
+
+
+def test_empty_result_has_stable_fingerprint():
+    empty = _frame().iloc[:0]
+
+    assert combine_result_fingerprint(empty.columns, []) == compute_result_fingerprint(empty)
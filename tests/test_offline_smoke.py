@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+
+from schema_migrations import MIGRATIONS
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(*args, data_dir):
+    return subprocess.run([sys.executable, *args, '--data-dir', str(data_dir)], cwd=PROJECT_DIR,
+                          capture_output=True, text=True, timeout=600)
+
+
+def test_app_all_offline_sqlite(tmp_path):
+    """以 SQLite 離線後端執行完整 ETL (app.py --all --offline sqlite)"""
+    seeded = _run('offline_data.py', '--backend', 'sqlite', '--orders', '200', data_dir=tmp_path)
+    assert seeded.returncode == 0, seeded.stderr
+
+    result = _run('app.py', '--all', '--offline', 'sqlite', data_dir=tmp_path)
+    assert result.returncode == 0, result.stdout + result.stderr
+
+    with open(os.path.join(PROJECT_DIR, 'query_metadata.json'), encoding='utf-8') as f:
+        target_tables = {query['name']: query['target_table'] for query in json.load(f)['queries']}
+
+    connection = sqlite3.connect(str(tmp_path / 'tableau_db.sqlite'))
+    try:
+        records = connection.execute(
+            "SELECT QUERY_NAME, TARGET_TABLE, ROW_COUNT, ETL_STATUS FROM ETL_SUMMARY WHERE SUMMARY_TYPE = 'QUERY'"
+        ).fetchall()
+        assert {name: table for name, table, _, _ in records} == target_tables
+        for _, table, row_count, status in records:
+            assert status == 'LOADED'
+            assert connection.execute(f"SELECT COUNT(*) FROM [{table}]").fetchone()[0] == row_count
+
+        summary = connection.execute(
+            "SELECT ETL_STATUS, mes_status, sap_status FROM ETL_SUMMARY WHERE SUMMARY_TYPE = 'SUMMARY'").fetchall()
+        assert summary == [('COMPLETE', '成功', '成功')]
+        assert connection.execute("SELECT MAX([VERSION]) FROM ETL_SCHEMA_VERSION").fetchone()[0] == MIGRATIONS[-1][0]
+    finally:
+        connection.close()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import datetime
+
+import pytest
+
+from partitioning import build_partition_predicates, build_keyset_predicate
+
+
+def test_date_partitions_cover_range_without_gaps():
+    predicates = build_partition_predicates(
+        {'scheme': 'date', 'column': '開始日期', 'start': '2024-01-01', 'end': '2024-03-01', 'interval_days': 30})
+
+    assert predicates[0] == ("[開始日期] IS NULL", [])
+    assert predicates[1] == ("[開始日期] < ?", [datetime.datetime(2024, 1, 1)])
+    assert predicates[-1] == ("[開始日期] >= ?", [datetime.datetime(2024, 1, 31)])
+    # 中間分區的上界即下一個分區的下界
+    middle = predicates[2:-1]
+    assert [params for _, params in middle] == [[datetime.datetime(2024, 1, 1), datetime.datetime(2024, 1, 31)]]
+
+
+def test_hash_partitions_one_per_bucket_plus_null():
+    predicates = build_partition_predicates({'scheme': 'hash', 'column': '工單號', 'buckets': 3})
+
+    assert len(predicates) == 4
+    assert predicates[0] == ("[工單號] IS NULL", [])
+    assert [clause.endswith(f"% 3) = {bucket}") for bucket, (clause, _) in enumerate(predicates[1:])] == [True] * 3
+
+
+def test_none_scheme_is_single_unfiltered_partition():
+    assert build_partition_predicates({'scheme': 'none'}) == [(None, [])]
+
+
+@pytest.mark.parametrize('partition', [
+    {'scheme': 'date', 'column': 'd', 'start': '2024-01-01', 'interval_days': 0},
+    {'scheme': 'hash', 'column': 'k', 'buckets': 0},
+    {'scheme': 'range', 'column': 'k'},
+])
+def test_invalid_partition_settings_rejected(partition):
+    with pytest.raises(ValueError):
+        build_partition_predicates(partition)
+
+
+def test_keyset_predicate_and_null_key():
+    clause, params = build_keyset_predicate(['a', 'b'], (1, 'x'))
+
+    assert clause == "([a] > ?) OR ([a] = ? AND [b] > ?)"
+    assert params == [1, 1, 'x']
+    with pytest.raises(ValueError):
+        build_keyset_predicate(['a', 'b'], (1, None))
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from sql_loader import build_filtered_sql
+
+
+def test_plain_query_wrapped_as_derived_table():
+    sql = build_filtered_sql("SELECT a FROM t ORDER BY a;", "[a] > ?")
+
+    assert sql == "SELECT * FROM (\nSELECT a FROM t\n) AS filtered_src WHERE [a] > ?"
+
+
+def test_cte_query_main_select_becomes_last_cte():
+    sql = build_filtered_sql("WITH c AS (SELECT a FROM t) SELECT a FROM c ORDER BY a",
+                             "1 = 0", top=5, order_by="[a]")
+
+    assert sql == ("WITH c AS (SELECT a FROM t),\nfiltered_main AS (\nSELECT a FROM c\n)\n"
+                   "SELECT TOP (5) * FROM filtered_main WHERE 1 = 0 ORDER BY [a]")
+
+
+def test_order_by_kept_with_top():
+    sql = build_filtered_sql("SELECT TOP 5 a FROM t ORDER BY a")
+
+    assert "ORDER BY a" in sql
+
+
+def test_order_by_inside_subquery_and_literal_not_removed():
+    sql = build_filtered_sql("SELECT a, 'order by' AS s FROM (SELECT TOP 1 a FROM t ORDER BY a) x")
+
+    assert "'order by'" in sql
+    assert "ORDER BY a)" in sql
+
+
+def test_cte_without_main_select_rejected():
+    with pytest.raises(ValueError):
+        build_filtered_sql("WITH c AS (SELECT a FROM t)")
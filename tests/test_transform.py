@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import decimal
+
+import pandas as pd
+import pytest
+
+from transform import apply_column_schema, convert_column, validate_column_schema
+
+
+def test_int_coerces_invalid_and_fills_not_nullable():
+    values = convert_column(pd.Series(['1', 'x', None, ' ']), {'dtype': 'int', 'nullable': False, 'downcast': 'int32'})
+
+    assert values.tolist() == [1, 0, 0, 0]
+    assert values.dtype == 'int32'
+
+
+def test_int_keeps_nulls_with_nullable_dtype():
+    values = convert_column(pd.Series([1, None]), {'dtype': 'int'})
+
+    assert str(values.dtype) == 'Int64'
+    assert values.isna().tolist() == [False, True]
+
+
+def test_decimal_rounds_half_up_without_float_error():
+    values = convert_column(pd.Series(['2.675', '1.005', 0.1, None]),
+                            {'dtype': 'decimal', 'precision': 18, 'scale': 2, 'nullable': False})
+
+    assert [decimal.Decimal(str(value)) for value in values.tolist()] == [
+        decimal.Decimal('2.68'), decimal.Decimal('1.01'), decimal.Decimal('0.10'), decimal.Decimal('0.00')]
+
+
+def test_decimal_arrow_input_rounded_exactly():
+    pa = pytest.importorskip('pyarrow')
+    series = pd.Series(pd.arrays.ArrowExtensionArray(
+        pa.array([decimal.Decimal('2.675'), decimal.Decimal('-2.675')], type=pa.decimal128(10, 3))))
+
+    values = convert_column(series, {'dtype': 'decimal', 'precision': 10, 'scale': 2})
+
+    assert values.tolist() == [decimal.Decimal('2.68'), decimal.Decimal('-2.68')]
+
+
+def test_str_fill_applies_to_string_dtype():
+    values = convert_column(pd.Series(['a', None], dtype='string'), {'dtype': 'str', 'nullable': False})
+
+    assert values.tolist() == ['a', '']
+
+
+def test_not_nullable_datetime_with_invalid_value_raises():
+    with pytest.raises(ValueError):
+        convert_column(pd.Series(['2024-01-01', 'bad']), {'dtype': 'datetime', 'nullable': False})
+
+
+def test_apply_schema_rejects_remaining_nulls_and_skips_missing_columns():
+    df = pd.DataFrame({'d': ['2024-01-01', None]})
+
+    assert apply_column_schema(df, {'missing': {'dtype': 'int'}}) is df
+    with pytest.raises(ValueError):
+        apply_column_schema(df, {'d': {'dtype': 'datetime', 'nullable': False}})
+
+
+@pytest.mark.parametrize('schema', [
+    {'c': {'dtype': 'money'}},
+    {'c': {'dtype': 'int', 'downcast': 'float32'}},
+    {'c': {'dtype': 'decimal', 'downcast': 'float64'}},
+])
+def test_invalid_schema_rejected(schema):
+    with pytest.raises(ValueError):
+        validate_column_schema(schema)
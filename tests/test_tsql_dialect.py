@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sqlite3
+
+import pytest
+
+from tsql_dialect import translate_tsql
+
+
+def test_three_part_names_and_top_rewritten():
+    sql = translate_tsql("SELECT TOP 10 [a] FROM [MES].[dbo].[t] WHERE d > GETDATE()", 'sqlite')
+
+    assert sql == "SELECT [a] FROM [t] WHERE d > datetime('now', 'localtime')\nLIMIT 10"
+
+
+def test_string_literals_untouched():
+    sql = translate_tsql("SELECT 'GETDATE() ISNULL(x, 1)' AS s, ISNULL(a, 0) AS a FROM t", 'sqlite')
+
+    assert "'GETDATE() ISNULL(x, 1)'" in sql
+    assert "COALESCE(a, 0)" in sql
+
+
+def test_duckdb_quotes_bracket_identifiers():
+    assert translate_tsql("SELECT [工單號] FROM [MES].[dbo].[t]", 'duckdb') == 'SELECT "工單號" FROM "t"'
+
+
+def test_unsupported_dialect_rejected():
+    with pytest.raises(ValueError):
+        translate_tsql("SELECT 1", 'mssql')
+
+
+def _sqlite_row(sql):
+    connection = sqlite3.connect(':memory:')
+    try:
+        return connection.execute(translate_tsql(sql, 'sqlite')).fetchone()
+    finally:
+        connection.close()
+
+
+def test_date_functions_evaluate_on_sqlite():
+    row = _sqlite_row(
+        "SELECT DATEDIFF(day, '20240101', '20240301') AS days, "
+        "CONVERT(varchar, CAST('2024-01-02 03:04:05' AS DATETIME), 20) AS text, "
+        "DATEADD(day, 1, '2024-12-31') AS next_day, ISNULL(NULL, 7) AS filled"
+    )
+
+    assert row == (60, '2024-01-02 03:04:05', '2025-01-01 00:00:00', 7)
+
+
+def test_date_functions_evaluate_on_duckdb():
+    duckdb = pytest.importorskip('duckdb')
+    connection = duckdb.connect()
+    try:
+        row = connection.execute(translate_tsql(
+            "SELECT DATEDIFF(day, '20240101', '20240301') AS days, ISNULL(NULL, 7) AS filled", 'duckdb')).fetchone()
+    finally:
+        connection.close()
+
+    assert row == (60, 7)
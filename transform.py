@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import decimal
+import logging
+import pandas as pd
+from sqlalchemy import types as sqltypes
+from sqlalchemy.dialects import mssql
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from database import STRING_DTYPE
+
+# 選用套件：decimal 欄位保存為 Arrow decimal128
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger("Transform")
+
+# 不可為NULL且未指定 fill 時使用的預設填充值
+_DEFAULT_FILLS = {
+    'int': 0,
+    'float': 0.0,
+    'decimal': decimal.Decimal(0),
+    'str': '',
+    'category': '',
+    'bool': False,
+}
+
+_INT_WIDTHS = ('int8', 'int16', 'int32', 'int64')
+_FLOAT_WIDTHS = ('float32', 'float64')
+
+
+def validate_column_schema(schema: Dict[str, Dict[str, Any]]):
+    """檢查 query_metadata.json 的 columns 設定，設定錯誤時拋出 ValueError"""
+    for column, spec in schema.items():
+        dtype = spec.get('dtype', 'str')
+        downcast = spec.get('downcast')
+        if dtype not in ('int', 'float', 'decimal', 'str', 'category', 'datetime', 'bool'):
+            raise ValueError(f"欄位 {column} 的型別不支援: {dtype}")
+        if dtype == 'int' and downcast and downcast not in _INT_WIDTHS:
+            raise ValueError(f"欄位 {column} 的 downcast 需為 {'/'.join(_INT_WIDTHS)}: {downcast}")
+        if dtype == 'float' and downcast and downcast not in _FLOAT_WIDTHS:
+            raise ValueError(f"欄位 {column} 的 downcast 需為 {'/'.join(_FLOAT_WIDTHS)}: {downcast}")
+        if dtype == 'decimal' and downcast:
+            raise ValueError(f"欄位 {column} 為 decimal (保留精確值)，不支援 downcast；需要浮點數時請改用 float")
+
+
+def _coerced_mask(series: pd.Series, values: pd.Series) -> pd.Series:
+    """轉換前有值 (非NULL且非空白字串) 但轉換後為NULL的資料列"""
+    mask = series.notna() & values.isna()
+    if mask.any() and not pd.api.types.is_numeric_dtype(series):
+        mask &= series.astype(str).str.strip() != ''
+    return mask
+
+
+def _report_coerced(series: pd.Series, values: pd.Series, dtype: str, fill: Any, fail: bool):
+    """
+    回報無法轉換而成為NULL的值 (errors='coerce' 不會拋出錯誤)
+
+    Raises:
+        ValueError: fail 為 true 且有無法轉換的值
+    """
+    mask = _coerced_mask(series, values)
+    coerced = int(mask.sum())
+    if not coerced:
+        return
+    message = f"欄位 {series.name} 有 {coerced} 個值無法轉換為 {dtype} (例如 {series[mask].head(3).tolist()})"
+    if fail:
+        raise ValueError(f"{message}，且宣告為不可為NULL")
+    logger.warning(f"{message}，" + ("已視為NULL" if fill is None else f"已以 {fill!r} 填充"))
+
+
+def _parse_decimal(value: Any) -> Optional[decimal.Decimal]:
+    """將單一值轉為 Decimal (浮點數以最短十進位表示轉換)，NULL 或無法解析的值回傳 None"""
+    if isinstance(value, decimal.Decimal):
+        return value if value.is_finite() else None
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    try:
+        number = decimal.Decimal(str(value).strip())
+    except decimal.InvalidOperation:
+        return None
+    return number if number.is_finite() else None
+
+
+def _to_decimal(series: pd.Series, spec: Dict[str, Any]) -> pd.Series:
+    """
+    轉換為精確的十進位數值，不經過浮點數
+
+    指定 scale 時四捨五入至該小數位數 (0.5 遠離零進位，與 SQL Server 轉換為 DECIMAL 相同)。
+    有 pyarrow 且指定 scale 時為 Arrow decimal128 (precision 預設 38)，否則為 Decimal 物件。
+    """
+    scale = spec.get('scale')
+    precision = spec.get('precision', 38)
+    if (pa is not None and isinstance(series.dtype, pd.ArrowDtype)
+            and pa.types.is_decimal(series.dtype.pyarrow_dtype)):
+        # columnar 擷取引擎的 DECIMAL 欄位已是 Arrow decimal128，直接以 Arrow 運算進位
+        if scale is None:
+            return series
+        array = pc.round(pa.array(series), ndigits=scale, round_mode='half_towards_infinity')
+        return pd.Series(pd.arrays.ArrowExtensionArray(array.cast(pa.decimal128(precision, scale))),
+                         index=series.index, name=series.name)
+
+    values = [_parse_decimal(value) for value in series.tolist()]
+    if scale is None:
+        return pd.Series(values, index=series.index, name=series.name, dtype=object)
+    quantum = decimal.Decimal(1).scaleb(-scale)
+    values = [value.quantize(quantum, rounding=decimal.ROUND_HALF_UP) if value is not None else None
+              for value in values]
+    if pa is None:
+        return pd.Series(values, index=series.index, name=series.name, dtype=object)
+    return pd.Series(pd.arrays.ArrowExtensionArray(pa.array(values, type=pa.decimal128(precision, scale))),
+                     index=series.index, name=series.name)
+
+
+def convert_column(series: pd.Series, spec: Dict[str, Any]) -> pd.Series:
+    """
+    依欄位宣告以向量化方式轉換單一欄位
+
+    spec 欄位：
+        dtype: int / float / decimal / str / category / datetime / bool (預設 str)
+        nullable: 是否保留NULL (預設 true)；false 時以 fill 或型別預設值填充
+        fill: NULL填充值
+        downcast: int8/int16/int32/int64 (int) 或 float32/float64 (float)
+        scale / precision: decimal 四捨五入的小數位數與精確度 (decimal 保留精確值，不轉為浮點數)
+        format: datetime 字串的解析格式 (例如 %Y-%m-%d %H:%M:%S)
+
+    無法轉換的數值與日期時間會記錄警告後視為NULL；不可為NULL的 datetime 欄位則拋出 ValueError，
+    不以 fill 掩蓋格式錯誤。
+    """
+    dtype = spec.get('dtype', 'str')
+    nullable = spec.get('nullable', True)
+    fill = spec.get('fill', None if nullable else _DEFAULT_FILLS.get(dtype))
+
+    if dtype == 'int':
+        values = pd.to_numeric(series, errors='coerce')
+        _report_coerced(series, values, dtype, fill, fail=False)
+        if fill is not None:
+            values = values.fillna(fill)
+        width = spec.get('downcast', 'int64')
+        # 仍有NULL時使用 pandas 可為NULL的整數型別 (Int32 等)
+        return values.astype(width.capitalize() if values.isna().any() else width)
+
+    if dtype == 'decimal':
+        values = _to_decimal(series, spec)
+        _report_coerced(series, values, dtype, fill, fail=False)
+        if fill is None:
+            return values
+        fill = _parse_decimal(fill)
+        if spec.get('scale') is not None:
+            fill = fill.quantize(decimal.Decimal(1).scaleb(-spec['scale']), rounding=decimal.ROUND_HALF_UP)
+        return values.fillna(fill)
+
+    if dtype == 'float':
+        values = pd.to_numeric(series, errors='coerce').astype(spec.get('downcast', 'float64'))
+        _report_coerced(series, values, dtype, fill, fail=False)
+        if spec.get('scale') is not None:
+            values = values.round(spec['scale'])
+        return values.fillna(fill) if fill is not None else values
+
+    if dtype == 'datetime':
+        values = pd.to_datetime(series, errors='coerce', format=spec.get('format'))
+        _report_coerced(series, values, dtype, fill, fail=not nullable)
+        return values.fillna(pd.Timestamp(fill)) if fill is not None else values
+
+    if dtype == 'bool':
+        values = series.astype('boolean')
+        if fill is not None:
+            return values.fillna(bool(fill)).astype(bool)
+        return values
+
+    values = series.astype(STRING_DTYPE)
+    if fill is not None:
+        values = values.fillna(fill)
+    # category 為字典編碼的字串欄位 (每個不同值只保存一份)
+    return values.astype('category') if dtype == 'category' else values
+
+
+def apply_column_schema(df: pd.DataFrame, schema: Dict[str, Dict[str, Any]]) -> pd.DataFrame:
+    """
+    套用欄位宣告至DataFrame (未宣告的欄位不變，查詢結果中不存在的宣告欄位略過)
+
+    Returns:
+        轉換後的DataFrame
+
+    Raises:
+        ValueError: 宣告為不可為NULL的欄位轉換後仍有NULL值 (例如 datetime 未指定 fill)，
+            或不可為NULL的 datetime 欄位有無法解析的值
+    """
+    converted = {}
+    for column, spec in schema.items():
+        if column not in df.columns:
+            continue
+        values = convert_column(df[column], spec)
+        if not spec.get('nullable', True):
+            null_count = int(values.isna().sum())
+            if null_count:
+                raise ValueError(f"欄位 {column} 宣告為不可為NULL，但轉換後仍有 {null_count} 個NULL值")
+        converted[column] = values
+
+    if not converted:
+        return df
+    return df.assign(**converted)
+
+
+def encode_low_cardinality(df: pd.DataFrame, max_unique_ratio: float = 0.05, min_rows: int = 1000,
+                           exclude: Iterable[str] = (), sample_size: int = 10000) -> Tuple[pd.DataFrame, List[str]]:
+    """
+    將低基數字串欄位字典編碼為 category
+
+    先以前 sample_size 筆探測相異值比例，通過後才轉換整欄；轉換後相異值比例仍超過
+    max_unique_ratio 的欄位維持原樣。資料列少於 min_rows 時不編碼。
+
+    Returns:
+        (df, 已編碼的欄位名稱清單)
+    """
+    if len(df) < min_rows:
+        return df, []
+
+    exclude = set(exclude)
+    max_unique = max(1, int(len(df) * max_unique_ratio))
+    encoded = {}
+    for column in df.select_dtypes(include=['object', 'string']).columns:
+        if column in exclude:
+            continue
+        sample = df[column].iloc[:sample_size]
+        if sample.nunique(dropna=False) > max(1, int(len(sample) * max_unique_ratio)):
+            continue
+        values = df[column].astype('category')
+        if len(values.cat.categories) <= max_unique:
+            encoded[column] = values
+
+    if not encoded:
+        return df, []
+    return df.assign(**encoded), list(encoded)
+
+
+def build_sql_dtypes(schema: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    依欄位宣告產生 to_sql 使用的目標欄位型別，避免由資料推斷出過寬的型別
+
+    str/category 可指定 length (NVARCHAR 長度)，decimal 可指定 precision 與 scale，
+    datetime 可指定 precision (DATETIME2 小數秒位數)。
+    """
+    sql_dtypes = {}
+    for column, spec in schema.items():
+        dtype = spec.get('dtype', 'str')
+        downcast = spec.get('downcast')
+        if dtype == 'int':
+            sql_dtypes[column] = {
+                'int8': sqltypes.SmallInteger, 'int16': sqltypes.SmallInteger,
+                'int32': sqltypes.Integer,
+            }.get(downcast, sqltypes.BigInteger)()
+        elif dtype == 'decimal' and spec.get('precision'):
+            sql_dtypes[column] = sqltypes.DECIMAL(spec['precision'], spec.get('scale', 0))
+        elif dtype in ('float', 'decimal'):
+            sql_dtypes[column] = sqltypes.REAL() if downcast == 'float32' else sqltypes.Float(precision=53)
+        elif dtype == 'datetime':
+            # SQL Server 使用 DATETIME2 (範圍與精確度皆優於 DATETIME)
+            sql_dtypes[column] = sqltypes.DateTime().with_variant(mssql.DATETIME2(spec.get('precision')), 'mssql')
+        elif dtype == 'bool':
+            sql_dtypes[column] = sqltypes.Boolean()
+        else:
+            sql_dtypes[column] = sqltypes.NVARCHAR(spec.get('length'))
+    return sql_dtypes
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+from typing import Callable, List, Tuple
+
+
+# DATEDIFF/DATEADD 的日期單位 (T-SQL 縮寫 -> 單位名稱)
+_DATE_PARTS = {
+    'yy': 'year', 'yyyy': 'year', 'year': 'year',
+    'mm': 'month', 'm': 'month', 'month': 'month',
+    'dd': 'day', 'd': 'day', 'day': 'day',
+    'hh': 'hour', 'hour': 'hour',
+    'mi': 'minute', 'n': 'minute', 'minute': 'minute',
+    'ss': 'second', 's': 'second', 'second': 'second',
+}
+
+# DATEDIFF 於 SQLite 以 julianday 差值換算 (年、月為近似值)
+_SQLITE_DAY_FACTORS = {'day': 1, 'hour': 24, 'minute': 1440, 'second': 86400}
+
+
+def _split_literals(sql: str) -> List[Tuple[bool, str]]:
+    """將SQL切分為 (是否為字串常值, 片段)，字串常值內的 '' 視為跳脫"""
+    parts = []
+    position = 0
+    for match in re.finditer(r"N?'(?:[^']|'')*'", sql):
+        if match.start() > position:
+            parts.append((False, sql[position:match.start()]))
+        parts.append((True, match.group(0)))
+        position = match.end()
+    if position < len(sql):
+        parts.append((False, sql[position:]))
+    return parts
+
+
+def _sub_code(sql: str, pattern: str, replacement, flags=re.IGNORECASE) -> str:
+    """只在字串常值以外的片段套用正規表示式取代"""
+    return "".join(
+        text if is_literal else re.sub(pattern, replacement, text, flags=flags)
+        for is_literal, text in _split_literals(sql)
+    )
+
+
+def _find_call_end(sql: str, open_index: int) -> Tuple[int, List[str]]:
+    """
+    從左括號位置找出對應的右括號，並以最外層逗號切分參數
+
+    Returns:
+        (右括號位置, 參數清單)
+    """
+    depth = 0
+    args = []
+    start = open_index + 1
+    index = open_index
+    while index < len(sql):
+        char = sql[index]
+        if char == "'":
+            # 略過字串常值
+            index += 1
+            while index < len(sql):
+                if sql[index] == "'" and not (index + 1 < len(sql) and sql[index + 1] == "'"):
+                    break
+                index += 2 if sql[index] == "'" else 1
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                args.append(sql[start:index].strip())
+                return index, args
+        elif char == ',' and depth == 1:
+            args.append(sql[start:index].strip())
+            start = index + 1
+        index += 1
+    raise ValueError(f"SQL 括號不成對: {sql[open_index:open_index + 50]}")
+
+
+def _replace_calls(sql: str, name: str, rewrite: Callable[[List[str]], str]) -> str:
+    """
+    將函數呼叫 name(...) 依參數改寫 (由內而外，參數中的同名呼叫也會改寫)
+
+    改寫結果不可再包含同名呼叫，否則會重複改寫。
+    """
+    pattern = re.compile(r'\b' + name + r'\s*\(', re.IGNORECASE)
+    while True:
+        literal_spans = [(m.start(), m.end()) for m in re.finditer(r"N?'(?:[^']|'')*'", sql)]
+        matches = [m for m in pattern.finditer(sql)
+                   if not any(start <= m.start() < end for start, end in literal_spans)]
+        if not matches:
+            return sql
+        # 最後一個呼叫不會包含其他尚未改寫的同名呼叫
+        match = matches[-1]
+        end, args = _find_call_end(sql, match.end() - 1)
+        sql = sql[:match.start()] + rewrite(args) + sql[end + 1:]
+
+
+def _date_part(token: str) -> str:
+    part = _DATE_PARTS.get(token.strip().strip('[]').lower())
+    if part is None:
+        raise ValueError(f"不支援的日期單位: {token}")
+    return part
+
+
+def _move_top_to_limit(sql: str) -> str:
+    """將最外層 SELECT TOP n / TOP (n) 改為結尾的 LIMIT n"""
+    literal_spans = [(m.start(), m.end()) for m in re.finditer(r"N?'(?:[^']|'')*'", sql)]
+    for match in re.finditer(r'\bSELECT\s+(DISTINCT\s+)?TOP\s*(\(\s*(\d+)\s*\)|(\d+))\s*', sql, re.IGNORECASE):
+        if any(start <= match.start() < end for start, end in literal_spans):
+            continue
+        prefix = sql[:match.start()]
+        if prefix.count('(') - prefix.count(')') != 0:
+            continue
+        limit = match.group(3) or match.group(4)
+        body = sql[:match.start()] + 'SELECT ' + (match.group(1) or '') + sql[match.end():]
+        return body.rstrip().rstrip(';') + f"\nLIMIT {limit}"
+    return sql
+
+
+def translate_tsql(sql: str, dialect: str) -> str:
+    """
+    將 mes/ 與 sap/ 查詢使用的 T-SQL 語法改寫為 SQLite 或 DuckDB 可執行的語法 (供離線後端使用)
+
+    支援：三段式名稱 ([db].[dbo].[table])、GETDATE、ISNULL、ISNUMERIC、CONVERT(varchar, x, 20)、
+    DATEDIFF、DATEADD、STRING_AGG、CHECKSUM、CAST(... AS DATETIME/DATETIME2)、'yyyyMMdd' 日期常值
+    與最外層 TOP。其他 T-SQL 專用語法 (MERGE、sp_rename 等) 不改寫。
+
+    Args:
+        sql: T-SQL 語句
+        dialect: sqlite / duckdb
+    """
+    if dialect not in ('sqlite', 'duckdb'):
+        raise ValueError(f"不支援的離線後端: {dialect}")
+    sqlite = dialect == 'sqlite'
+
+    # 全形空白 (查詢檔中偶有) 與三段式名稱的資料庫、結構描述部分
+    sql = sql.replace('　', ' ')
+    sql = _sub_code(sql, r'(\[[^\]]+\]|\w+)\.(\[dbo\]|dbo)\.', '')
+    # 'yyyyMMdd' 日期常值改為 ISO 格式，與以文字或 TIMESTAMP 儲存的日期比較
+    sql = re.sub(r"'(\d{4})(\d{2})(\d{2})'", r"'\1-\2-\3'", sql)
+
+    sql = _sub_code(sql, r'\bGETDATE\s*\(\s*\)',
+                    "datetime('now', 'localtime')" if sqlite else "CAST(now() AS TIMESTAMP)")
+    sql = _replace_calls(sql, 'ISNULL', lambda args: f"COALESCE({', '.join(args)})")
+    if sqlite:
+        sql = _replace_calls(sql, 'STRING_AGG', lambda args: f"group_concat({', '.join(args)})")
+
+    def convert(args):
+        # 只有 style 20 (yyyy-MM-dd HH:mm:ss) 需轉換格式，其他 style 僅轉為字串
+        value = args[1]
+        if len(args) > 2 and args[2] in ('20', '120'):
+            return (f"strftime('%Y-%m-%d %H:%M:%S', {value})" if sqlite
+                    else f"strftime(CAST({value} AS TIMESTAMP), '%Y-%m-%d %H:%M:%S')")
+        return f"CAST({value} AS {'TEXT' if sqlite else 'VARCHAR'})"
+    sql = _replace_calls(sql, 'CONVERT', convert)
+
+    def datediff(args):
+        part, start, end = _date_part(args[0]), args[1], args[2]
+        if not sqlite:
+            return f"date_diff('{part}', CAST({start} AS TIMESTAMP), CAST({end} AS TIMESTAMP))"
+        if part in ('year', 'month'):
+            months = (f"((CAST(strftime('%Y', {end}) AS INTEGER) - CAST(strftime('%Y', {start}) AS INTEGER)) * 12"
+                      f" + CAST(strftime('%m', {end}) AS INTEGER) - CAST(strftime('%m', {start}) AS INTEGER))")
+            return months if part == 'month' else f"({months} / 12)"
+        if part == 'day':
+            # T-SQL 的 DATEDIFF(dd) 計算跨越的日期界線數
+            return f"CAST(julianday(date({end})) - julianday(date({start})) AS INTEGER)"
+        return f"CAST((julianday({end}) - julianday({start})) * {_SQLITE_DAY_FACTORS[part]} AS INTEGER)"
+    sql = _replace_calls(sql, 'DATEDIFF', datediff)
+
+    def dateadd(args):
+        part, amount, value = _date_part(args[0]), args[1], args[2]
+        if sqlite:
+            return f"datetime({value}, ({amount}) || ' {part}')"
+        return f"(CAST({value} AS TIMESTAMP) + to_{part}s(CAST({amount} AS INTEGER)))"
+    sql = _replace_calls(sql, 'DATEADD', dateadd)
+
+    if not sqlite:
+        # SQLite 以連線註冊的 ISNUMERIC/CHECKSUM 函數執行
+        sql = _replace_calls(sql, 'ISNUMERIC',
+                             lambda args: f"(CASE WHEN TRY_CAST({args[0]} AS DOUBLE) IS NULL THEN 0 ELSE 1 END)")
+        sql = _replace_calls(sql, 'CHECKSUM', lambda args: f"CAST(hash({', '.join(args)}) % 2147483647 AS INTEGER)")
+
+    # SQLite 的 DATETIME 型別名稱為數值親和性，改為文字以保留日期時間字串
+    sql = _sub_code(sql, r'\bAS\s+DATETIME2?(\s*\(\s*\d+\s*\))?\s*\)', "AS TEXT)" if sqlite else "AS TIMESTAMP)")
+
+    sql = _move_top_to_limit(sql)
+
+    if not sqlite:
+        # DuckDB 不支援方括號識別字
+        sql = _sub_code(sql, r'\[([^\]]+)\]', r'"\1"')
+    return sql
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import logging
+import datetime
+from sqlalchemy import text
+from typing import Dict, Any, Iterable, Optional
+
+from database import DatabaseManager
+from sql_loader import build_filtered_sql
+
+
+class WatermarkStore:
+    """增量擷取高水位管理器 - 將每個查詢的高水位保存於目標資料庫"""
+
+    def __init__(self, db_manager: DatabaseManager, target_db: str = 'tableau_db'):
+        self.db_manager = db_manager
+        self.etl_config = db_manager.etl_config
+        self.target_db = target_db
+        self.logger = logging.getLogger("WatermarkStore")
+        self._table_ready = False
+
+    def ensure_table(self):
+        """確保高水位表存在"""
+        if self._table_ready:
+            return
+
+        table_name = self.etl_config.ETL_WATERMARK_TABLE
+        if self.db_manager.get_backend(self.target_db) is None:
+            sql = f"""
+            IF NOT EXISTS (SELECT * FROM INFORMATION_SCHEMA.TABLES WHERE TABLE_NAME = '{table_name}')
+            BEGIN
+                CREATE TABLE {table_name} (
+                    [QUERY_NAME] NVARCHAR(255) NOT NULL PRIMARY KEY,
+                    [WATERMARK_COLUMN] NVARCHAR(255) NOT NULL,
+                    [WATERMARK_TYPE] NVARCHAR(20) NOT NULL,
+                    [WATERMARK_VALUE] NVARCHAR(100) NULL,
+                    [UPDATED_AT] DATETIME DEFAULT GETDATE()
+                )
+            END
+            """
+        else:
+            # 離線後端 (SQLite/DuckDB) 沒有 IF ... BEGIN 區塊
+            sql = self.db_manager.dialect_sql(self.target_db, f"""
+            CREATE TABLE IF NOT EXISTS {table_name} (
+                [QUERY_NAME] VARCHAR(255) NOT NULL PRIMARY KEY,
+                [WATERMARK_COLUMN] VARCHAR(255) NOT NULL,
+                [WATERMARK_TYPE] VARCHAR(20) NOT NULL,
+                [WATERMARK_VALUE] VARCHAR(100) NULL,
+                [UPDATED_AT] TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+        with self.db_manager.get_engine_context(self.target_db) as engine:
+            with engine.begin() as conn:
+                conn.execute(text(sql))
+        self.db_manager.invalidate_catalog(self.target_db, table_name)
+        self._table_ready = True
+
+    def get(self, query_name: str, watermark: Dict[str, Any]) -> Optional[Any]:
+        """
+        取得查詢的高水位
+
+        Returns:
+            高水位值 (datetime 或數值)，尚未記錄或欄位設定已變更時回傳 None
+        """
+        self.ensure_table()
+        table_name = self.etl_config.ETL_WATERMARK_TABLE
+        with self.db_manager.get_engine_context(self.target_db) as engine:
+            with engine.connect() as conn:
+                row = conn.execute(
+                    text(f"SELECT [WATERMARK_COLUMN], [WATERMARK_VALUE] FROM {table_name} WHERE [QUERY_NAME] = :query_name"),
+                    {'query_name': query_name}
+                ).fetchone()
+
+        if row is None or row[1] is None:
+            return None
+        if row[0] != watermark['column']:
+            self.logger.warning(f"查詢 {query_name} 的高水位欄位已由 {row[0]} 變更為 {watermark['column']}，將重新完整載入")
+            return None
+        return parse_watermark_value(row[1], watermark.get('type', 'datetime'))
+
+    def set(self, query_name: str, watermark: Dict[str, Any], value: Any):
+        """更新查詢的高水位"""
+        if value is None:
+            return
+
+        self.ensure_table()
+        table_name = self.etl_config.ETL_WATERMARK_TABLE
+        if self.db_manager.get_backend(self.target_db) is None:
+            sql = f"""
+            MERGE {table_name} AS t
+            USING (SELECT :query_name AS [QUERY_NAME]) AS s
+            ON t.[QUERY_NAME] = s.[QUERY_NAME]
+            WHEN MATCHED THEN
+                UPDATE SET [WATERMARK_COLUMN] = :column, [WATERMARK_TYPE] = :type,
+                           [WATERMARK_VALUE] = :value, [UPDATED_AT] = GETDATE()
+            WHEN NOT MATCHED THEN
+                INSERT ([QUERY_NAME], [WATERMARK_COLUMN], [WATERMARK_TYPE], [WATERMARK_VALUE], [UPDATED_AT])
+                VALUES (:query_name, :column, :type, :value, GETDATE());
+            """
+        else:
+            # 離線後端以 INSERT ... ON CONFLICT 代替 MERGE
+            sql = self.db_manager.dialect_sql(self.target_db, f"""
+            INSERT INTO {table_name} ([QUERY_NAME], [WATERMARK_COLUMN], [WATERMARK_TYPE], [WATERMARK_VALUE], [UPDATED_AT])
+            VALUES (:query_name, :column, :type, :value, GETDATE())
+            ON CONFLICT ([QUERY_NAME]) DO UPDATE SET [WATERMARK_COLUMN] = excluded.[WATERMARK_COLUMN],
+                [WATERMARK_TYPE] = excluded.[WATERMARK_TYPE], [WATERMARK_VALUE] = excluded.[WATERMARK_VALUE],
+                [UPDATED_AT] = excluded.[UPDATED_AT]
+            """)
+        params = {
+            'query_name': query_name,
+            'column': watermark['column'],
+            'type': watermark.get('type', 'datetime'),
+            'value': format_watermark_value(value)
+        }
+        with self.db_manager.get_engine_context(self.target_db) as engine:
+            with engine.begin() as conn:
+                conn.execute(text(sql), params)
+        self.logger.info(f"已更新查詢 {query_name} 的高水位: {params['value']}")
+
+    def reset(self, query_name: str):
+        """清除查詢的高水位，下次執行將完整載入"""
+        self.ensure_table()
+        table_name = self.etl_config.ETL_WATERMARK_TABLE
+        with self.db_manager.get_engine_context(self.target_db) as engine:
+            with engine.begin() as conn:
+                conn.execute(text(f"DELETE FROM {table_name} WHERE [QUERY_NAME] = :query_name"),
+                             {'query_name': query_name})
+
+
+def parse_watermark_value(value: str, watermark_type: str) -> Any:
+    """將保存的高水位字串轉回對應型別"""
+    if watermark_type == 'number':
+        number = float(value)
+        return int(number) if number.is_integer() else number
+    return datetime.datetime.fromisoformat(value)
+
+
+def format_watermark_value(value: Any) -> str:
+    """將高水位轉為可保存的字串"""
+    if hasattr(value, 'to_pydatetime'):
+        value = value.to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    return str(value)
+
+
+def get_lower_bound(high_water_mark: Any, watermark: Dict[str, Any]) -> Any:
+    """
+    依回溯重疊量計算本次擷取的下界
+
+    datetime 型別的 lookback 單位為分鐘，number 型別則直接自高水位扣除。
+    """
+    lookback = watermark.get('lookback', 0)
+    if watermark.get('type', 'datetime') == 'number':
+        return high_water_mark - lookback
+    return high_water_mark - datetime.timedelta(minutes=lookback)
+
+
+def build_incremental_sql(sql: str, column: str) -> str:
+    """
+    將查詢包裝為只取高水位之後資料列的子查詢
+
+    外層以輸出欄位名稱過濾，因此高水位欄位必須是查詢的輸出欄位。
+
+    Returns:
+        使用一個 ? 參數 (下界) 的 SQL
+    """
+    return build_filtered_sql(sql, f"[{column}] > ?")
+
+
+def validate_watermark(query_name: str, watermark: Dict[str, Any], columns: Optional[Iterable[str]] = None):
+    """
+    檢查查詢的高水位設定
+
+    columns 為查詢實際的輸出欄位 (由 ETLProcessor 以不傳回資料列的探測查詢取得)，高水位欄位不在其中時
+    視為設定錯誤，避免每次執行才在來源端以「無效的資料行名稱」失敗；無法取得輸出欄位時 (None) 只檢查設定本身。
+
+    Raises:
+        ValueError: 設定不正確
+    """
+    column = watermark.get('column')
+    if not column:
+        raise ValueError(f"查詢 {query_name} 的 watermark 未指定 column")
+    if watermark.get('type', 'datetime') not in ('datetime', 'number'):
+        raise ValueError(f"查詢 {query_name} 的 watermark type 不支援: {watermark['type']} (可用 datetime/number)")
+    if columns is not None and column not in columns:
+        raise ValueError(f"查詢 {query_name} 的高水位欄位 {column} 不是 SQL 的輸出欄位 "
+                         f"(輸出欄位: {', '.join(columns)})")